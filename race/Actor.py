@@ -0,0 +1,72 @@
+import random
+import numpy as np
+import torch as torch
+
+from race import RaceEnv
+from race import DeepQNetwork
+from race import StartPool
+
+# The Actor class collects experience for the Learner (distributed training).  Each actor runs in its own process
+# with its own headless race (a RaceEnv) and a local, feed-forward only copy of the policy DQN.  It drives the
+# player with its own fixed epsilon (the % probability of a random action) and writes every step to its
+# shared memory experience ring.  Every so often it copies the learner's latest weights into its network, and at
+# the end of each episode it reports the episode's score to the learner.  W/'mid_lap_starts' > 0, that share of its
+# episodes start from snapshots of its own earlier episodes, taken partway around the track (see StartPool).
+class Actor:
+
+    def __init__(self, actor_id, epsilon, ring, weights, results, stop, level, player_car, network_dims, mid_lap_starts=0):
+        self.actor_id = actor_id
+        self.epsilon = epsilon
+        self.ring = ring            # ExperienceRing the actor writes its steps to
+        self.weights = weights      # SharedWeights published by the learner
+        self.results = results      # Queue the actor reports each episode's (actor_id, score, lap_count, solved) to
+        self.stop = stop            # Event set by the learner when training is over
+        self.weight_sync_frequency = 100    # Num of steps between checking for new weights from the learner
+        start_pool = None
+        if mid_lap_starts > 0:
+            start_pool = StartPool.StartPool(start_probability=mid_lap_starts)
+        self.env = RaceEnv.RaceEnv(level=level, player_car=player_car, start_pool=start_pool)
+        self.action_size = self.env.action_size
+        # Local policy DQN on the CPU (only used for forward passes--the learner does all of the training)
+        self.dqn_policy = DeepQNetwork.DeepQNetwork(*network_dims, device="cpu")
+        self.dqn_policy.eval()
+        self.weights_version = self.weights.load(self.dqn_policy, 0)
+
+    # Runs episodes until the learner stops training
+    def run(self):
+        state = self.env.reset()
+        score = 0
+        time_step = 0
+        while not self.stop.is_set():
+            if time_step % self.weight_sync_frequency == 0:
+                self.weights_version = self.weights.load(self.dqn_policy, self.weights_version)
+            action = self.act(state)
+            next_state, reward, done, info = self.env.step(action)
+            self.ring.put(state, action, reward, done)
+            score += reward
+            time_step += 1
+            state = next_state
+            if done:
+                # (only a race driven from the start line counts as finished)
+                solved = info["lap_count"] > self.env.race.level.laps and not self.env.race.pool_start
+                self.results.put((self.actor_id, float(score), info["lap_count"], solved))
+                state = self.env.reset()
+                score = 0
+        self.env.close()
+
+    # Selects an action: a forward pass of the policy DQN, or a random action, pending the value of epsilon
+    def act(self, state):
+        if random.random() > self.epsilon:
+            with torch.no_grad():
+                actions = self.dqn_policy.forward(torch.from_numpy(state).unsqueeze(0))
+            return int(np.argmax(actions.numpy()))
+        return random.randrange(self.action_size)
+
+# Actor process entry point (must be a module-level function so it can be started with the 'spawn' method)
+def run_actor(actor_id, epsilon, ring, weights, results, stop, level, player_car, network_dims, mid_lap_starts=0):
+    torch.set_num_threads(1)    # One core per actor
+    try:
+        actor = Actor(actor_id, epsilon, ring, weights, results, stop, level, player_car, network_dims, mid_lap_starts)
+        actor.run()
+    except KeyboardInterrupt:
+        pass    # Ctrl+C reaches every process, the learner shuts training down
@@ -2,24 +2,31 @@ import pygame
 import os
 import math
 import random
-import numpy as np
 import torch as torch
 import torch.optim as optim
 import pickle
-import copy
+import threading
 
 from race.GameObject import ImageObject
 from race import AiRadar
 from race import DeepQNetwork
+from race import ReplayBuffer
+from race import PrioritizedReplayBuffer
+from race import Reward
+from race import Checkpoint
+from race import CheckpointWriter
+from race import LearnerThread
+from race import InferencePolicy
+from race import Controls
 
 # The AIAgent initializes the Deep Q Learning Network (DQN) datastructure, and plays a critical role in the overall Reinforcement Learning
 # algorithm. If it is initalized in a 'training' state, the agent will recieve input  from the player's environment (observe) via a radar 
 # object and uses them as the nueral net's input data.  It then controls the player to take its action on the environment (keyboard outputs),
 # calculates a reward based on each action taken and determines a "loss" between the actions taken and target actions that it approximates
-# via a "Target" Q network. It then performs gradient descent to minimize this loss (backpropegation), thereby 'training' the DQN.
-# The action, reward, and next_state data is saved to replay memory initialized by the agent.  This replay memory can then be sampled & is
-# used for training.  If the agent is initalized in a 'non-training' mode, it will simply recieve the radar inputs and control the player's
-# actions via an existing nueral net, without performing any training on the network.  The DQN network and replay memory state data
+# via a "Target" Q network. It then performs gradient descent to minimize this loss (backpropegation), thereby 'training' the DQN
+# (training runs on its own threads, alongside the race--see LearnerThread).
+# The state, action, and reward data is saved to replay memory initialized by the agent (see ReplayBuffer).  This replay memory can then be sampled & is
+# used for training.  (Driving w/an already trained network, without training it, is the AiPilot's job.)  The DQN network and replay memory state data
 # is saved to file after each training episode in the dqn_model_data directory after each training episode.  Training ends when the
 # network is trained sufficiently enough to allow the player to complete the levels configured lap count, as defined within
 # that levels init_data.txt file. 
@@ -29,13 +36,16 @@ class AiAgent(ImageObject):
         self.game = game
         self.player_car = player_car
         self.level = level
+        self.game_objects = game_objects
         # Init AI's radar--provides collision detection input to Nueral Network 
         self.radar = AiRadar.AiRadar(player_car, level)
         # The NN inputs
         self.nn_inputs = []
         # Define file path to load/save the DQN and replay memory to
         self.dqn_file = "./race/dqn_model_data/dqn_policy.pt"
+        self.policy_file = "./race/dqn_model_data/dqn_policy.npz"    # NumPy export of the policy DQN, for play mode (see AiPilot)
         self.data_path = "./race/dqn_model_data/"
+        self.checkpoint_file = "./race/dqn_model_data/training_checkpoint.pt"  # Everything needed to continue training (see Checkpoint)
         # Define action space - possible actions the agent can take to control the player (ie. different keypress combinations)
         #self.action_space = [[],["forward"], ["e_brake"], ["right"], ["left"], ["forward", "left"], ["forward", "right"], ["e_brake", "left"], ["e_brake", "right"]]
         self.action_space = [[],["forward"], ["forward", "left"], ["forward", "right"]]
@@ -54,17 +64,30 @@ class AiAgent(ImageObject):
         self.epsilon_decay_rate = .005              # Amount which epsilon decays after each learning iteration (decay's to epsilon end)
         self.learning_rate = .001                   # Learning rate constant α
         self.step_frequency = 1                     # Num of time steps between each state/action/reward iteration
-        self.learning_frequency = 2                 # How many time steps between training the policy network & updating its weights (ie. the training step)
+        self.replay_ratio = .5                      # Num of training steps (gradient updates) per time step, ie. .5 trains the network every 2nd time step
         self.target_net_update_freq = 1000          # Num of time steps between updating the target network's weights w/the policy network's weights
+        self.weight_sync_freq = 50                  # Num of training steps between copying the trained weights into the policy DQN the agent acts with
         self.episode_length = 120000                # Time (ms) before a training episode will automatically reset
+        self.prioritized_replay = False             # Sample replay memory by priority (TD error) instead of uniformly (see PrioritizedReplayBuffer)
+        self.torchscript_inference = False          # Act w/a TorchScript compiled copy of the policy DQN (see InferencePolicy)
+        self.progress_reward = False                # Reward the distance driven along the track (see Reward.progress_reward) instead of the radar reward
         # ---------------------------------------------------------------------------------------------------------------------------------------------
-        self.mem_index = 0
         self.time_step = 0
         self.score = 0
         self.episode_timer = 0
+        self.episode_done = False   # Set at the end of a training episode--the race then resets itself (see Race.reset)
+        self.race_progress = None   # The player's race progress at the last reward (see progress_reward)
         
-        # Load existing DQN policy network, if one exists
-        if os.path.exists(self.dqn_file):
+        # Checkpoints are written in the background--finish writing any left over from the last race before loading them
+        self.checkpoints = CheckpointWriter.get_writer()
+        self.checkpoints.wait()
+        # Continue from the last training checkpoint, if there is one.  Otherwise load the existing DQN policy network, if one exists
+        checkpoint = Checkpoint.load(self.checkpoint_file, self.hyperparameters())
+        if checkpoint != None:
+            self.dqn_policy = DeepQNetwork.DeepQNetwork(self.learning_rate, self.state_size, self.fc1_dims, self.fc2_dims, self.action_size)
+            self.dqn_policy.load_state_dict(checkpoint["policy"])
+            self.dqn_policy.eval()
+        elif os.path.exists(self.dqn_file):
             self.load_model()
         # Otherwise init a new network
         else:
@@ -72,52 +95,47 @@ class AiAgent(ImageObject):
             self.dqn_policy = DeepQNetwork.DeepQNetwork(self.learning_rate, self.state_size, self.fc1_dims, self.fc2_dims, self.action_size)
             self.dqn_policy.eval()
             # Save the new model to file
-            self.save_model(self.dqn_policy)
-        # Init a target DQN via a copy of policy the DQN
-        self.dqn_target = copy.deepcopy(self.dqn_policy)
-
-        # Init numpy array's used as replay memory buffer--will save previous states (inputs), actions, rewards, & next_state data 
-        self.state_memory = np.zeros((self.replay_buffer_size, self.state_size), dtype=np.float32)
-        self.action_memory = np.zeros((self.replay_buffer_size, 1), dtype=np.float32)
-        self.reward_memory = np.zeros((self.replay_buffer_size, 1), dtype=np.float32)
-        self.next_state_memory = np.zeros((self.replay_buffer_size, self.state_size), dtype=np.float32)
-        self.done_memory = np.zeros((self.replay_buffer_size, 1), dtype=np.float32)
-        # Load replay memory with previous episodes data, if it exists
-        self.load_agent_state()
+            self.save_policy(CheckpointWriter.copy_state_dict(self.dqn_policy))
+        # Init the replay memory buffer--will save previous states (inputs), actions, rewards, & terminal states.  The buffer
+        # is kept in memory-mapped files (in the checkpoint's replay directory), so it already holds the previous episodes data, if it exists
+        replay_path = self.data_path
+        if checkpoint != None and checkpoint["replay"] != None:
+            replay_path = checkpoint["replay"]["path"]
+        if self.prioritized_replay:
+            self.replay_memory = PrioritizedReplayBuffer.PrioritizedReplayBuffer(self.replay_buffer_size, self.state_size, self.batch_size, self.dqn_policy.device, replay_path)
+        else:
+            self.replay_memory = ReplayBuffer.ReplayBuffer(self.replay_buffer_size, self.state_size, self.batch_size, self.dqn_policy.device, replay_path)
+        # Load the time step & epsilon the previous episodes ended with
+        self.load_agent_state(checkpoint)
         
-        # Whether the agent will be performing training or not (Backprop vs. feed-forward only)
-        self.train = self.game.ai_train
-        if self.train == False:
-            self.epsilon = 0        # since no training, don't select actions randomly
+        # The network is trained on its own threads (see LearnerThread)--the agent only acts with the policy DQN, which gets
+        # the trained weights every 'weight_sync_freq' training steps.  The target DQN is kept by the learner.
+        self.replay_lock = threading.Lock()     # Replay memory is shared w/the learner
+        target_update_steps = max(1, int(self.target_net_update_freq * self.replay_ratio))
+        self.learner = LearnerThread.LearnerThread(self.dqn_policy, self.replay_memory, self.replay_lock, self.gamma, self.replay_ratio,
+                                                   self.min_replay_size, target_update_steps, self.weight_sync_freq, checkpoint=checkpoint)
+        self.learn_steps = self.learner.learn_steps     # Num of the learner's training steps that epsilon has been decayed for
+        # The agent acts through a CPU copy of the policy DQN that's set up for single-state forward passes, and its actions
+        # are mapped straight to the player car's controls
+        self.policy = InferencePolicy.InferencePolicy(self.dqn_policy, self.state_size, self.torchscript_inference)
+        self.controls = Controls.Controls(self.action_space, self.game.key_state)
+        # Continue the random number sequences where the checkpoint left them
+        if checkpoint != None:
+            Checkpoint.set_rng_state(checkpoint["rng"])
         
     # 'update' controls the AI agent's overall operational sequence & 
-    # timing of each function via its method calls & a time-step counter.
-    # Depending on the selection made at the title screen, agent
-    # will perform a feed-forward control only (should have a DQN that's 
-    # already trained) OR feed-forward w/backprob to train the DQN.
+    # timing of each function via its method calls & a time-step counter:
+    # feed-forward w/backprob to train the DQN.
     def update(self):
-        # Feed forward only control sequence: (no training of network was selected at title screen) 
-        if self.train == False:
-            self.nn_inputs = self.radar.calc_radar_beams()              # Get the player car's current radar beam distance values
-            self.nn_inputs.append(self.player_car.distance)             # Add the player car's current speed as the final parameter to the input list
-            if self.time_step % self.step_frequency == 0:
-                self.act()
-            self.time_step += 1
-            return
-        
         # DQN control w/complete training sequence (back-propegation)
         if self.time_step % self.step_frequency == 0:
-            self.mem_index += 1                                         # Increment replay memory index to store the step data
-            self.mem_index = self.mem_index % self.replay_buffer_size   # Reset the memory index if it exceeds buffer size (begin to over-write)
             self.nn_inputs = self.radar.calc_radar_beams()              # Get the player car's current radar beam sensor distance values
             self.nn_inputs.append(self.player_car.distance)             # Add the player car's current speed as the last parameter to the input data list
             self.act()                                                  # Take an action--Feed forward to exploit or take randomized action to explore
             self.reward_calc()                                          # Calculate the reward
-            self.save_to_replay()                                       # Save all current step data to replay memory (state, action, reward, next_state, terminal_state)
-        if self.time_step % self.learning_frequency == 0:       
-            self.learn()                                                # Perform a training step on the network (Backpropegate the policy DQN)
-        if self.time_step % self.target_net_update_freq == 0:
-            self.update_target_from_policy()                            # Update the target DQN weights with the policy DQN weights
+            self.save_to_replay()                                       # Save all current step data to replay memory (state, action, reward)
+        self.learner.step()                                             # Let the learner train for this time step (see LearnerThread)
+        self.update_from_learner()                                      # Take the learner's latest weights & decay epsilon
          
         self.time_step += 1                                             # Increment the time step
         if self.time_step > self.replay_buffer_size:                    # Reset the timestep to zero to prevent it from getting too large
@@ -126,149 +144,148 @@ class AiAgent(ImageObject):
         self.episode_timer += self.game.clock.get_time()                # Increment the current episode's timer             
         #  Determine if this is the final iteration of the current episode i.e. the 'terminal state' (either time has exceeded or player has collided)
         if self.episode_timer > self.episode_length or self.player_car.collision_level == True: 
-            self.done_memory[self.mem_index-1] = True                   # Save terminal state boolean to replay memory
-            self.save_model(self.dqn_policy)                            # Save the current policy DQN to file
+            with self.replay_lock:
+                self.replay_memory.mark_terminal()                      # Save terminal state to replay memory
             self.save_agent_state()                                     # Save replay memory data to file
+            self.save_model()                                           # Save the current policy DQN & training checkpoint to file
             self.write_episode_score()                                  # Write episode score to file
             self.restart_episode()                                      # Start a new training episode iteration
         
         # Training is done--the agent was able to successfully complete the level's lap count without a single player collision    
         if self.player_car.lap_count > self.level.laps:               
-            self.save_model(self.dqn_policy)                            # Save the current policy DQN to file
             self.save_agent_state()                                     # Save replay memory data to file
+            self.save_model()                                           # Save the current policy DQN & training checkpoint to file
             self.write_episode_score()                                  # Write episode score to file
+            self.checkpoints.wait()                                     # (training is over, nothing to keep running)
             print("Training Completed, the model was saved.")
-            self.game.running = False                                   # End training
+            self.game.running = False                                   # End training (the race stops the learner, see close)
             
     # Makes the player car act.  The action taken is determined either by a forward
     # pass of the policy DQN or is selected randomly, pending the value of epsilon.
     def act(self):
         if random.random() > self.epsilon:                                      # Randomly generates a num from 0 to 1 and compares w/epsilon
-            state = torch.tensor(self.nn_inputs, dtype=torch.float32).unsqueeze(0).to(self.dqn_policy.device)  # Sends the input node values to the working device (GPU if avail)
-            with torch.no_grad():                                               # Does not track gradients (because not currently training the network)
-                actions = self.dqn_policy.forward(state)                        # Retreives the output node values by a forward pass of the policy DQN
-            actions = actions.cpu().data.numpy()                                # Retrieves this output back from GPU to CPU and converts the tensor to numpy array
-            self.action_choice = np.argmax(actions)                             # Selects the output node w/the  maximum value received from the forward pass as the decided action to take
+            self.action_choice = self.policy.act(self.nn_inputs)                # Selects the output node w/the maximum value from a forward pass of the policy DQN
         else:
-            self.action_choice = random.choice(np.arange(self.action_size))     # Elect to take a random action instead (explore the environment)
+            self.action_choice = random.randrange(self.action_size)             # Elect to take a random action instead (explore the environment)
         
-        # Retreive the specific action (keypress combinations) from the pre-defined action-space list (keypress combinations)
-        action = self.action_space[self.action_choice]
-        # Now perform the action (send/switch the keypresses to actually send control signals to the player)
-        for key, value in self.game.key_state.items():
-            if key in action:
-                self.game.key_state[key] = True
-            else:
-                self.game.key_state[key] = False
+        # Now perform the action (send/switch the keypresses of the action to actually send control signals to the player)
+        self.controls.apply(self.action_choice)
     
     # Calculates a 'reward' value for the action taken on the previous iteration.
     def reward_calc(self):
         beams = self.nn_inputs.copy()   # Copy input nodes to seperate the radar beam values from the speed value
         speed = beams.pop()
         # A custom-designed reward equation--dependant on the player's current speed & the radar beam sensor distances.
-        self.reward = (speed * ((beams[0] - 500) + .25 * (beams[1] - 250) + .25 * (beams[2] - 250) + .125 * (beams[3] - 75) + .125 * (beams[4] - 75))) / 100
+        if not self.progress_reward:
+            self.reward = Reward.radar_reward(beams, speed)
+        # Or the distance driven along the track since the last reward (the finish line tracks the player where it is now)
+        else:
+            finish_line = self.game_objects["finish_line"]
+            race_progress = finish_line.track_progress(0)
+            if self.race_progress == None:
+                self.race_progress = race_progress
+            self.reward = Reward.progress_reward(self.race_progress, race_progress, finish_line.progress_map.lap_length)
+            self.race_progress = race_progress
         self.score += self.reward       # Add the calculated reward to total score for the current episode
     
-    # Saves each state, action, reward, and next state to replay memory
+    # Saves each state and action to replay memory, along with the current reward (the reward for the previous action taken)
     def save_to_replay(self):
-        self.state_memory[self.mem_index] = self.nn_inputs               # Save state (radar beam input)
-        self.action_memory[self.mem_index] = self.action_choice          # Save action
-        self.reward_memory[self.mem_index-1] = self.reward               # Save current reward to previous action taken
-        self.next_state_memory[self.mem_index-1]  = self.nn_inputs       # Save next state to previous index
-        self.done_memory[self.mem_index-1] = False                       # Episode is not in a terminal state
+        with self.replay_lock:
+            self.replay_memory.add(self.nn_inputs, self.action_choice, self.reward)
     
-    # Samples a 'batch' of previously stored state data from replay memory to 'train' the network.
-    def sample_replay(self):
-        # Get the maximum memory index that data has been written to up to this point
-        max_mem_index = min(self.mem_index, self.replay_buffer_size)
-        
-        # Retreive a random selection of replay memory indexes ranging from index 1 to max index
-        mem_sample_indexes = np.random.choice(range(1,max_mem_index), self.batch_size, replace=False) 
-        
-        # Using the list of replay memory sample indexes, select the batch replay data from their memory buffers, convert to tensors, and make available to the processing device
-        state_batch = torch.tensor(self.state_memory[mem_sample_indexes]).to(self.dqn_policy.device)
-        reward_batch = torch.tensor(self.reward_memory[mem_sample_indexes]).to(self.dqn_policy.device)
-        next_state_batch = torch.tensor(self.next_state_memory[mem_sample_indexes]).to(self.dqn_policy.device)
-        action_batch = torch.tensor(self.action_memory[mem_sample_indexes], dtype=torch.int64).to(self.dqn_policy.device)
-        done_batch = torch.tensor(self.done_memory[mem_sample_indexes]).to(self.dqn_policy.device)
-        
-        return state_batch, action_batch, reward_batch, next_state_batch, done_batch
-    
-    # Retreives a sample batch from replay memory, computes the loss eqation for the batch, then
-    # performs backpropegation (gradient descent) on the policy network to minimize the loss,
-    # ie. "trains the policy DQN" 
-    def learn(self):
-        # Do not begin learning until minimum replay memory size has been written to
-        if self.mem_index < self.min_replay_size:
-            return
-        self.dqn_policy.train()                                              # Switch from eval to training mode for the DQN
-        states, actions, rewards, next_states, dones = self.sample_replay()  # Sample replay memory and retreive the training batch       
-
-        # Perform a forward pass of states and next_states through policy and target DQNs, respectively
-        # Note: The .gather method uses actions as an index to parse max output(q-eval) values from the feed-forward output
-        q_evaluated = self.dqn_policy.forward(states).gather(1, actions)    
-        q_eval_next = self.dqn_target.forward(next_states).detach().max(1)[0].unsqueeze(1) # Take max of qπ(s',a')
-        
-        # Calculate Q targets based on the Bellman Equation:
-        q_targets = rewards + self.gamma * q_eval_next * (1 - dones)
-
-        # Send the actual (eval) and target data to the device to calculate the cost/loss between them
-        loss = self.dqn_policy.loss(q_evaluated, q_targets).to(self.dqn_policy.device)
-        # zero-out gradients for DQN's optimizer for the training
-        self.dqn_policy.optimizer.zero_grad()                       
-        # Perform the backprop/gradient descent to minimize the loss & step the optimizer
-        loss.backward()                                       
-        self.dqn_policy.optimizer.step()     
-        # Learning is complete, switch policy DQN back to evaluate mode
-        self.dqn_policy.eval()
-        # Decrement epsilon by the defined decay rate value
+    # Copies the learner's latest trained weights (if there are new ones) into the policy DQN, and decays epsilon by
+    # the defined decay rate value for each training step the learner has taken since the last time
+    def update_from_learner(self):
+        weights = self.learner.take_weights()
+        if weights != None:
+            self.dqn_policy.load_state_dict(weights)
+            self.policy.load_weights(weights)
+        learn_steps = self.learner.learn_steps
         if self.epsilon > self.epsilon_end:
-            self.epsilon -= self.epsilon_decay_rate
+            self.epsilon = max(self.epsilon_end, self.epsilon - self.epsilon_decay_rate * (learn_steps - self.learn_steps))
+        self.learn_steps = learn_steps
     
-    # Updates the target dqn with the policy dqn's weights
-    def update_target_from_policy(self):
-        self.dqn_target.load_state_dict(self.dqn_policy.state_dict())
-    
-    # Start a new training episode by loading saved game state
+    # End the current training episode--the race will restart the episode in place at the end of the frame
     def restart_episode(self):
         print("TOTAL EPISODE SCORE: ", self.score)
-        self.save_agent_state()
-        self.game.load_game_state()
+        self.episode_done = True
+    
+    # Stops training at the end of the race (only the first call does anything)
+    def close(self):
+        if self.learner != None:
+            self.learner.close()
+            self.learner = None
+
+    # Clears the per-episode variables for a new training episode. The DQNs, replay memory, 
+    # epsilon, and time step carry over from the last episode.
+    def reset(self):
+        self.score = 0
+        self.episode_timer = 0
+        self.episode_done = False
+        self.race_progress = None
      
-    # Saves the policy DQN to file 
-    def save_model(self, model):
-        torch.save(model.state_dict(), self.dqn_file)
+    # The current episode's counters (see RaceState)--the time step, epsilon, DQNs & replay memory aren't rewound
+    def get_state(self):
+        return (self.score, self.episode_timer)
+
+    def set_state(self, state):
+        self.score, self.episode_timer = state
+        self.episode_done = False
+        self.race_progress = None
+     
+    # Saves the policy DQN & the training checkpoint to file (in the background, see CheckpointWriter).  When training, the
+    # learner's latest weights are saved.  The checkpoint points to the replay memory as last saved (see save_agent_state)
+    def save_model(self):
+        if self.learner != None:
+            training = self.learner.snapshot()
+        else:
+            training = {"policy": Checkpoint.copy_tensors(self.dqn_policy.state_dict()), "target": Checkpoint.copy_tensors(self.dqn_policy.state_dict()),
+                        "optimizer": Checkpoint.copy_tensors(self.dqn_policy.optimizer.state_dict()), "learn_steps": self.learn_steps}
+        self.save_policy(training["policy"])
+        replay = {"path": self.replay_memory.path, "header": self.replay_memory.snapshot_header()}
+        state = {"time_step": self.time_step, "epsilon": self.epsilon, "learn_steps": training["learn_steps"]}
+        checkpoint = Checkpoint.snapshot(training["policy"], training["target"], training["optimizer"], self.hyperparameters(), replay, state)
+        self.checkpoints.save_checkpoint(checkpoint, self.checkpoint_file)
+
+    # The hyperparameters saved w/each training checkpoint
+    def hyperparameters(self):
+        return {"state_size": self.state_size, "fc1_dims": self.fc1_dims, "fc2_dims": self.fc2_dims, "action_size": self.action_size,
+                "replay_buffer_size": self.replay_buffer_size, "batch_size": self.batch_size, "gamma": self.gamma, "learning_rate": self.learning_rate,
+                "epsilon_end": self.epsilon_end, "epsilon_decay_rate": self.epsilon_decay_rate, "replay_ratio": self.replay_ratio,
+                "target_net_update_freq": self.target_net_update_freq, "weight_sync_freq": self.weight_sync_freq, "prioritized_replay": self.prioritized_replay}
+
+    # Saves a copy of the policy DQN's weights to the model file & its NumPy export
+    def save_policy(self, state_dict):
+        self.checkpoints.save_state_dict(state_dict, self.dqn_file)
+        self.checkpoints.save_numpy_policy(state_dict, self.policy_file)
 
     # Loads policy DQN from file    
     def load_model(self):
         self.dqn_policy = DeepQNetwork.DeepQNetwork(self.learning_rate, self.state_size, self.fc1_dims, self.fc2_dims, self.action_size)
-        self.dqn_policy.load_state_dict(torch.load(self.dqn_file))
+        self.dqn_policy.load_state_dict(torch.load(self.dqn_file, map_location=self.dqn_policy.device))
         self.dqn_policy.eval()
     
-    # Save the agents variables and training state data (stored in replay memory) to file
+    # Save the agent's training state data (stored in replay memory) to file--only the replay memory written since the
+    # last save is written out.  Written in the background, see CheckpointWriter
     def save_agent_state(self):
-        np.save(self.data_path+"states.npy", self.state_memory)
-        np.save(self.data_path+"actions.npy", self.action_memory)
-        np.save(self.data_path+"rewards.npy", self.reward_memory)
-        np.save(self.data_path+"next_states.npy", self.next_state_memory)
-        np.save(self.data_path+"dones.npy", self.done_memory)
-        with open(self.data_path+"time_step_counter.pickle", 'wb') as f:
-            pickle.dump(self.time_step, f)
-        with open(self.data_path+"epsilon.pickle", 'wb') as f:
-            pickle.dump(self.epsilon, f)         
+        self.checkpoints.flush_replay(self.replay_memory)
     
-    # Load agent state data
-    def load_agent_state(self):
+    # Load agent state data (the time step & epsilon saved with the training checkpoint, or saved by older versions
+    # with the replay memory or to their own files)
+    def load_agent_state(self, checkpoint=None):
+        if checkpoint != None:
+            self.time_step = checkpoint["state"]["time_step"]
+            self.epsilon = checkpoint["state"]["epsilon"]
+            return
+        if "time_step" in self.replay_memory.header:
+            self.time_step = self.replay_memory.header["time_step"]
+            self.epsilon = self.replay_memory.header["epsilon"]
+            return
         # Ensure all files actually exist before loading
-        files = ["states.npy", "actions.npy", "rewards.npy", "next_states.npy", "dones.npy", "time_step_counter.pickle", "epsilon.pickle"]
+        files = ["time_step_counter.pickle", "epsilon.pickle"]
         for file in files:
             if not os.path.isfile(self.data_path + file):
                 return
-        self.state_memory = np.load(self.data_path+"states.npy")
-        self.action_memory = np.load(self.data_path+"actions.npy")
-        self.reward_memory = np.load(self.data_path+"rewards.npy")
-        self.next_state_memory = np.load(self.data_path+"next_states.npy")
-        self.done_memory = np.load(self.data_path+"dones.npy")
         with open(self.data_path+"time_step_counter.pickle", 'rb') as f:
             self.time_step = pickle.load(f)
         with open(self.data_path+"epsilon.pickle", 'rb') as f:
@@ -276,5 +293,4 @@ class AiAgent(ImageObject):
 
     # Append each episode's score to file at end of each episode
     def write_episode_score(self):
-        with open(self.data_path+"scores.txt", 'a+') as f:
-            f.write("\nSCORE: " + str(int(self.score)))
\ No newline at end of file
+        self.checkpoints.append_text(self.data_path+"scores.txt", "\nSCORE: " + str(int(self.score)))
\ No newline at end of file
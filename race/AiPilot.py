@@ -0,0 +1,68 @@
+import os
+
+from race import AiRadar
+from race import NumpyPolicy
+from race import Controls
+
+# The AiPilot drives the player car with an already trained DQN, without training it (the title screen's "play"
+# option).  Unlike the AiAgent, it never imports PyTorch: the policy DQN's forward pass runs in NumPy from the
+# .npz export of the model (see NumpyPolicy), which training keeps up to date alongside the PyTorch model file.
+# An older model file w/o an export is exported the first time it's played (the only time PyTorch is loaded).
+class AiPilot:
+
+    def __init__(self, game, player_car, level, game_objects):
+        self.game = game
+        self.player_car = player_car
+        self.level = level
+        # Init AI's radar--provides collision detection input to the policy (also drawn by the player's viewport)
+        self.radar = AiRadar.AiRadar(player_car, level)
+        # The NN inputs
+        self.nn_inputs = []
+        # Define file paths to the trained DQN & its NumPy export
+        self.dqn_file = "./race/dqn_model_data/dqn_policy.pt"
+        self.policy_file = "./race/dqn_model_data/dqn_policy.npz"
+        # Same action space & network size as the AiAgent
+        self.action_space = [[],["forward"], ["forward", "left"], ["forward", "right"]]
+        self.action_size = len(self.action_space)
+        self.state_size = 6
+        self.fc1_dims = 16
+        self.fc2_dims = 16
+        self.step_frequency = 1
+        self.time_step = 0
+        self.episode_done = False   # (the pilot never trains, so its episodes never end)
+
+        # Load the exported policy (exporting it first if the model file is newer), or an untrained one if there's no model yet
+        if os.path.exists(self.dqn_file) and (not os.path.exists(self.policy_file) or os.path.getmtime(self.dqn_file) > os.path.getmtime(self.policy_file)):
+            NumpyPolicy.export(self.dqn_file, self.policy_file)
+        if os.path.exists(self.policy_file):
+            self.policy = NumpyPolicy.load(self.policy_file)
+        else:
+            self.policy = NumpyPolicy.random_policy([self.state_size, self.fc1_dims, self.fc2_dims, self.action_size])
+        # The policy's actions are mapped straight to the player car's controls
+        self.controls = Controls.Controls(self.action_space, self.game.key_state)
+
+    # Drives the player car: reads the radar & speed, and acts on them every 'step_frequency' time steps
+    def update(self):
+        self.nn_inputs = self.radar.calc_radar_beams()              # Get the player car's current radar beam distance values
+        self.nn_inputs.append(self.player_car.distance)             # Add the player car's current speed as the final parameter to the input list
+        if self.time_step % self.step_frequency == 0:
+            self.act()
+        self.time_step += 1
+
+    # Makes the player car act on the policy's best action
+    def act(self):
+        self.action_choice = self.policy.act(self.nn_inputs)
+        self.controls.apply(self.action_choice)
+
+    def reset(self):
+        self.time_step = 0
+
+    # The pilot's time step (see RaceState)
+    def get_state(self):
+        return (self.time_step,)
+
+    def set_state(self, state):
+        self.time_step, = state
+
+    def close(self):
+        pass
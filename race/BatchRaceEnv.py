@@ -0,0 +1,207 @@
+import os
+import time
+import numpy as np
+
+from race import Game
+from race import Level
+from race import AiRadar
+from race import Reward
+from race import SpriteCache
+
+# The BatchRaceEnv class simulates N independent player cars on the same level in lockstep, with every car's state
+# kept in NumPy arrays (struct-of-arrays) instead of one PlayerCar object per car.  Each step runs the PlayerCar's
+# control signal, turning (calc_turn_angle), speed (calc_distance), and movement (move) calcs, the level collision
+# check, the lap count (one progress map lookup per car, see ProgressMap), and the radar for all N cars at once.  Cars only see the level (no NPCs or
+# other cars).  Finished cars (collision, race finished, or out of time) are automatically reset to the start line,
+# so every step returns N fresh transitions in the same format as the RaceEnv: (observations, rewards, dones, info).
+# The reward is the radar reward, or (reward="progress") the distance driven along the track (see Reward).
+class BatchRaceEnv:
+
+    def __init__(self, num_cars, level="track_1.png", player_car="red_car.png", frame_skip=1, episode_length=120000, reward="radar"):
+        # A headless game for pygame, the image directories and the player attributes
+        self.game = Game.Game(headless=True)
+        self.num_cars = num_cars
+        self.frame_skip = frame_skip
+        self.episode_length = episode_length
+        self.reward_type = reward       # "radar" or "progress"
+        self.frame_time = 1000 / self.game.FPS
+        self.level = Level.Level(self.game.level_image_directory + level)
+        self.grid = self.level.get_grid()
+        self.progress_map = self.level.get_progress_map()
+        self.level_width = self.level.image.get_width()
+        self.level_height = self.level.image.get_height()
+        self.radar_length = 500
+        # Same action space as the AiAgent, as a table of (forward, left, right, e_brake) key booleans per action
+        self.action_space = [[],["forward"], ["forward", "left"], ["forward", "right"]]
+        self.action_size = len(self.action_space)
+        self.observation_size = 6
+        self.action_keys = np.array([[key in action for key in ("forward", "left", "right", "e_brake")] for action in self.action_space])
+
+        # Player car attributes (as defined in the Game class), converted the same way the PlayerCar does
+        attributes = self.game.init_player_attributes(self.game.car_image_directory + player_car, self.level.player_start_coords)
+        self.max_speed = attributes["MAX_SPEED"] / 10
+        self.accel = attributes["ACCEL"] / 100
+        self.handling = attributes["HANDLING"]
+        self.deceleration = attributes["DECELERATION"]
+        self.e_brake_deceleration = attributes["E_BRAKE_DECEL"]
+        self.e_brake_handling = attributes["E_BRAKE_HANDLING"]
+        self.start_coords = attributes["START_COORDS"]
+        # Car image sizes at every angle (the car's rect size) and, like the PlayerCar's collision mask, the
+        # outline of the car's mask at its start angle--used to detect collisions with the level boundary
+        image_basename = os.path.splitext(self.game.car_image_directory + player_car)[0]
+        sizes = [SpriteCache.get_sprite(image_basename, angle)[0].get_size() for angle in range(0, 360, 1)]
+        self.image_widths = np.array([size[0] for size in sizes])
+        self.image_heights = np.array([size[1] for size in sizes])
+        self.outline = np.array(SpriteCache.get_sprite(image_basename, self.start_coords[2])[1].outline())
+
+        # Every car's state
+        self.x = np.zeros(num_cars)
+        self.y = np.zeros(num_cars)
+        self.angle = np.zeros(num_cars)
+        self.previous_distance = np.zeros(num_cars)     # Speed
+        self.throttle = np.zeros(num_cars, dtype=bool)
+        self.e_brake = np.zeros(num_cars, dtype=bool)
+        self.throttle_start_time = np.zeros(num_cars)
+        self.throttle_time = np.zeros(num_cars)
+        self.lap_count = np.zeros(num_cars, dtype=np.int32)
+        self.progress = np.full(num_cars, -1.)     # Fraction of the current lap (the last one on the track, -1 until it's been on it)
+        self.episode_timer = np.zeros(num_cars)
+        self.score = np.zeros(num_cars)
+        self.ticks = self.frame_time    # Simulated time (ms), same as the SimClock
+        self.reset()
+
+    # Resets every car (or only the cars where 'cars' is True) and returns all cars' observations
+    def reset(self, cars=None):
+        if cars is None:
+            cars = np.ones(self.num_cars, dtype=bool)
+        self.x[cars] = self.start_coords[0]
+        self.y[cars] = self.start_coords[1]
+        self.angle[cars] = self.start_coords[2]
+        self.previous_distance[cars] = 0
+        self.throttle[cars] = False
+        self.e_brake[cars] = False
+        self.throttle_start_time[cars] = 0
+        self.throttle_time[cars] = 0
+        self.lap_count[cars] = 0
+        self.progress[cars] = -1
+        self.update_laps(cars)
+        self.episode_timer[cars] = 0
+        self.score[cars] = 0
+        return self.observe()
+
+    # Performs one action per car (array of N action indexes) for 'frame_skip' frames.  Cars that finish their
+    # episode during the step are reset; their final observation is returned in info["final_observation"]
+    def step(self, actions):
+        keys = self.action_keys[actions]
+        done = np.zeros(self.num_cars, dtype=bool)
+        collision = np.zeros(self.num_cars, dtype=bool)
+        race_progress = self.race_progress()
+        for frame in range(0, self.frame_skip, 1):
+            # Cars that are already done hold still for the rest of the step
+            self.set_signals(keys, ~done)
+            self.move(~done)
+            self.ticks += self.frame_time
+            self.episode_timer[~done] += self.frame_time
+            collision |= self.level_collisions() & ~done
+            self.update_laps(~done)
+            done |= collision | (self.lap_count > self.level.laps) | (self.episode_timer > self.episode_length)
+        observations = self.observe()
+        if self.reward_type == "progress":
+            rewards = Reward.progress_reward(race_progress, self.race_progress(), self.progress_map.lap_length)
+        else:
+            rewards = Reward.radar_reward(observations[:, :5].T, observations[:, 5])
+        self.score += rewards
+        info = {"lap_count": self.lap_count.copy(), "collision": collision, "score": self.score.copy(),
+                "progress": self.race_progress(), "final_observation": observations[done]}
+        if done.any():
+            observations = self.reset(done)
+        return observations, rewards, done, info
+
+    # PlayerCar.set_signals & calc_turn_angle for the cars being updated
+    def set_signals(self, keys, cars):
+        forward, left, right, e_brake = keys[:, 0], keys[:, 1], keys[:, 2], keys[:, 3]
+        # Turning (uses the last frame's throttle & e-brake, as the PlayerCar does)
+        moving = cars & (self.previous_distance > 0)
+        handling = self.handling * (self.previous_distance / self.max_speed)
+        handling = np.where(self.e_brake & ~self.throttle, self.e_brake_handling, handling)
+        self.angle -= np.where(moving & left, handling, 0)
+        self.angle += np.where(moving & right, handling, 0)
+        self.angle %= 360
+        # Throttle & e-brake
+        self.throttle = np.where(cars, forward, self.throttle)
+        self.e_brake = np.where(cars, e_brake, self.e_brake)
+        braking = cars & self.e_brake
+        self.throttle_start_time[braking] = 0
+        self.throttle_time[braking] = 0
+        # Time the throttle has been held down (s), used for acceleration
+        start = cars & self.throttle & (self.throttle_start_time == 0)
+        held = cars & self.throttle & ~start
+        released = cars & ~self.throttle
+        self.throttle_start_time[start] = self.ticks
+        self.throttle_time[held] = (self.ticks - self.throttle_start_time[held]) / 1000
+        self.throttle_start_time[released] = 0
+        self.throttle_time[released] = 0
+
+    # PlayerCar.calc_distance & move for the cars being updated
+    def move(self, cars):
+        coast = np.maximum(0, self.previous_distance - self.deceleration)
+        brake = np.maximum(0, self.previous_distance - self.e_brake_deceleration)
+        accelerate = self.previous_distance + self.accel * self.throttle_time
+        distance = np.where(self.e_brake, brake, np.where(self.throttle_time == 0, coast, accelerate))
+        distance = np.minimum(distance, self.max_speed)
+        distance = np.where(cars, distance, 0)
+        self.previous_distance = np.where(cars, distance, self.previous_distance)
+        rad = np.radians(self.angle)
+        self.x += distance * np.cos(rad)
+        self.y += distance * np.sin(rad)
+
+    # The cars' rects (x, y, w, h): like the PlayerCar, the rect's top left is the car's x, y (rounded, as a
+    # pygame Rect does) and its size is the size of the car's image at its current (truncated) angle
+    def rects(self):
+        angles = self.angle.astype(np.int32) % 360
+        x = np.floor(self.x + .5).astype(np.int32)
+        y = np.floor(self.y + .5).astype(np.int32)
+        return x, y, self.image_widths[angles], self.image_heights[angles]
+
+    # True for each car whose collision mask (outline) overlaps the level boundary
+    def level_collisions(self):
+        x, y, w, h = self.rects()
+        xs = x[:, None] + self.outline[:, 0]
+        ys = y[:, None] + self.outline[:, 1]
+        return self.grid.occupied(xs, ys).any(axis=1)
+
+    # FinishLine.track lap counting for the cars being updated: progress drops from the end of the lap back to 0 as
+    # a car crosses the finish line, and the reverse if it backs over it (cars off the track keep their last progress)
+    def update_laps(self, cars):
+        x, y, w, h = self.rects()
+        progress = self.progress_map.lookup(x + w // 2, y + h // 2)
+        on_track = cars & (progress >= 0)
+        tracked = on_track & (self.progress >= 0)
+        change = progress - self.progress
+        self.lap_count[tracked & (change < -.5)] += 1
+        self.lap_count[tracked & (change > .5)] -= 1
+        self.progress = np.where(on_track, progress, self.progress)
+
+    # Every car's race progress: laps completed plus the fraction of the current lap
+    def race_progress(self):
+        return self.lap_count + np.maximum(0, self.progress)
+
+    # All cars' DQN inputs: their radar beam distances and their speed, shape (N, 6)
+    def observe(self):
+        x, y, w, h = self.rects()
+        angles = AiRadar.beam_angles(self.angle.astype(np.int32), self.level_width, self.level_height)
+        distances = self.grid.cast_rays(x + .5 * w, y + .5 * h, angles, self.radar_length)[0]
+        observations = np.empty((self.num_cars, self.observation_size), dtype=np.float32)
+        observations[:, :5] = distances
+        observations[:, 5] = self.previous_distance
+        return observations
+
+# Measures the batched simulation speed (transitions per second) by driving all cars with random actions
+# (run from the game's root directory: python -m race.BatchRaceEnv)
+if __name__ == '__main__':
+    env = BatchRaceEnv(256)
+    steps = 200
+    start = time.perf_counter()
+    for i in range(0, steps, 1):
+        observations, rewards, dones, info = env.step(np.random.randint(env.action_size, size=env.num_cars))
+    print("Transitions per second:", int(steps * env.num_cars / (time.perf_counter() - start)))
@@ -0,0 +1,150 @@
+import sys
+import time
+import numpy as np
+
+# The BoundaryField class is built once per level from its occupancy grid and tells, for any point near the level
+# boundary, which way is out of the wall and how far the wall reaches towards the point--so a car that hit the wall
+# is resolved w/one lookup at its center, instead of moving its mask around the level mask & testing again.
+# The level is split into square cells (a cell is a wall cell if it holds any boundary pixel), and every cell finds
+# the nearest wall cell within 'reach' cells (a Euclidean distance transform, exact within the reach).  The outward
+# normal points from that wall cell to the cell, and the distance is to the wall cell's edge.  Wall cells find the
+# nearest free cell instead: their normal points out of the wall towards it, and their distance is negative (inside
+# the wall).  Only the normal (int8, scaled by 127) & the distance to the wall (int16 px) are kept for each cell.
+# The field is built when the level pack is compiled (see from_grid & LevelPack) and memory-mapped from it.
+class BoundaryField:
+
+    def __init__(self, normal_x, normal_y, distance, cell_size, reach):
+        self.normal_x = normal_x        # int8 arrays (rows, columns), the normal * 127
+        self.normal_y = normal_y
+        self.distance = distance        # int16 array (rows, columns), px
+        self.cell_size = cell_size      # Cell size (px), a multiple of 8 (one byte of the bit-packed grid)
+        self.reach = reach              # How far (cells) from the wall the field reaches
+        self.rows, self.columns = distance.shape
+
+    # Returns the outward wall normal (unit vector, or (0, 0) if there's no wall in reach) and the distance (px) from
+    # the point (x, y) to the wall's edge along it.  x & y may be numbers or arrays (ie. for many cars at once)
+    def lookup(self, x, y):
+        rows, columns = self.cells(x, y)
+        return self.normal_x[rows, columns] / 127., self.normal_y[rows, columns] / 127., self.distance[rows, columns]
+
+    # Returns the (rows, columns) of the cells the points (x, y) are in.  A point outside of the level is in the
+    # nearest cell on the level's edge (which is never farther from the wall than the point itself)
+    def cells(self, x, y):
+        columns = np.clip(np.asarray(x) // self.cell_size, 0, self.columns - 1).astype(np.intp)
+        rows = np.clip(np.asarray(y) // self.cell_size, 0, self.rows - 1).astype(np.intp)
+        return rows, columns
+
+    # Returns the outward wall normal at the center of a car's rect, and how deep (px) the rect reaches into the wall
+    # along it (half the rect's extent along the normal, less the distance from its center to the wall).  Reads the
+    # one cell w/plain indexing, much faster than lookup's array ops for a single car
+    def collision(self, rect):
+        column = rect.centerx // self.cell_size
+        row = rect.centery // self.cell_size
+        if column < 0 or column >= self.columns or row < 0 or row >= self.rows:
+            return 0., 0., 0.
+        normal_x = self.normal_x.item(row, column) / 127.
+        normal_y = self.normal_y.item(row, column) / 127.
+        extent = (abs(normal_x) * rect.width + abs(normal_y) * rect.height) / 2
+        return normal_x, normal_y, max(0., extent - self.distance.item(row, column))
+
+    # Returns the distance (px) from the point (x, y) to the wall's edge (scalar version of lookup's distance, w/the
+    # same nearest edge cell for a point outside of the level)
+    def distance_at(self, x, y):
+        column = min(max(int(x // self.cell_size), 0), self.columns - 1)
+        row = min(max(int(y // self.cell_size), 0), self.rows - 1)
+        return self.distance.item(row, column)
+
+    # Bytes held by the field
+    def memory_usage(self):
+        return self.normal_x.nbytes + self.normal_y.nbytes + self.distance.nbytes
+
+# Default cell size (px) & reach (cells): the field reaches 128 px from the wall, past the center of a car (at any
+# angle) that's touching it
+CELL_SIZE = 8
+REACH = 16
+
+# Builds a level's boundary field from its occupancy grid
+def from_grid(grid, cell_size=CELL_SIZE, reach=REACH):
+    walls = cell_coverage(grid, cell_size) > 0
+    # Offsets (cells) to the nearest wall cell from each free cell, & to the nearest free cell from each wall cell
+    offset_x, offset_y, found = nearest_offsets(walls, reach)
+    free_x, free_y, free_found = nearest_offsets(~walls, reach)
+    offset_x[walls] = -free_x[walls]        # (negated: the normal points from the wall, towards the free cell)
+    offset_y[walls] = -free_y[walls]
+    found[walls] = free_found[walls]
+    length = np.hypot(offset_x, offset_y)
+    length[~found] = np.inf     # (no wall in reach, or deep inside it: no normal)
+    normal_x = np.round(-offset_x / length * 127).astype(np.int8)
+    normal_y = np.round(-offset_y / length * 127).astype(np.int8)
+    distance = np.where(found, (length - .5) * cell_size, (reach + .5) * cell_size)
+    distance[walls] *= -1
+    return BoundaryField(normal_x, normal_y, np.round(distance).astype(np.int16), cell_size, reach)
+
+# Number of set bits in each byte value
+BIT_COUNTS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+# Counts the boundary pixels in each cell of the grid (a strip of cell rows at a time)
+def cell_coverage(grid, cell_size, strip_cells=64):
+    cell_bytes = cell_size // 8
+    rows = (grid.height + cell_size - 1) // cell_size
+    columns = (grid.packed.shape[1] + cell_bytes - 1) // cell_bytes
+    coverage = np.zeros((rows, columns), dtype=np.int32)
+    strip_height = strip_cells * cell_size
+    for y in range(0, grid.height, strip_height):
+        strip = BIT_COUNTS[grid.packed[y:y + strip_height]]
+        h = (strip.shape[0] + cell_size - 1) // cell_size
+        padded = np.zeros((h * cell_size, columns * cell_bytes), dtype=np.int32)
+        padded[:strip.shape[0], :strip.shape[1]] = strip
+        coverage[y // cell_size:y // cell_size + h] = padded.reshape(h, cell_size, columns, cell_bytes).sum(axis=(1, 3))
+    return coverage
+
+# Finds the offset (x, y) from each cell to the nearest set cell within 'reach' cells, and whether there is one.
+# First the nearest set cell along each row (scanning from the left & right), then, for each row offset y, the
+# nearest of those in the row y rows away--the nearest cell in 2D is the nearest in its own row
+def nearest_offsets(cells, reach):
+    rows, columns = cells.shape
+    index = np.arange(columns)
+    far = reach + 1
+    left = np.maximum.accumulate(np.where(cells, index, -2 * columns), axis=1) - index
+    right = np.minimum.accumulate(np.where(cells, index, 3 * columns)[:, ::-1], axis=1)[:, ::-1] - index
+    row_x = np.clip(np.where(-left <= right, left, right), -far, far).astype(np.int32)
+    best = np.full((rows, columns), 2 * far * far, dtype=np.int32)      # Squared distance to the nearest set cell
+    offset_x = np.zeros((rows, columns), dtype=np.int32)
+    offset_y = np.zeros((rows, columns), dtype=np.int32)
+    for y in range(-reach, reach + 1, 1):
+        source = row_x[max(0, y):rows + min(0, y)]
+        target = slice(max(0, -y), rows + min(0, -y))
+        squared = source * source + y * y
+        closer = squared < best[target]
+        best[target] = np.where(closer, squared, best[target])
+        offset_x[target] = np.where(closer, source, offset_x[target])
+        offset_y[target] = np.where(closer, y, offset_y[target])
+    return offset_x, offset_y, best <= reach * reach
+
+# Benchmark: time to build the field for a level, its size, and time to resolve a level collision w/the field vs.
+# the collision manager's shifted mask overlap tests, for cars placed at random on the level boundary
+# (run from the game's root directory: python -m race.BoundaryField [race/levels/track_1.png])
+if __name__ == '__main__':
+    import pygame
+    from race import Level
+    level = Level.Level(sys.argv[1] if len(sys.argv) > 1 else "./race/levels/track_1.png")
+    start = time.perf_counter()
+    field = from_grid(level.get_grid())
+    print("Field built in", round(time.perf_counter() - start, 2), "s |", field.columns, "x", field.rows, "cells |",
+          round(field.memory_usage() / 2 ** 20, 1), "MB")
+    car_mask = pygame.mask.Mask((40, 70), fill=True)
+    rng = np.random.default_rng(0)
+    ys, xs = np.nonzero(np.unpackbits(level.get_grid().packed[::97], axis=1)[:, :level.rect.width])
+    picks = rng.choice(len(xs), 1000)
+    rects = [pygame.Rect(int(xs[i]) - 20, int(ys[i]) * 97 - 35, 40, 70) for i in picks]
+    start = time.perf_counter()
+    for rect in rects:
+        for dx, dy in [(0, 0), (30, 0), (-30, 0), (0, 30), (0, -30)]:
+            level.mask.overlap(car_mask, (rect.x + dx, rect.y + dy))
+    mask_time = (time.perf_counter() - start) / len(rects)
+    start = time.perf_counter()
+    for rect in rects:
+        level.mask.overlap(car_mask, (rect.x, rect.y))
+        field.collision(rect)
+    field_time = (time.perf_counter() - start) / len(rects)
+    print("Level collision: shifted mask overlaps", round(mask_time * 1e6, 1), "us | one overlap + field lookup", round(field_time * 1e6, 1), "us")
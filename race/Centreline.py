@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import numpy as np
+
+from race import ProgressMap
+from race import BoundaryField
+from race import LevelPack
+
+# The Centreline class is a level's track centreline: a smooth closed curve of evenly spaced points around the track,
+# starting at the finish line & going the way the cars race, w/the distance to the track's edge on either side of
+# each point.  It's extracted offline from the level's progress map (see from_progress_map) and places the NPCs'
+# waypoints--a series of points across the track every so often along it (see waypoint_series), written in the level
+# init data file's format (see write_waypoints & LevelPack.read_init_data)--instead of clicking them by hand w/the
+# image plotter tool (race/levels/image_plotter_tool.py).
+class Centreline:
+
+    def __init__(self, x, y, left, right):
+        self.x = x              # Points (px) along the centreline
+        self.y = y
+        self.left = left        # Distance (px) from each point to the track's edge on its left & on its right
+        self.right = right
+        self.normal_x, self.normal_y = normals(x, y)    # Unit vectors from each point to its right
+
+    # Length (px) of the centreline, all the way around
+    def length(self):
+        return np.hypot(np.diff(self.x, append=self.x[0]), np.diff(self.y, append=self.y[0])).sum()
+
+    # Series of waypoints every 'spacing' px along the centreline (from just past the finish line, all the way around
+    # to it), each w/'lanes' points spread evenly across the track, 'margin' px clear of its edges (or at the center
+    # of the track, where it's narrower than that).  Lists of (x, y) tuples, one list per series (see NpcCar)
+    def waypoint_series(self, spacing=300, lanes=4, margin=100):
+        step = self.length() / len(self.x)
+        series = []
+        for i in np.arange(spacing / step, len(self.x), spacing / step).astype(np.intp):
+            low = margin - self.left[i]
+            high = self.right[i] - margin
+            if lanes == 1 or high < low:
+                offsets = [(low + high) / 2]
+            else:
+                offsets = np.linspace(low, high, lanes)
+            series.append([(int(round(self.x[i] + offset * self.normal_x[i])), int(round(self.y[i] + offset * self.normal_y[i])))
+                           for offset in offsets])
+        return series
+
+# Builds a level's centreline from its progress map, its finish line (x, y, width, height, ...) & the player's start
+# angle (degrees, the way cars cross the finish line, see ProgressMap.crossing).  The middle of the track is the ridge
+# of its clearance--each point's distance to the nearest cell off the track (a distance transform of the progress
+# map's off track cells, 'block' x 'block' of them at a time)--and the ridge is walked from the finish line all the
+# way around (see trace), instead of tracing & pruning a skeleton of the whole track.  The walk is then cut short of
+# any loops, smoothed ('smoothing' px), spaced 'step' px apart, and moved to halfway between the track's edges
+def from_progress_map(progress_map, finish_line_coords, start_angle=270, step=16, smoothing=64, max_width=2000, block=2):
+    off_track = progress_map.progress == ProgressMap.OFF_TRACK
+    rows = -(-progress_map.rows // block)
+    columns = -(-progress_map.columns // block)
+    padded = np.ones((rows * block, columns * block), dtype=bool)
+    padded[:progress_map.rows, :progress_map.columns] = off_track
+    blocked = padded.reshape(rows, block, columns, block).any(axis=(1, 3))
+    cell_size = progress_map.cell_size * block
+    reach = max_width // (2 * cell_size)
+    offset_x, offset_y, found = BoundaryField.nearest_offsets(blocked, reach)
+    clearance = np.where(found, np.hypot(offset_x, offset_y), reach + 1)
+    x, y = cut_loops(*trace(progress_map, clearance, cell_size, finish_line_coords, start_angle), 4 * cell_size)
+    x, y = resample(*smooth(*resample(x, y, step), smoothing / step), step)
+    left, right = edges(progress_map, x, y, *normals(x, y), max_width)
+    # (the shift to halfway is smoothed too--a normal that just catches the inside corner of a hairpin would
+    # otherwise pull its point well across the track)
+    normal_x, normal_y = normals(x, y)
+    shift = np.clip((right - left) / 2, -smoothing, smoothing)
+    shift = smooth(shift, shift, smoothing / step)[0]
+    x, y = resample(x + shift * normal_x, y + shift * normal_y, step)
+    left, right = edges(progress_map, x, y, *normals(x, y), max_width)
+    return Centreline(x, y, left, right)
+
+# Headings (radians) the walk may turn to at each step, either side of straight ahead
+TURNS = np.radians(np.linspace(-90, 90, 25))
+
+# Walks the middle of the track (w/its clearance in cells of 'cell_size' px) from the middle of the edge of the finish
+# line cars leave it by (see ProgressMap.crossing), two cells at a time: to whichever of the headings within 90
+# degrees either way keeps the most clearance all along a ray as long as the clearance where the walk is (the
+# straightest, of equals).  So the walk follows the track's middle around bends, & doesn't turn off into the spurs a
+# skeleton of the track would have at its corners.  Stops once the walk crosses the finish line again (its progress
+# drops back to 0, see ProgressMap).
+# Raises ValueError if the walk runs off the track or doesn't get back to the finish line
+def trace(progress_map, clearance, cell_size, finish_line_coords, start_angle):
+    line_x, line_y, line_w, line_h = finish_line_coords[:4]
+    vertical, up = ProgressMap.crossing(start_angle)
+    if vertical:
+        x = [line_x + line_w / 2]
+        y = [float(line_y if up else line_y + line_h)]
+        heading = -np.pi / 2 if up else np.pi / 2
+    else:
+        x = [float(line_x if up else line_x + line_w)]
+        y = [line_y + line_h / 2]
+        heading = np.pi if up else 0.
+    step = 2 * cell_size
+    progress = 0.
+    rows, columns = clearance.shape
+    for i in range(0, 4 * progress_map.lap_length // step, 1):
+        here = clearance[min(max(int(y[-1] // cell_size), 0), rows - 1), min(max(int(x[-1] // cell_size), 0), columns - 1)]
+        if here == 0:
+            raise ValueError("The centreline walk ran off the track at " + str((round(x[-1]), round(y[-1]))))
+        headings = heading + TURNS
+        distances = np.arange(1, max(2, int(here) + 1)) * cell_size
+        ray_x = x[-1] + np.cos(headings)[:, None] * distances
+        ray_y = y[-1] + np.sin(headings)[:, None] * distances
+        ray = clearance[np.clip(ray_y // cell_size, 0, rows - 1).astype(np.intp), np.clip(ray_x // cell_size, 0, columns - 1).astype(np.intp)]
+        best = np.argmax(ray.min(axis=1) - .001 * np.abs(TURNS))
+        heading = headings[best]
+        ahead_x = x[-1] + step * np.cos(heading)
+        ahead_y = y[-1] + step * np.sin(heading)
+        ahead_progress = progress_map.at(ahead_x, ahead_y)
+        if ahead_progress >= 0:
+            if ahead_progress < progress - .5:
+                return np.array(x), np.array(y)     # Back at the finish line
+            progress = ahead_progress
+        x.append(ahead_x)
+        y.append(ahead_y)
+    raise ValueError("The centreline walk didn't get back to the finish line")
+
+# Cuts the loops out of a walk: wherever it comes back within 'distance' px of a point more than 'steps' steps
+# before, the steps in between are dropped (ie. where the walk ran into the outside corner of a hairpin & turned back)
+def cut_loops(x, y, distance, steps=8):
+    keep = []
+    i = 0
+    while i < len(x):
+        keep.append(i)
+        later = np.arange(i + steps, len(x) - steps)     # (the end of the walk is back at its start)
+        close = later[np.hypot(x[later] - x[i], y[later] - y[i]) < distance]
+        i = close[-1] if len(close) > 0 else i + 1
+    return x[keep], y[keep]
+
+# Unit vectors to the right of each point of a closed curve (screen coordinates, y down), from its direction there
+def normals(x, y):
+    direction_x = np.roll(x, -1) - np.roll(x, 1)
+    direction_y = np.roll(y, -1) - np.roll(y, 1)
+    length = np.maximum(np.hypot(direction_x, direction_y), 1e-9)
+    return -direction_y / length, direction_x / length
+
+# Points spaced 'step' px apart along a closed curve, starting at its first point
+def resample(x, y, step):
+    segments = np.hypot(np.diff(x, append=x[0]), np.diff(y, append=y[0]))
+    distance = np.concatenate(([0], np.cumsum(segments)))
+    points = np.arange(0, distance[-1], distance[-1] / max(3, round(distance[-1] / step)))
+    return np.interp(points, distance, np.append(x, x[0])), np.interp(points, distance, np.append(y, y[0]))
+
+# Smooths a closed curve w/a Gaussian of 'sigma' points (wrapping around its ends)
+def smooth(x, y, sigma):
+    radius = min(len(x) // 2, int(3 * sigma) + 1)
+    kernel = np.exp(-.5 * (np.arange(-radius, radius + 1) / max(sigma, 1e-9)) ** 2)
+    kernel /= kernel.sum()
+    wrap = lambda values: np.convolve(np.concatenate((values[-radius:], values, values[:radius])), kernel, mode="valid")
+    return wrap(x), wrap(y)
+
+# Distance (px) from each point to the track's edge on its left & on its right (along the normal, to its right): the
+# last point on the track, stepping half a cell at a time across it (up to 'max_width' px) until the progress map is
+# off the track
+def edges(progress_map, x, y, normal_x, normal_y, max_width):
+    step = progress_map.cell_size / 2
+    offsets = np.arange(step, max_width, step)
+    distances = []
+    for side in (-1, 1):
+        off_track = progress_map.lookup(x[:, None] + side * offsets * normal_x[:, None],
+                                        y[:, None] + side * offsets * normal_y[:, None]) < 0
+        first = np.where(off_track.any(axis=1), off_track.argmax(axis=1), len(offsets) - 1)
+        distances.append(offsets[first] - step / 2)
+    return distances[0], distances[1]
+
+# Writes waypoint series one per line (the same format as the image plotter tool's output file)
+def write_waypoints(series, file):
+    with open(file, "w") as f:
+        for points in series:
+            f.write(str(points) + "\n")
+
+# Replaces the NPC waypoint series at the end of a level's init data file (every line after the NPC start coords)
+# w/new ones, keeping the rest of the file & its comments as they are
+def replace_init_data_waypoints(series, file):
+    data = LevelPack.read_init_data(file)
+    with open(file) as f:
+        lines = f.readlines()
+    data_lines = [i for i, line in enumerate(lines) if line.strip() != "" and not line.startswith("#")]
+    first = data_lines[data["npcs"] + 5] if len(data_lines) > data["npcs"] + 5 else len(lines)
+    with open(file, "w") as f:
+        f.writelines(lines[:first])
+        for points in series:
+            f.write(str(points) + "\n")
+
+# Extracts the centreline of the given levels (or every level in the levels directory) & writes their NPC waypoints
+# to the level's waypoints file (ie. track_1_npc_waypoints.txt).  W/--init-data, also replaces the waypoints in the
+# level's init data file (ie. track_1_init_data.txt)
+# (run from the game's root directory: python -m race.Centreline [--init-data] [race/levels/track_1.png ...])
+if __name__ == '__main__':
+    from race import Level
+    arguments = sys.argv[1:]
+    init_data = "--init-data" in arguments
+    image_files = [argument for argument in arguments if argument != "--init-data"]
+    if len(image_files) == 0:
+        directory = "./race/levels/"
+        image_files = [directory + file for file in sorted(os.listdir(directory)) if file.endswith(".png")]
+    for image_file in image_files:
+        start = time.perf_counter()
+        level = Level.Level(image_file)
+        progress_map = level.get_progress_map()
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        centreline = from_progress_map(progress_map, level.finish_line_coords, level.player_start_coords[2])
+        series = centreline.waypoint_series()
+        extract_time = time.perf_counter() - start
+        waypoints_file = os.path.splitext(image_file)[0] + "_npc_waypoints.txt"
+        write_waypoints(series, waypoints_file)
+        if init_data:
+            replace_init_data_waypoints(series, LevelPack.data_file(image_file))
+        print(image_file, "| level loaded in", round(load_time, 2), "s | centreline extracted in", round(extract_time, 2), "s |",
+              round(centreline.length()), "px long |", round(np.median(centreline.left + centreline.right)), "px wide (median) |",
+              len(series), "waypoint series written to", waypoints_file)
@@ -0,0 +1,78 @@
+import os
+import random
+import numpy as np
+import torch as torch
+
+# A training checkpoint is a single versioned file holding everything needed to continue training exactly where it
+# left off: the policy & target DQN weights, the optimizer's state (ie. Adam's moments), the hyperparameters it was
+# trained with, the random number generators' states, the agent's counters (time step, epsilon, training steps),
+# and a pointer to the replay memory store (its directory & the header it was saved with--the replay memory itself
+# lives in its own memory-mapped files, see ReplayBuffer).  It's a torch.save file of plain dicts, lists, numbers,
+# and tensors only, so it loads w/torch.load's safe 'weights_only' mode, and it's memory-mapped on load (the tensors
+# are read from the file's pages as they're copied into the networks, w/o reading the whole file into memory first).
+VERSION = 1
+
+# The hyperparameters that must match for a checkpoint to be loaded (the network's shape)
+NETWORK_KEYS = ["state_size", "fc1_dims", "fc2_dims", "action_size"]
+
+# Builds a checkpoint from copies of the networks' & optimizer's states (see copy_tensors), taken by the caller
+def snapshot(policy, target, optimizer, hyperparameters, replay, state):
+    return {"version": VERSION,
+            "policy": policy,
+            "target": target,
+            "optimizer": optimizer,
+            "hyperparameters": dict(hyperparameters),
+            "rng": rng_state(),
+            "replay": replay,       # {"path": replay memory directory, "header": its header when saved}, or None
+            "state": dict(state)}   # The agent's counters, ie. {"time_step", "epsilon", "learn_steps"}
+
+# Loads a checkpoint file.  Returns None if there's none, or if it's from an unknown version or for a different network
+def load(file, hyperparameters):
+    if not os.path.exists(file):
+        return None
+    try:
+        checkpoint = torch.load(file, map_location="cpu", mmap=True, weights_only=True)
+    except Exception as error:
+        print("Checkpoint could not be loaded:", file, error)
+        return None
+    if checkpoint.get("version") != VERSION:
+        print("Checkpoint version", checkpoint.get("version"), "is not supported (expected " + str(VERSION) + "), ignoring", file)
+        return None
+    for key in NETWORK_KEYS:
+        if checkpoint["hyperparameters"].get(key) != hyperparameters[key]:
+            print("Checkpoint is for a different network (" + key + "), ignoring", file)
+            return None
+    return checkpoint
+
+# Loads a checkpoint's optimizer state.  The state is copied, so nothing is left pointing into the checkpoint file
+def load_optimizer(optimizer, state_dict):
+    optimizer.load_state_dict(copy_tensors(state_dict))
+
+# A copy of every tensor in a (nested) state dict, on the CPU
+def copy_tensors(obj):
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: copy_tensors(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(copy_tensors(value) for value in obj)
+    return obj
+
+# The states of Python's, NumPy's, and PyTorch's random number generators (as plain lists, numbers, & tensors)
+def rng_state():
+    name, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+    state = {"python": random.getstate(),
+             "numpy": [name, keys.tolist(), position, has_gauss, cached_gaussian],
+             "torch": torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state):
+    version, internal_state, gauss_next = state["python"]
+    random.setstate((version, tuple(internal_state), gauss_next))
+    name, keys, position, has_gauss, cached_gaussian = state["numpy"]
+    np.random.set_state((name, np.array(keys, dtype=np.uint32), position, has_gauss, cached_gaussian))
+    torch.set_rng_state(state["torch"].clone())
+    if "cuda" in state and torch.cuda.is_available() and len(state["cuda"]) == torch.cuda.device_count():
+        torch.cuda.set_rng_state_all(state["cuda"])
@@ -0,0 +1,118 @@
+import os
+import atexit
+import threading
+import torch as torch
+
+from race import NumpyPolicy
+
+# The CheckpointWriter class writes training checkpoints (the policy DQN, the replay memory, and the episode scores)
+# to disk on a background thread, so the race loop never waits on the disk.  The caller takes a cheap snapshot of
+# what's to be saved (ie. a copy of the DQN's weights, the replay memory's write position) and hands it to the
+# writer, which writes it as soon as it can.  Jobs are coalesced: if a newer snapshot of the same file is handed
+# over before the last one was written, only the newest is written.  Files are written to a temporary file and
+# then renamed over the old one (atomic), so a crash mid-write never leaves a corrupt file behind--only the last
+# complete one.  Pending checkpoints are always finished before the game exits.
+class CheckpointWriter:
+
+    def __init__(self):
+        self.jobs = {}              # Pending jobs by key: (function, args), oldest first
+        self.appends = {}           # Text waiting to be appended, by file
+        self.busy = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="CheckpointWriter", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # Queues a job, replacing any pending job with the same key
+    def submit(self, key, function, *args):
+        with self.condition:
+            self.jobs.pop(key, None)
+            self.jobs[key] = (function, args)
+            self.condition.notify_all()
+
+    # Saves a model's weights (a copy is taken now, the file is written later)
+    def save_model(self, model, file):
+        self.save_state_dict(copy_state_dict(model), file)
+
+    # Saves a copy of a model's weights that's already been taken
+    def save_state_dict(self, state_dict, file):
+        self.submit(("model", file), save_atomic, state_dict, file)
+
+    # Saves a training checkpoint (see Checkpoint), built from copies that have already been taken
+    def save_checkpoint(self, checkpoint, file):
+        self.submit(("checkpoint", file), save_atomic, checkpoint, file)
+
+    # Saves a copy of a model's weights that's already been taken, as a NumPy policy (see NumpyPolicy)
+    def save_numpy_policy(self, state_dict, file):
+        self.submit(("numpy_policy", file), NumpyPolicy.save, state_dict, file)
+
+    # Flushes memory-mapped replay memory, with its header as of now (see ReplayBuffer.flush)
+    def flush_replay(self, replay_memory, extra=None):
+        self.submit(("replay", replay_memory.path), replay_memory.write_files, replay_memory.snapshot_header(extra))
+
+    # Appends text to a file
+    def append_text(self, file, text):
+        with self.condition:
+            self.appends[file] = self.appends.get(file, "") + text
+        self.submit(("append", file), self.write_appends, file)
+
+    def write_appends(self, file):
+        with self.condition:
+            text = self.appends.pop(file, "")
+        with open(file, 'a+') as f:
+            f.write(text)
+
+    # Writer thread: runs the pending jobs in order until the writer is closed
+    def run(self):
+        while True:
+            with self.condition:
+                while len(self.jobs) == 0 and not self.closed:
+                    self.condition.wait()
+                if len(self.jobs) == 0:
+                    return
+                key = next(iter(self.jobs))
+                function, args = self.jobs.pop(key)
+                self.busy = True
+            try:
+                function(*args)
+            except Exception as error:
+                print("Checkpoint write failed:", key, error)
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    # Blocks until every pending job has been written (ie. before reading a checkpoint back)
+    def wait(self):
+        with self.condition:
+            while len(self.jobs) > 0 or self.busy:
+                self.condition.wait()
+
+    # Finishes the pending jobs and stops the writer thread
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+# A copy of a model's weights on the CPU
+def copy_state_dict(model):
+    return {name: tensor.detach().to("cpu", copy=True) for name, tensor in model.state_dict().items()}
+
+# Writes 'obj' to 'file' with torch.save, atomically: to a temporary file first, which then replaces the old file
+def save_atomic(obj, file):
+    temp_file = file + ".tmp"
+    with open(temp_file, 'wb') as f:
+        torch.save(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, file)
+
+# The game's checkpoint writer, shared by every AiAgent (started the first time it's needed)
+writer = None
+
+def get_writer():
+    global writer
+    if writer == None:
+        writer = CheckpointWriter()
+    return writer
@@ -0,0 +1,115 @@
+import sys
+import time
+import random
+import pygame
+
+# The CollisionGrid class detects the collisions between all cars (player & NPCs) once per frame, before the cars
+# move.  Instead of every car testing its rect against every other car's (N² tests, and each colliding pair twice),
+# the cars are binned into a uniform grid of square cells by the center of their rects, and a car is only tested
+# against the cars in its own & neighbouring cells.  The cells are at least as large as the largest car rect, so two
+# overlapping cars are always in the same or neighbouring cells.  Each pair of cars is tested once, and the result
+# is written to both cars: both are put in a collision state, w/the sides they collided on (opposite sides for each).
+# Like the collision managers' greedy player collision tests, a car's collision sides are set by its first collision.
+# A pair is always tested in the order the cars are listed in (the result can depend on which car is tested first).
+class CollisionGrid:
+
+    def __init__(self, cars, cell_size=128):
+        self.cars = cars
+        self.cell_size = cell_size
+        # Rect offsets (px) used to find which side of a car another car collided with (see collide)
+        self.offset_x = 60
+        self.offset_y = 60
+        self.pairs_tested = 0   # Num of pairs of cars tested in the last frame
+
+    # Bins the cars into the grid, then tests each car against the cars in its own cell & in the neighbouring cells
+    # that come after it (right, below left, below, below right), so each neighbouring pair is tested only once
+    def update(self):
+        cell_size = max(self.cell_size, max(max(car.rect.width, car.rect.height) for car in self.cars))
+        cells = {}      # (column, row): [(index, car), ...]
+        for index, car in enumerate(self.cars):
+            car.collision_player = False
+            key = (car.rect.centerx // cell_size, car.rect.centery // cell_size)
+            if key in cells:
+                cells[key].append((index, car))
+            else:
+                cells[key] = [(index, car)]
+        self.pairs_tested = 0
+        for (column, row), cell in cells.items():
+            for i in range(0, len(cell), 1):
+                for j in range(i + 1, len(cell), 1):
+                    self.collide(cell[i][1], cell[j][1])
+            for neighbour in [(column + 1, row), (column - 1, row + 1), (column, row + 1), (column + 1, row + 1)]:
+                if neighbour in cells:
+                    for index, car in cell:
+                        for other_index, other in cells[neighbour]:
+                            if index < other_index:
+                                self.collide(car, other)
+                            else:
+                                self.collide(other, car)
+
+    # Tests a pair of cars for a collision (their rects overlap).  If they collide, both cars are put in a collision
+    # state, and the sides they collided on are found by moving car2's rect 'offset' px in each direction & testing again
+    def collide(self, car1, car2):
+        self.pairs_tested += 1
+        rect1 = car1.rect
+        rect2 = car2.rect
+        if not rect1.colliderect(rect2):
+            return
+        first1 = not car1.collision_player
+        first2 = not car2.collision_player
+        car1.collision_player = True
+        car2.collision_player = True
+        # The rects already overlap vertically (horizontally), so moving car2 left or right (up or down) only
+        # needs a horizontal (vertical) overlap test
+        sides = []
+        if rect1.left < rect2.right + self.offset_x and rect2.left + self.offset_x < rect1.right:
+            sides.append(("collision_right", "collision_left"))     # car2 moved right still collides: car2's right side
+        if rect1.left < rect2.right - self.offset_x and rect2.left - self.offset_x < rect1.right:
+            sides.append(("collision_left", "collision_right"))
+        if rect1.top < rect2.bottom + self.offset_y and rect2.top + self.offset_y < rect1.bottom:
+            sides.append(("collision_down", "collision_up"))
+        if rect1.top < rect2.bottom - self.offset_y and rect2.top - self.offset_y < rect1.bottom:
+            sides.append(("collision_up", "collision_down"))
+        for side2, side1 in sides:
+            if first2:
+                set_side(car2, side2)
+            if first1:
+                set_side(car1, side1)
+
+# Sets a car's collision side, clearing the opposite side
+def set_side(car, side):
+    setattr(car, side, True)
+    setattr(car, OPPOSITE_SIDES[side], False)
+
+OPPOSITE_SIDES = {"collision_right": "collision_left", "collision_left": "collision_right",
+                  "collision_down": "collision_up", "collision_up": "collision_down"}
+
+# Benchmark: time to find every car-to-car collision once per frame, testing every car against every other car (the
+# collision managers' way, each pair twice) vs. the grid, for more & more cars on a track sized area
+# (run from the game's root directory: python -m race.CollisionGrid [num cars ...])
+if __name__ == '__main__':
+    counts = [int(count) for count in sys.argv[1:]] or [6, 50, 200, 1000]
+    for count in counts:
+        random.seed(0)
+        cars = []
+        for i in range(0, count, 1):
+            car = pygame.sprite.Sprite()
+            car.rect = pygame.Rect(random.randrange(0, 10000), random.randrange(0, 5000), 40, 70)
+            cars.append(car)
+        grid = CollisionGrid(cars)
+        frames = 20
+        start = time.perf_counter()
+        for frame in range(0, frames, 1):
+            colliding = 0
+            for car in cars:
+                for other in cars:
+                    if other != car and car.rect.colliderect(other.rect):
+                        colliding += 1
+                        break
+        all_pairs = (time.perf_counter() - start) / frames
+        start = time.perf_counter()
+        for frame in range(0, frames, 1):
+            grid.update()
+        grid_time = (time.perf_counter() - start) / frames
+        print(str(count).rjust(5), "cars | every pair:", round(all_pairs * 1000, 3), "ms | grid:", round(grid_time * 1000, 3), "ms,",
+              grid.pairs_tested, "pairs tested | colliding cars:", colliding, "(every pair)", sum(car.collision_player for car in cars), "(grid)")
@@ -1,39 +1,26 @@
+import math
 import pygame
 
 # This class inits a manager object for every instantiated player object (human and NPC), which 
-# they use to detect their in-game collisions between the level's boundaries and other player objects
+# they use to detect their in-game collisions with the level's boundaries.  (Collisions between
+# player objects are detected for all of them at once, once per frame, see CollisionGrid)
 class CollisionManager:
 
     def __init__(self, parent_object, game_objects):
         self.parent_object = parent_object                            # Set the collision managers owner object
         self.level = game_objects["level"]                            # Get the level object
-        self.collision_object_list = []                               # Create a collision list for all game objects
+        self.boundary_field = self.level.get_boundary_field()        # Wall normals used to find the collision's side
         
-        # Add all other in-game objects to a collsion object list (except the manager's parent object)
-        if game_objects["player_car"] != self.parent_object:
-            self.collision_object_list.append(game_objects["player_car"])
-        for npc in game_objects["npc_cars"]:
-            if npc != self.parent_object:
-                self.collision_object_list.append(npc)
+        self.swept = True       # Sweep coarse physics steps' moves for the level boundary (see sweep_level)
         
         # required vars
         self.offset = None
         self.overlap = None
-        self.obj_collision = None
     
     # Each in-game object will make a call to its manager once per every race loop iteration.
-    # in order to detect/calculate any collisions with any other in-game objects
+    # in order to detect/calculate any collisions with the level
     def get_collisions(self):   
-        # Test objects against other in-game objects
-        for player in self.collision_object_list:
-            self.determine_player_collisions(self.parent_object, player)
-        # NOTE: the following break statement is important to understand--
-        # Once a collision with another object is detected, we must break this loop, 
-        # so that the next comparison with the next game object won't overwrite the collision
-        # variables.  In otherwords, collision detection with other objects is greedy.
-            if self.parent_object.collision_player == True:
-                break
-        # Test object for collisions against the level - Always test level after player, to
+        # Test object for collisions against the level - Always test level after player (see CollisionGrid), to
         # Ensure all players stay in-bounds.
         self.determine_level_collisions(self.parent_object, self.level)
 
@@ -47,10 +34,31 @@ class CollisionManager:
             self.offset = (x - self.level.rect.x, y - self.level.rect.y)
             self.overlap = self.level.mask.overlap(obj.mask, (self.offset))   
     
+    # Used to determine where (which side) of the sprite image is colliding with the level.  Once the mask overlap
+    # finds a collision, one lookup in the level's boundary field gives the wall's outward normal at the sprite's
+    # center & how deep the sprite is in the wall: the wall is on the side(s) the normal points away from (see
+    # SIDE_ANGLE), and the depth is how far the sprite has to be pushed back out (see the cars' update).
+    def determine_level_collisions(self, obj, level):
+        # Check to see if a collision exists
+        self.level_calc_offset(obj)
+        if self.overlap:
+            obj.collision_level = True
+            normal_x, normal_y, obj.collision_depth = self.boundary_field.collision(obj.rect)
+            if normal_x == 0 and normal_y == 0:     # No normal (ie. deep inside a thick wall): test the sides instead
+                self.determine_level_sides(obj)
+            else:
+                obj.collision_right = normal_x < -SIDE_COMPONENT
+                obj.collision_left = normal_x > SIDE_COMPONENT
+                obj.collision_down = normal_y < -SIDE_COMPONENT
+                obj.collision_up = normal_y > SIDE_COMPONENT
+        # No collision with the level is detected, ensure variable is reset
+        else:
+            obj.collision_level = False
+
     # Used to determine where (which side) of the sprite image is colliding with the level
     # by moving the sprite's rectangle slightly and re-checking for the collision.
     # Then, if the collision still exists, we know the collision was in that direction
-    def determine_level_collisions(self, obj, level):
+    def determine_level_sides(self, obj):
         # Temporary rect coordinates used in re-calcs 
         x = obj.rect.x
         y = obj.rect.y
@@ -58,117 +66,125 @@ class CollisionManager:
         #(This would be dependent on image size of the car/player, fortunately, they're all the same size).
         X = 30                 
         Y = 30
-        
-        # Check to see if a collision exists
-        self.level_calc_offset(obj)
-        # A collision was detected, now we need to find where on the sprite image.
-        if self.overlap:
-            # Calcs to find where the collision is. And, sets player's variables accordingly
-            obj.collision_level = True
-            x += X
-            self.level_calc_offset(obj, x, y) # Subsequent calls used to determine which side collision occured
-            if self.overlap:
-                obj.collision_right = True
-                obj.collision_left = False
-            x = obj.rect.x
-            y = obj.rect.y
-            x -= X
-            self.level_calc_offset(obj, x, y)
-            if self.overlap:
-                obj.collision_left = True
-                obj.collision_right = False
-            x = obj.rect.x
-            y = obj.rect.y
-            y += Y
-            self.level_calc_offset(obj, x, y)
-            if self.overlap:
-                obj.collision_down = True
-                obj.collision_up = False
-            x = obj.rect.x
-            y = obj.rect.y
-            y -= Y
-            self.level_calc_offset(obj, x, y)
-            if self.overlap:
-                obj.collision_up = True
-                obj.collision_down = False
 
-        # No collision with the level is detected, ensure variable is reset
-        else:
-            obj.collision_level = False
-
-    # Same as level_calc_offset, except used between 2 players
-    # For this method, we don't care about the image mask, because we aren't worried about
-    # a collsiion with a specific color, only that the rect's of the game images overlap/collide.
-    def player_detect_collision(self, rect1, rect2):
-        self.obj_collision = pygame.Rect.colliderect(rect1, rect2) # returns -1 if no collision
+        # Calcs to find where the collision is. And, sets player's variables accordingly
+        x += X
+        self.level_calc_offset(obj, x, y) # Subsequent calls used to determine which side collision occured
+        if self.overlap:
+            obj.collision_right = True
+            obj.collision_left = False
+        x = obj.rect.x
+        y = obj.rect.y
+        x -= X
+        self.level_calc_offset(obj, x, y)
+        if self.overlap:
+            obj.collision_left = True
+            obj.collision_right = False
+        x = obj.rect.x
+        y = obj.rect.y
+        y += Y
+        self.level_calc_offset(obj, x, y)
+        if self.overlap:
+            obj.collision_down = True
+            obj.collision_up = False
+        x = obj.rect.x
+        y = obj.rect.y
+        y -= Y
+        self.level_calc_offset(obj, x, y)
+        if self.overlap:
+            obj.collision_up = True
+            obj.collision_down = False
 
-    def determine_player_collisions(self, obj1, obj2):
-        #  x,y temp coords for just one object
-        # (If we determine which "side" the collision has occured for one object,
-        # then we know it must be the opposite "side" on the other object)
-        rect1 = obj1.rect
-        rect2 = obj2.rect
+    # Sweeps the object's footprint (its mask) along a move from (start_x, start_y) to (end_x, end_y) that took
+    # 'steps' frames (a coarse physics step, see SimClock), testing it against the level at the end of each frame
+    # but the last--the same positions a frame by frame simulation would have tested, so the object can't skip over
+    # a wall in one big move.  Frames that end within 'clearance' px of the start are clear of the wall (per the
+    # boundary field) and aren't tested, so a move out in the open tests nothing.  Returns the position (x, y) at
+    # the end of the first frame that overlaps the level (where the object should stop, and the collision is found
+    # on the next update as usual), or None if the whole move is clear (the end is tested on the next update)
+    def sweep_level(self, obj, start_x, start_y, end_x, end_y, steps, clearance=None):
+        if not self.swept:
+            return None
+        if clearance == None:
+            clearance = self.clearance(obj, start_x, start_y)
+        step_x = (end_x - start_x) / steps
+        step_y = (end_y - start_y) / steps
+        length = math.hypot(step_x, step_y)
+        first = 1
+        if clearance > 0 and length > 0:
+            first = int(clearance / length) + 1
+        rect = pygame.Rect(obj.rect)
+        for step in range(first, steps, 1):
+            x = start_x + step_x * step
+            y = start_y + step_y * step
+            rect.x = x      # (rounded, the same as the object's rect)
+            rect.y = y
+            self.level_calc_offset(obj, rect.x, rect.y)
+            if self.overlap:
+                return x, y
+        return None
 
-        # Rect offset constants again (again may need to be changed depending on sprite image size)
-        X = 60
-        Y = 60
-        # Calc the offset of the image masks
-        self.player_detect_collision(rect1, rect2)
-        
-        # If a collision between players was detected, perfoms calcs
-        # moving the rects coords of each obj and makes subsequent calls
-        # player_detect_collisions, to find where/which side the collision is on. 
-        # And, then sets each player object's variables accordingly
-        if  self.obj_collision:
-            obj1.collision_player = True    # Set obj1 into a collision state
-            obj2.collision_player = True    # Set obj2 into a collision state
-            
-            # Move copy of obj2 rect's coords in different directions and re-test
-            # Until every side of object rects are tested and determined
-            temp_rect = obj2.rect.copy()
-            temp_rect.x += X
-            self.player_detect_collision(rect1, temp_rect)
-            if self.obj_collision:
-                obj2.collision_right = True
-                obj2.collision_left = False
-                obj1.collision_right = False
-                obj1.collision_left = True
-            temp_rect = obj2.rect.copy()
-            temp_rect.x -= X
-            self.player_detect_collision(rect1, temp_rect)
-            if self.obj_collision:
-                obj2.collision_left = True
-                obj2.collision_right = False
-                obj1.collision_left = False
-                obj1.collision_right = True
-            temp_rect = obj2.rect.copy()
-            temp_rect.y += Y
-            self.player_detect_collision(rect1, temp_rect) 
-            if self.obj_collision:
-                obj2.collision_down = True
-                obj2.collision_up = False
-                obj1.collision_down = False
-                obj1.collision_up = True
-            temp_rect = obj2.rect.copy()
-            temp_rect.y -= Y
-            self.player_detect_collision(rect1, temp_rect) 
-            if self.obj_collision:
-                obj2.collision_up = True
-                obj2.collision_down = False
-                obj1.collision_up = False
-                obj1.collision_down = True
-                
+    # How far (px) the object w/its rect's top left at (x, y) can move in any direction before its mask can touch
+    # the level boundary (or a negative number if it may already): the boundary field's distance at the rect's
+    # center, less as far as the mask reaches from there, less the field's error (see NpcFleet)
+    def clearance(self, obj, x, y):
+        half_width = obj.rect.width / 2
+        half_height = obj.rect.height / 2
+        mask_width, mask_height = obj.mask.get_size()
+        reach = math.hypot(max(half_width, mask_width - half_width), max(half_height, mask_height - half_height))
+        return self.boundary_field.distance_at(x + half_width, y + half_height) - reach - 2 * self.boundary_field.cell_size
 
-        #No collision between the two objects are detected, ensure variables are reset
-        else:
-            obj1.collision_player = False
-            obj2.collision_player = False
-           # if self.parent_object == self.game_objects["player_car"]:
-             #   print("No collision.", obj1.collision_player)
-             #   print("R:", obj1.collision_right, "L:", obj1.collision_left, "U:", obj1.collision_up, "D", obj1.collision_down)
+# A collision side is set when the wall's normal is within this many degrees of pointing straight away from it:
+# a straight wall sets one side, a wall at 45 deg (ie. a corner) sets two
+SIDE_ANGLE = 67.5
+SIDE_COMPONENT = math.cos(math.radians(SIDE_ANGLE))
 
-        
-        
-        
-        
-        
+# Benchmark: cars driven at full speed from random spots on the track (random headings) until they hit the level
+# boundary, w/coarser & coarser physics steps, w/and w/o sweeping the moves.  A car that crosses the boundary (its
+# center's path goes over boundary pixels) w/o a collision being found has tunneled through the wall
+# (run from the game's root directory: python -m race.CollisionManager [track_1.png])
+if __name__ == '__main__':
+    import sys
+    import time
+    import random
+    import numpy as np
+    from race import RaceEnv
+    level = sys.argv[1] if len(sys.argv) > 1 else "track_1.png"
+    for step in [1, 2, 4, 8]:
+        for swept in [True, False] if step > 1 else [True]:
+            env = RaceEnv.RaceEnv(level=level, physics_step=step)
+            car = env.player_car
+            car.collision_manager.swept = swept
+            grid = env.race.level.get_grid()
+            points = [point for series in env.race.level.npc_points for point in series]
+            rng = random.Random(0)
+            hits = 0
+            tunnels = 0
+            updates = 0
+            run_time = 0
+            for trial in range(0, 300, 1):
+                env.reset(seed=trial)
+                x, y = rng.choice(points)
+                car.x, car.y, car.angle = x - 60, y - 36, rng.randrange(360)
+                car.rotate_image()
+                car.rect.x = car.x
+                car.rect.y = car.y
+                car.previous_distance = car.max_speed
+                for update in range(0, 200 // step, 1):
+                    center = car.rect.center
+                    start = time.perf_counter()
+                    observation, reward, done, info = env.step(1)
+                    run_time += time.perf_counter() - start
+                    updates += 1
+                    if done:
+                        hits += car.collision_level
+                        break
+                    # Crossed the boundary: the collision has to be found on the next update
+                    n = int(math.hypot(car.rect.centerx - center[0], car.rect.centery - center[1])) + 1
+                    if grid.occupied(np.linspace(center[0], car.rect.centerx, n).astype(int), np.linspace(center[1], car.rect.centery, n).astype(int)).any():
+                        env.step(1)
+                        hits += car.collision_level
+                        tunnels += not car.collision_level
+                        break
+            print("physics step", step, "frames", "(swept)  " if swept else "(unswept)", "| wall hits:", hits, "| tunneled:", tunnels,
+                  "|", round(run_time / updates * 1e6, 1), "us per update,", round(run_time / (updates * env.clock.get_time() / 1000) * 1000, 1), "ms per simulated s")
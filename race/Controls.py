@@ -0,0 +1,12 @@
+# The Controls class maps the agent's actions straight to the player car's controls.  The key states of every action
+# in the action space (ie. ["forward", "left"] = forward & left pressed, everything else released) are worked out
+# once, so performing an action is a single dict update of the game's key states instead of a loop over every key.
+class Controls:
+
+    def __init__(self, action_space, key_state):
+        self.key_state = key_state      # The game's key states (the player car reads its control signals from these)
+        self.action_keys = [{key: key in action for key in key_state} for action in action_space]
+
+    # Presses the keys of the action (an index into the action space) and releases all others
+    def apply(self, action):
+        self.key_state.update(self.action_keys[action])
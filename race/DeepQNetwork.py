@@ -7,7 +7,7 @@ import torch.nn.functional as F
 
 # Inits a Pytorch DeepQNetwork model w/ 2 fully-connected hidden layers (ie. a "deep" nn)--called by AiAgent Class
 class DeepQNetwork(nn.Module):
-    def __init__(self, learning_rate, input_dims, fc1_dims, fc2_dims, num_actions):
+    def __init__(self, learning_rate, input_dims, fc1_dims, fc2_dims, num_actions, device=None):
         super(DeepQNetwork, self).__init__()
         self.input_dims = input_dims
         self.fc1_dims = fc1_dims
@@ -19,7 +19,9 @@ class DeepQNetwork(nn.Module):
         self.fc3 = nn.Linear(self.fc2_dims, self.num_actions) # hidden layer2
         self.optimizer = optim.Adam(self.parameters(), lr=learning_rate)    # Init optimizer for training of network
         self.loss = nn.MSELoss() # Use Mean Square Error equation for loss
-        self.device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu') # Define the device--use GPU, if available
+        self.device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu') # Define the device--use GPU, if available (unless a device is given)
+        if device != None:
+            self.device = torch.device(device)
         self.to(self.device) # Sends itself to the device for processing
 
     # forward method overides parent class' (Module) forward method
@@ -28,3 +30,24 @@ class DeepQNetwork(nn.Module):
         x = F.relu(self.fc2(x))             # Pass layer 1 output into layer 2, activate output with relu function
         actions = self.fc3(x)               # Pass layer 2 output into layer 3, returns final output (actions)
         return actions                      # Returns output node values (determines best "action" to take)
+
+    # Performs one training step on a batch of replay memory transitions: computes the loss between the policy's
+    # Q values of the actions taken and their Bellman equation targets (estimated with the 'target' network),
+    # then backpropagates the loss and steps the optimizer.  If importance-sampling 'weights' are given (see
+    # PrioritizedReplayBuffer), each transition's squared error is scaled by its weight.
+    # Returns the loss tensor and the TD errors (target - Q value) of the batch.
+    def learn_batch(self, target, states, actions, rewards, next_states, dones, gamma, weights=None):
+        self.train()                                                            # Switch from eval to training mode
+        # Note: The .gather method uses actions as an index to parse max output(q-eval) values from the feed-forward output
+        q_evaluated = self.forward(states).gather(1, actions)
+        q_eval_next = target.forward(next_states).detach().max(1)[0].unsqueeze(1)   # Take max of qπ(s',a')
+        q_targets = rewards + gamma * q_eval_next * (1 - dones)                 # Bellman Equation
+        if weights == None:
+            loss = self.loss(q_evaluated, q_targets).to(self.device)
+        else:
+            loss = (weights * (q_evaluated - q_targets) ** 2).mean()
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+        self.eval()                                                             # Learning is complete, back to evaluate mode
+        return loss, (q_targets - q_evaluated).detach()
@@ -0,0 +1,72 @@
+import numpy as np
+
+# The ExperienceRing class is a fixed-size ring of steps (state, action, reward, done) in shared memory, written
+# by a single actor process and read by the learner process.  Like the ReplayBuffer, a step's next state is the
+# state of the step after it.  The actor writes each step into the next slot and then bumps the shared write
+# counter; the learner keeps its own read counter and copies out everything written since its last read.  If the
+# actor gets more than a full ring ahead of the learner, the oldest unread steps are overwritten and dropped
+# (the learner never blocks an actor).
+class ExperienceRing:
+
+    def __init__(self, context, capacity, state_size):
+        self.capacity = capacity
+        self.state_size = state_size
+        # Shared buffers (lock-free), only the write counter is locked
+        self.shared_states = context.RawArray("f", capacity * state_size)
+        self.shared_actions = context.RawArray("f", capacity)
+        self.shared_rewards = context.RawArray("f", capacity)
+        self.shared_dones = context.RawArray("f", capacity)
+        self.write_count = context.Value("q", 0)
+        self.read_count = 0     # Learner side only
+        self.map_arrays()
+
+    # Shared buffers can be sent to a new process, their NumPy views can't--re-create them on the other side
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ["states", "actions", "rewards", "dones"]:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.map_arrays()
+
+    # NumPy views of the shared buffers
+    def map_arrays(self):
+        self.states = np.frombuffer(self.shared_states, dtype=np.float32).reshape(self.capacity, self.state_size)
+        self.actions = np.frombuffer(self.shared_actions, dtype=np.float32)
+        self.rewards = np.frombuffer(self.shared_rewards, dtype=np.float32)
+        self.dones = np.frombuffer(self.shared_dones, dtype=np.float32)
+
+    # Actor side: writes one step to the ring
+    def put(self, state, action, reward, done):
+        with self.write_count.get_lock():
+            count = self.write_count.value
+        i = count % self.capacity
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+        # Publish the slot only once it's completely written
+        with self.write_count.get_lock():
+            self.write_count.value = count + 1
+
+    # Learner side: copies out every step written since the last read (at most 'limit'), oldest first.
+    # Returns (states, actions, rewards, dones) arrays, and the number of steps dropped.
+    def get(self, limit=None):
+        with self.write_count.get_lock():
+            count = self.write_count.value
+        dropped = max(0, count - self.capacity - self.read_count)
+        start = self.read_count + dropped
+        if limit != None:
+            count = min(count, start + limit)
+        indexes = np.arange(start, count) % self.capacity
+        transitions = (self.states[indexes], self.actions[indexes], self.rewards[indexes], self.dones[indexes])
+        # Anything the actor overwrote (or is overwriting) while it was being copied is dropped as well
+        with self.write_count.get_lock():
+            overwritten = max(0, self.write_count.value + 1 - self.capacity - start)
+        if overwritten > 0:
+            transitions = tuple(data[overwritten:] for data in transitions)
+            dropped += min(overwritten, count - start)
+        self.read_count = count
+        return transitions, dropped
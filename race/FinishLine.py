@@ -1,6 +1,6 @@
 import pygame
 
-import main
+from race import ProgressMap
 
 # Finish line class creates a "finish line" object and keeps track
 # of the laps of the race, as to know when a "win/lose" condtion is met.
@@ -44,103 +44,152 @@ class FinishLine:
         self.finish_line = fl
         self.coords = (x,y)
         
-        # Split the bottom half and top half of Finish Line Surface
-        # and create seperate rects for collisioning and lap incremeneting
-        self.top = pygame.Rect(x, y, w, h * .5)
-        self.bottom = pygame.Rect(x, y + h * .5, w, h * .5)
-        # Init empty lists to track car rects and collision booleans
+        # Progress map of the level's track--each car's lap count, position & heading are tracked from the fraction
+        # of the lap at its center (see ProgressMap)
+        self.progress_map = level.get_progress_map()
+        self.cells = self.progress_map.progress     # (looked up w/plain indexing, see track)
+        self.wrong_way_distance = 400 / self.progress_map.lap_length  # How far (px) a car must fall back from its best progress to be going the wrong way
+        self.race_end_text_time = 7000 # Amount of time (ms) to display text to screen when race ends
+        self.reset()
+        
+    # Inits (or clears) the lap tracking and race result state for a new race / training episode
+    def reset(self):
+        # Init empty lists to track the cars and their progress around the track
         self.cars = []          # Car objects
-        self.car_rects = []     # Car object rectangles
-        self.collisions = []    # Collision boolean list for every car object        
+        self.progress = []      # Fraction of the current lap for every car object (its last one on the track, -1 until it's been on it)
+        self.best = []          # Furthest race progress (laps + fraction of the lap) for every car object
+        self.wrong_way = []     # Wrong way boolean list for every car object
         # Init race results list --appends a car game object once it finishes a race
         self.race_results = []
         self.race_end = False
-        self.race_end_text_time = 7000 # Amount of time (ms) to display text to screen when race ends
+        self.race_over = False  # Set once the race end text has been displayed--ends the race loop
+        self.race_end_timer = 0
+        self.race_end_prompt = []
 
-     # Detects collisions with in-game objects and increments lap count for players   
-    def update(self):
-        # Update car rects list on every iteration, to get new coords of every car rect
-        if self.collisions:
-            self.car_rects.append(self.game_objects["player_car"].rect)
-            for car in self.game_objects["npc_cars"]:
-                self.car_rects.append(car.rect)
-        # If this is the first call to update, init collisions and car object lists
-        else:
-            self.car_rects.append(self.game_objects["player_car"].rect)
-            self.collisions.append([False, False])
-            self.cars.append(self.game_objects["player_car"])
-            for car in self.game_objects["npc_cars"]:
-                self.car_rects.append(car.rect)
-                self.collisions.append([False, False])
-                self.cars.append(car)
+    # The lap tracking & race result state (see RaceState): each car's progress around the track, the race results,
+    # and the race end state
+    def get_state(self):
+        return (tuple(self.progress), tuple(self.best), tuple(self.wrong_way), tuple(self.race_results), self.race_end, self.race_over,
+                self.race_end_timer, self.race_end_prompt)
 
-        # For every car, detects collision with both (top and bottom) sides of the finish line
-        # The "bottom" and "top" collision list variables will then get the list index of the
-        # car rect element stored in the self.cars list corresponding to the in-game car colliding
-        bottom_collisions = pygame.Rect.collidelistall(self.bottom, self.car_rects)
-        top_collisions = pygame.Rect.collidelistall(self.top, self.car_rects)
-        
-        # For each collision detected with the lower half of the finish line
-        for i in bottom_collisions:
-            # If Car is ONLY in bottom half of finish line
-            if i not in top_collisions:
-                self.collisions[i][0] = True # set bottom collision to True
-                self.collisions[i][1] = False # set top collision to False
-            # Player has continued to move backwards over finish line, decrement car's lap count
-            elif self.collisions[i][1] == True:
-                self.cars[i].lap_count -= 1
-                self.collisions[i][1] = False
-        
-        # For each collision detected with the upper half of the finish line
-        for i in top_collisions:
-            if i not in bottom_collisions:
-                self.collisions[i][1] = True # Set Top to True
-            # Player has continued over the finish line, increment car's lap count   
-            elif self.collisions[i][0] == True:
-                self.cars[i].lap_count += 1
-                self.collisions[i][0] = False
-              
+    # Puts the lap tracking & race results back in a state from get_state
+    def set_state(self, state):
+        progress, best, wrong_way, race_results, self.race_end, self.race_over, self.race_end_timer, self.race_end_prompt = state
+        self.progress = list(progress)
+        self.best = list(best)
+        self.wrong_way = list(wrong_way)
+        self.race_results = list(race_results)
+        if not self.progress:
+            self.cars = []      # (the cars are listed again on the next update)
+
+    # Lists the player's car & the NPCs (on the first update--the cars are made after the finish line), and looks up
+    # their progress unless it was restored from a snapshot
+    def list_cars(self):
+        self.cars = [self.game_objects["player_car"]] + list(self.game_objects["npc_cars"])
+        if not self.progress:
+            self.progress = [-1.] * len(self.cars)
+            self.best = [float("-inf")] * len(self.cars)
+            self.wrong_way = [False] * len(self.cars)
+            for i in range(0, len(self.cars), 1):
+                self.track(i)
+
+    # Looks up a car's progress around the track and updates its lap count.  Progress drops from the end of the lap
+    # back to 0 as the car crosses the finish line (going forwards), and the reverse if it backs over the line--no
+    # other move along the track can change it by more than half a lap in a frame.  Tracking a car again before it
+    # moves changes nothing (ie. the AiAgent tracks the player mid-frame, for its reward, see track_progress)
+    def track(self, i):
+        car = self.cars[i]
+        x, y = car.rect.center
+        row = y // self.progress_map.cell_size
+        column = x // self.progress_map.cell_size
+        if row < 0 or row >= self.progress_map.rows or column < 0 or column >= self.progress_map.columns:
+            return
+        value = self.cells.item(row, column)
+        if value == ProgressMap.OFF_TRACK:
+            return      # Off the track (ie. over the track's edge)--keep the last progress
+        progress = value / ProgressMap.SCALE
+        previous = self.progress[i]
+        if progress == previous:
+            return      # (nothing changes while the car is in cells of the same progress)
+        self.progress[i] = progress
+        if previous >= 0:
+            # Player has continued over the finish line, increment car's lap count
+            if progress - previous < -.5:
+                car.lap_count += 1
+                self.check_race_end(i)
+            # Player has moved backwards over finish line, decrement car's lap count
+            elif progress - previous > .5:
+                car.lap_count -= 1
+        total = car.lap_count + progress
+        if total > self.best[i]:
+            self.best[i] = total
+        self.wrong_way[i] = total < self.best[i] - self.wrong_way_distance
+
+    # A car's race progress: laps completed plus the fraction of the current lap
+    def race_progress(self, i):
+        if not self.cars:
+            self.list_cars()
+        return self.cars[i].lap_count + max(0., self.progress[i])
+
+    # Tracks a car where it is now (ie. mid-frame, before the finish line's update) and returns its race progress
+    def track_progress(self, i):
+        if not self.cars:
+            self.list_cars()
+        self.track(i)
+        return self.race_progress(i)
+
+    # A car's place in the race (1 is first): cars that have finished by the order they finished in, then the rest by
+    # their race progress
+    def get_position(self, i):
+        if i in self.race_results:
+            return self.race_results.index(i) + 1
+        progress = self.race_progress(i)
+        ahead = sum(1 for j in range(0, len(self.cars), 1) if j not in self.race_results and self.race_progress(j) > progress)
+        return len(self.race_results) + ahead + 1
+
+    ####################### CHECK RACE WIN CONDITION #######################
+    # If a car reaches race's lap count, update the race results list
+    def check_race_end(self, i):
+        if self.cars[i].lap_count > self.laps and i not in self.race_results:
+            self.race_results.append(i)
+            font = pygame.font.SysFont("comicsansms", 90)
+            finish = font.render("Race Over.", True, (0,0,155))
+            finish_rect = finish.get_rect()
+            finish_rect.center = (self.game.WIDTH // 2, int(self.game.HEIGHT * .4)) # center text
+            finish_obj = (finish, finish_rect)
+            # The player has finished first, generate first place text to blit on screen
+            if i == 0 and len(self.race_results) == 1:
+                font = pygame.font.SysFont("comicsansms", 90)
+                place = font.render("Congrats, You Won!!", True, (0,0,155)) # Game's title 
+                place_rect = place.get_rect()
+                place_rect.center = (self.game.WIDTH // 2, int(self.game.HEIGHT * .5)) # center title text
+                place_obj = (place, place_rect)
+                self.race_end_prompt = [finish_obj, place_obj]
+                self.race_end = True
+                self.race_end_timer = 0
+            # Player finish race other than first place, generate corresponding text to blit on screen
+            elif i == 0:
+                font = pygame.font.SysFont("comicsansms", 90)
+                place = font.render("You Came In Place " + str(len(self.race_results)) + "!", True, (0,0,155)) # Game's title 
+                place_rect = place.get_rect()
+                place_rect.center = (self.game.WIDTH // 2, int(self.game.HEIGHT * .5)) # center title text
+                place_obj = (place, place_rect)
+                self.race_end_prompt = [finish_obj, place_obj]
+                self.race_end = True
+                self.race_end_timer = 0
+
+    # Tracks every car's progress around the track (one progress map lookup per car) and increments lap count for players
+    def update(self):
+        # If this is the first call to update, init the car object lists
+        if not self.cars:
+            self.list_cars()
+        for i in range(0, len(self.cars), 1):
+            self.track(i)
 
-                ####################### CHECK RACE WIN CONDITION #######################
-                # If a car reaches race's lap count, update the race results list
-                if self.cars[i].lap_count > self.laps and i not in self.race_results:
-                    self.race_results.append(i)
-                    font = pygame.font.SysFont("comicsansms", 90)
-                    finish = font.render("Race Over.", True, (0,0,155))
-                    finish_rect = finish.get_rect()
-                    finish_rect.center = (self.game.WIDTH // 2, int(self.game.HEIGHT * .4)) # center text
-                    finish_obj = (finish, finish_rect)
-                    # The player has finished first, generate first place text to blit on screen
-                    if i == 0 and len(self.race_results) == 1:
-                        font = pygame.font.SysFont("comicsansms", 90)
-                        place = font.render("Congrats, You Won!!", True, (0,0,155)) # Game's title 
-                        place_rect = place.get_rect()
-                        place_rect.center = (self.game.WIDTH // 2, int(self.game.HEIGHT * .5)) # center title text
-                        place_obj = (place, place_rect)
-                        self.race_end_prompt = [finish_obj, place_obj]
-                        self.race_end = True
-                        self.race_end_timer = 0
-                    # Player finish race other than first place, generate corresponding text to blit on screen
-                    elif i == 0:
-                        font = pygame.font.SysFont("comicsansms", 90)
-                        place = font.render("You Came In Place " + str(len(self.race_results)) + "!", True, (0,0,155)) # Game's title 
-                        place_rect = place.get_rect()
-                        place_rect.center = (self.game.WIDTH // 2, int(self.game.HEIGHT * .5)) # center title text
-                        place_obj = (place, place_rect)
-                        self.race_end_prompt = [finish_obj, place_obj]
-                        self.race_end = True
-                        self.race_end_timer = 0
         # Race is over, stop player car and increment race end timer to display text for short while
         if self.race_end:
             self.game.key_state["e_brake"] = True
             self.game.key_state["forward"] = False
             self.race_end_timer += self.game.clock.get_time()    # Increment timer to keep race end text on screen
             if self.race_end_timer > self.race_end_text_time:
-                self.game.running = False                        # End the current Game
-                main.Main()                                      # Restart--go to title screen
-        
-        # Empty car rect list for the next iteration
-        self.car_rects = []
-
-        
-        
\ No newline at end of file
+                self.race_over = True                            # End the race--game goes back to the title screen
@@ -0,0 +1,186 @@
+import pygame
+import os
+
+from race import SimClock
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))     # The race package's directory
+
+# The Game class holds everything the game's parts share while racing: the default game variables (the FPS, screen
+# height and width, etc.), the display & the game's clock, the player's key input bindings and states, the car &
+# level image files, and the player & NPC attributes.  The windowed game (main.py) builds on it w/the title screen
+# and the game loop, and the environments (RaceEnv, BatchRaceEnv) run races w/it directly.
+# In 'headless' mode there's no window, title screen, or frame limiter--the race runs on simulated
+# time as fast as possible (used to train the AI), with the selections passed in as arguments.
+class Game:
+
+    def __init__(self, headless=False, player_car="red_car.png", level="track_1.png", ai_train=True, physics_step=1):
+        self.name = "AI RACER"
+        self.FPS = 50  # 40-80 FPS range recommended, !!! NOTE: If altered too much, may also have to adjust player and NPC attributes accordingly!!!
+        self.physics_step = physics_step    # Frames simulated per race update (coarse steps, headless only--see SimClock)
+        self.WIDTH = 1500
+        self.HEIGHT = 1100
+        self.colors = {"red": (255,0,0), "green": (0,128,0), "blue": (0,0,255), "black": (0,0,0), "white": (255,255,255), 
+                        "yellow": (255,255,0), "darkgreen": (0,100,0), "skyblue": (135,206,235), "snow": (255, 250, 250),
+                        "silver": (192,192,192), "lime": (0,255,0), "khaki": (240,230,140), "orange": (255,165,0), "paper": (242,242,242)}
+        self.background_color = self.colors["white"]
+        self.running = True
+        self.headless = headless
+        
+        # Without a window, SDL's dummy video driver still allows images to be loaded and converted
+        if self.headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pygame.init()
+        self.init_display()
+        
+        # Define variables to store critical game/player information to be shared 
+        # across different game states/sequences -- Do not need to modify, these
+        # are initialized by other class objects.
+        self.player_selection = None
+        self.level_selection = None
+        self.player_attributes = None
+        self.player_attributes = None
+        self.ai_selection = None
+        self.ai_train = None
+        
+        # Methods calls for more initializing...
+        self.init_key_bindings()
+        self.get_image_files()
+        
+        # When headless, there's no title screen to make the selections
+        if self.headless:
+            self.init_headless(player_car, level, ai_train)
+    
+    # Creates the display and the game's (simulated time) clock
+    def init_display(self):
+        self.display = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
+        self.caption = pygame.display.set_caption(self.name)
+        self.clock = SimClock.SimClock(self.FPS, limit_framerate=not self.headless, step_frames=self.physics_step if self.headless else 1)
+        self.screen = pygame.display.get_surface()
+        self.screen_rect = self.screen.get_rect()
+    
+    # Loads game's image files from specified directories
+    def get_image_files(self):
+        # (the game's own directories, wherever it's run from)
+        self.car_image_directory = os.path.join(DIRECTORY, "car_sprite_images", "")
+        self.car_images = ["blue_car.png", "green_car.png", "red_car.png", "orange_car.png", "yellow_car.png", "purple_car.png", "navy_car.png", "pink_car.png", "white_car.png", "black_car.png", "forest_car.png"]
+        
+        self.level_image_directory = os.path.join(DIRECTORY, "levels", "")
+        self.level_images = []
+        
+        for image_file in os.listdir(self.level_image_directory):
+            if image_file.endswith(".png"):
+                self.level_images.append(image_file)
+    
+    # Called by the "Race" class--Initializes player attributes - may need to adjust/tune depending on game FPS 
+    def init_player_attributes(self, player_selection, player_start_coords):
+        # Set all attributes for the player
+        player_attributes = {"IMAGE_FILE": player_selection, # sprite image file
+                                  "MAX_SPEED": 350,         # Range 150 - 380
+                                  "ACCEL": 2.9,             # Range .5 - 6
+                                  "HANDLING": 3.15,         # Range 1.5 - 3.5  
+                                  "DECELERATION": .025,     # .025
+                                  "E_BRAKE_DECEL": .075,    # .075
+                                  "E_BRAKE_HANDLING": 4,    # 4
+                                  "HEALTH": 100,            # Not currently used
+                                  "BOOST": 0,               # Not currently used
+                                  "START_COORDS": (player_start_coords[0], player_start_coords[1], player_start_coords[2])} # x, y, & angle coords
+        return player_attributes
+    
+    # Called by Race Class Obj--Initializes NPC attributes with a low / high range.  
+    # A range is used instead of a single value to, which helps establish psudo-randomness 
+    # between different NPCs. To make NPC's more challenging, increase attribute values / adjust the range
+    def init_npc_attributes(self, npc_car_images, npcs, npc_start_coords, npc_waypoints ):
+        npc_attributes = {"MAX_SPEED": (25,35),
+                               "ACCEL": (.025, .05),     
+                               "HANDLING": (2, 3),  
+                               "DECELERATION": .025,
+                               "IMAGE_FILES": npc_car_images,
+                               "NPCS": npcs,
+                               "NPC_START_COORDS": npc_start_coords,
+                               "NPC_POINTS": npc_waypoints}                              
+        return npc_attributes
+    
+    # Keyboard bindings
+    def init_key_bindings(self):
+        
+        self.key = {"left": pygame.K_LEFT,
+                    "right": pygame.K_RIGHT,
+                    "up": pygame.K_UP,
+                    "down": pygame.K_DOWN,
+                    "escape": pygame.K_ESCAPE,
+                    "enter": pygame.K_RETURN,
+                    "forward": pygame.K_SPACE,
+                    "e_brake": pygame.K_b,
+                    "r_brake": pygame.K_r,
+                    "boost": pygame.K_n}
+        
+        self.key_state = {"left": False,
+                          "right": False,
+                          "up": False,
+                          "down": False,
+                          "escape": False,
+                          "enter": False,
+                          "forward": False,
+                          "e_brake": False,
+                          "r_brake": False,
+                          "boost": False,
+                          "left_click": False}
+                          
+    # Checks for events (i.e. human player key inputs)                     
+    def get_events(self):
+        # Check for key input events
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+        
+            if  event.type == pygame.KEYDOWN:
+                if event.key == self.key["escape"]:
+                    self.key_state["escape"] = True
+                    self.running = False
+                if event.key == self.key["enter"]:
+                    self.key_state["enter"] = True
+                if event.key == self.key["left"]:
+                    self.key_state["left"] = True
+                if event.key == self.key["right"]:
+                    self.key_state["right"] = True
+                if event.key == self.key["up"]:
+                    self.key_state["up"] = True
+                if event.key == self.key["down"]:
+                    self.key_state["down"] = True
+                if event.key == self.key["forward"]:
+                   self.key_state["forward"] = True
+                if event.key == self.key["e_brake"]:
+                   self.key_state["e_brake"] = True
+                if event.key == self.key["boost"]:
+                    self.key_state["boost"] = True
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:
+                    self.key_state["left_click"] = True
+            
+            if  event.type == pygame.KEYUP:
+                if event.key == self.key["enter"]:
+                    self.key_state["enter"] = False
+                if event.key == self.key["left"]:
+                    self.key_state["left"] = False
+                if event.key == self.key["right"]:
+                    self.key_state["right"] = False
+                if event.key == self.key["up"]:
+                    self.key_state["up"] = False
+                if event.key == self.key["down"]:
+                    self.key_state["down"] = False
+                if event.key == self.key["forward"]:
+                    self.key_state["forward"] = False
+                if event.key == self.key["e_brake"]:
+                    self.key_state["e_brake"] = False
+                if event.key == self.key["boost"]:
+                    self.key_state["boost"] = False
+            if event.type == pygame.MOUSEBUTTONUP:
+                if event.button == 1:
+                    self.key_state["left_click"] = False
+    
+    # Headless replacement for the title screen--makes the player, level, and AI selections directly
+    def init_headless(self, player_car, level, ai_train):
+        self.player_selection = self.car_image_directory + player_car
+        self.level_selection = self.level_image_directory + level
+        self.ai_selection = True    # Nobody can drive without a window, so the AI agent always controls the player
+        self.ai_train = ai_train
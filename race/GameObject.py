@@ -1,5 +1,8 @@
 import pygame
 import os
+
+from race import SpriteCache
+
 # Defines parent class to any in-game objects with an image
 class ImageObject:
 
@@ -10,21 +13,25 @@ class ImageObject:
             self.angle = coords[2]  # Init the start angle
             self.image_basename = os.path.splitext(image_file)[0]         # Truncates the file name to get a basename for the image file (used in car objects' rotation methods)
             self.image_file = self.image_basename + "_" + str(self.angle) + ".png" # Append the start angle to image_file name
+            self.image, self.mask = SpriteCache.get_sprite(self.image_basename, self.angle) # Get the (shared) pre-loaded image at the start angle
         else:
             self.image_file = image_file # Image object had no start angle (such as a level map)
-        
-        self.image = pygame.image.load(self.image_file)  # Load the image file
-        self.image.set_colorkey("white")
-        self.image.convert_alpha()
-        self.mask = pygame.mask.from_surface(self.image)
+            self.image = pygame.image.load(self.image_file)  # Load the image file
+            self.image.set_colorkey("white")
+            self.image.convert_alpha()
+            self.mask = pygame.mask.from_surface(self.image)
         self.rect = self.image.get_rect(topleft=(self.x, self.y))
-        
+        self.reset_collisions()
+    
+    # Inits (or clears) the object's collision state
+    def reset_collisions(self):
         self.collision_level = False
         self.collision_player = False
         self.collision_right = False
         self.collision_left = False
         self.collision_up = False
         self.collision_down = False
+        self.collision_depth = 0     # How deep (px) the car is in the level boundary (see CollisionManager)
         self.collision_counter = 0
         self.collision_count = None # During obj collisions, this is set to either of the two constants below
         self.collision_constant_level = (50, 5)  # Constants used for smooth collisioning movement with level (50, 5) seem to work well
@@ -0,0 +1,79 @@
+import copy
+import time
+import warnings
+import numpy as np
+import torch as torch
+
+# The InferencePolicy class is the AiAgent's low-latency path for picking an action from the policy DQN, one state
+# at a time.  The DQN inputs are written into a single input tensor that's allocated once (through a NumPy view of
+# its memory), the forward pass runs on a CPU copy of the DQN under torch.inference_mode (for a network this small,
+# a GPU round trip costs far more than the math), and the best action is returned as a plain int.  Optionally the
+# network is compiled with TorchScript: traced, so the traced graph shares the copy's weights and new weights only
+# need to be loaded (see load_weights).
+class InferencePolicy:
+
+    def __init__(self, model, state_size, torchscript=False):
+        self.torchscript = torchscript
+        self.input_buffer = torch.zeros((1, state_size), dtype=torch.float32)
+        self.inputs = self.input_buffer.numpy()[0]  # Writing to this writes to the input tensor
+        self.load_model(model)
+
+    # Builds the inference network from a copy of the model
+    def load_model(self, model):
+        self.model = copy.deepcopy(model).to("cpu").eval()
+        self.network = self.model
+        if self.torchscript:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", FutureWarning)     # (TorchScript is deprecated in newer versions of PyTorch)
+                with torch.no_grad():
+                    self.network = torch.jit.trace(self.model, self.input_buffer)
+
+    # Loads new weights (a state dict) into the inference network
+    def load_weights(self, state_dict):
+        self.model.load_state_dict(state_dict)
+
+    # Returns the best action (the output node w/the max value) for the DQN inputs (radar beam distances & speed)
+    def act(self, nn_inputs):
+        self.inputs[:] = nn_inputs
+        with torch.inference_mode():
+            actions = self.network(self.input_buffer)
+        return int(actions.argmax())
+
+# Microbenchmark: per-step cost of picking and performing an action, the AiAgent's original way (new input tensor
+# from a list, forward pass, copy back to NumPy, loop over every key) vs. the InferencePolicy & Controls
+# (run from the game's root directory: python -m race.InferencePolicy)
+if __name__ == '__main__':
+    from race import DeepQNetwork
+    from race import Controls
+    action_space = [[],["forward"], ["forward", "left"], ["forward", "right"]]
+    key_state = {"forward": False, "left": False, "right": False, "e_brake": False, "boost": False}
+    model = DeepQNetwork.DeepQNetwork(.001, 6, 16, 16, len(action_space))
+    model.eval()
+    nn_inputs = [120.5, 80.0, 300.2, 45.9, 600.1, 7.5]
+    steps = 20000
+
+    def original_act():
+        state = torch.tensor(nn_inputs, dtype=torch.float32).unsqueeze(0).to(model.device)
+        with torch.no_grad():
+            actions = model.forward(state)
+        actions = actions.cpu().data.numpy()
+        action = action_space[np.argmax(actions)]
+        for key, value in key_state.items():
+            if key in action:
+                key_state[key] = True
+            else:
+                key_state[key] = False
+
+    def benchmark(name, act):
+        for i in range(0, 100, 1):     # Warm up
+            act()
+        start = time.perf_counter()
+        for i in range(0, steps, 1):
+            act()
+        print(name.ljust(32), round((time.perf_counter() - start) / steps * 1e6, 1), "us per step")
+
+    controls = Controls.Controls(action_space, key_state)
+    benchmark("original", original_act)
+    for name, torchscript in [("inference mode", False), ("TorchScript (traced)", True)]:
+        policy = InferencePolicy(model, 6, torchscript)
+        benchmark(name, lambda: controls.apply(policy.act(nn_inputs)))
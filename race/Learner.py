@@ -0,0 +1,227 @@
+import os
+import time
+import copy
+import queue
+import numpy as np
+import torch as torch
+import torch.multiprocessing as mp
+
+from race import Actor
+from race import Checkpoint
+from race import CheckpointWriter
+from race import DeepQNetwork
+from race import ExperienceRing
+from race import LevelPack
+from race import ReplayBuffer
+from race import SharedWeights
+
+# The Learner class runs distributed (actor-learner) DQN training on a single multi-core machine.  It starts a
+# pool of headless Actor processes, each racing on its own with its own epsilon, and owns the only trainable
+# policy DQN, its target DQN, and the replay memory.  The actors send their steps through shared memory
+# experience rings; the learner drains each ring into its own shard of replay memory, trains the policy DQN on
+# random samples of it (same training step as the AiAgent), and publishes its updated weights back to the actors
+# on a schedule.
+# Training ends when an actor completes the level's lap count, after 'max_learn_steps' training steps, or on
+# Ctrl+C.  The policy DQN, replay memory, and scores are saved to the same files as the AiAgent uses, so a
+# distributed run can be continued (or watched) in the normal game.
+class Learner:
+
+    def __init__(self, num_actors=4, level="track_1.png", player_car="red_car.png", max_learn_steps=None):
+        self.num_actors = num_actors
+        self.level = level
+        self.player_car = player_car
+        self.max_learn_steps = max_learn_steps
+        self.dqn_file = "./race/dqn_model_data/dqn_policy.pt"
+        self.policy_file = "./race/dqn_model_data/dqn_policy.npz"    # NumPy export of the policy DQN, for play mode (see AiPilot)
+        self.data_path = "./race/dqn_model_data/"
+        self.checkpoint_file = "./race/dqn_model_data/training_checkpoint.pt"  # Everything needed to continue training (see Checkpoint)
+        # DQN Hyper Parameters (same network and training parameters as the AiAgent):
+        # --------------------------------------------------------------------------------------------------------------------------------------------
+        self.action_size = 4                        # Number of possible actions (the RaceEnv's action space)
+        self.state_size = 6                         # Input dimension size (5 radar beams plus the speed)
+        self.fc1_dims = 16                          # Number of layer 1 fully-connected nodes
+        self.fc2_dims = 16                          # Number of layer 2 fully-connected nodes
+        self.replay_buffer_size = 50000             # Replay buffer max-size (N)
+        self.batch_size = 40                        # Size of random sample from replay memory for back-prop
+        self.min_replay_size = self.batch_size * 3  # Min replay buffer size before back-prop initiates for the first time
+        self.gamma = .98                            # The 'Discount Rate' parameter
+        self.learning_rate = .001                   # Learning rate constant α
+        self.learning_frequency = 2                 # Num of transitions received per training step (the most the learner will train)
+        self.target_net_update_freq = 1000          # Num of training steps between updating the target network's weights
+        self.weight_sync_freq = 50                  # Num of training steps between publishing the policy's weights to the actors
+        self.save_frequency = 60                    # Time (s) between saving the policy DQN to file
+        # Distributed parameters:
+        self.ring_capacity = 10000                  # Num of steps each actor's experience ring holds
+        self.epsilon = .4                           # Actor i explores with epsilon ** (1 + alpha * i / (num_actors - 1))
+        self.epsilon_alpha = 7                      # (the first actor explores the most, the last actor the least)
+        self.mid_lap_starts = .5                    # Share of the actors' episodes started partway around the track (see StartPool), 0 for none
+        # ---------------------------------------------------------------------------------------------------------------------------------------------
+        self.network_dims = (self.learning_rate, self.state_size, self.fc1_dims, self.fc2_dims, self.action_size)
+        self.dqn_policy = DeepQNetwork.DeepQNetwork(*self.network_dims)
+        self.learn_steps = 0
+        # Continue from the last training checkpoint (the AiAgent's or a previous distributed run's), or the policy DQN file
+        checkpoint = Checkpoint.load(self.checkpoint_file, self.hyperparameters())
+        if checkpoint != None:
+            self.dqn_policy.load_state_dict(checkpoint["policy"])
+        elif os.path.exists(self.dqn_file):
+            self.dqn_policy.load_state_dict(torch.load(self.dqn_file, map_location=self.dqn_policy.device))
+        self.dqn_policy.eval()
+        self.dqn_target = copy.deepcopy(self.dqn_policy)
+        if checkpoint != None:
+            self.dqn_target.load_state_dict(checkpoint["target"])
+            Checkpoint.load_optimizer(self.dqn_policy.optimizer, checkpoint["optimizer"])
+            self.learn_steps = checkpoint["state"]["learn_steps"]
+            Checkpoint.set_rng_state(checkpoint["rng"])
+        self.replay = None          # Pointer to the replay memory as last saved, for the checkpoint (see save_agent_state)
+
+        # Replay memory, one shard per actor (each actor's steps are kept in order, so the next states can be read by index)
+        self.replay_shards = [ReplayBuffer.ReplayBuffer(self.replay_buffer_size // num_actors, self.state_size, self.batch_size, self.dqn_policy.device)
+                              for i in range(0, num_actors, 1)]
+        self.transitions = 0        # Total transitions received from the actors
+        self.dropped = 0            # Total steps the actors overwrote before the learner could read them
+        self.episodes = 0
+        self.solved = False
+
+        # Shared memory between the learner and the actors (all actor processes are started fresh with 'spawn')
+        self.context = mp.get_context("spawn")
+        self.rings = [ExperienceRing.ExperienceRing(self.context, self.ring_capacity, self.state_size) for i in range(0, num_actors, 1)]
+        num_weights = sum(parameter.numel() for parameter in self.dqn_policy.parameters())
+        self.weights = SharedWeights.SharedWeights(self.context, num_weights)
+        self.weights.publish(self.dqn_policy)
+        self.results = self.context.Queue()
+        self.stop = self.context.Event()
+        self.actors = []
+        self.checkpoints = CheckpointWriter.get_writer()    # Writes the periodic saves in the background
+
+    # Exploration rate of each actor
+    def actor_epsilon(self, actor_id):
+        if self.num_actors == 1:
+            return self.epsilon
+        return self.epsilon ** (1 + self.epsilon_alpha * actor_id / (self.num_actors - 1))
+
+    # Starts the actors, then trains until training is over
+    def run(self):
+        # Compile the level pack once, before the actors all load it (if it can't be, they load the level files instead, see Level)
+        try:
+            LevelPack.ensure("./race/levels/" + self.level)
+        except OSError as error:
+            print("Level pack could not be compiled:", error)
+        for actor_id in range(0, self.num_actors, 1):
+            actor = self.context.Process(target=Actor.run_actor, daemon=True,
+                                         args=(actor_id, self.actor_epsilon(actor_id), self.rings[actor_id], self.weights,
+                                               self.results, self.stop, self.level, self.player_car, self.network_dims, self.mid_lap_starts))
+            actor.start()
+            self.actors.append(actor)
+        print("Training with", self.num_actors, "actors, epsilons:", [round(self.actor_epsilon(i), 4) for i in range(0, self.num_actors, 1)])
+        save_time = time.time()
+        try:
+            while not self.training_over():
+                received = self.collect()
+                self.check_results()
+                # Don't train until there's enough replay memory, or more often than once per 'learning_frequency' transitions
+                if self.num_transitions() < self.min_replay_size or self.learn_steps * self.learning_frequency >= self.transitions:
+                    if received == 0:
+                        time.sleep(.001)
+                    continue
+                self.learn()
+                if self.learn_steps % self.weight_sync_freq == 0:
+                    self.weights.publish(self.dqn_policy)
+                if self.learn_steps % self.target_net_update_freq == 0:
+                    self.dqn_target.load_state_dict(self.dqn_policy.state_dict())
+                if time.time() - save_time > self.save_frequency:
+                    self.save_model()
+                    save_time = time.time()
+        except KeyboardInterrupt:
+            pass
+        self.shutdown()
+        if self.solved:
+            print("Training Completed, the model was saved.")
+
+    def training_over(self):
+        return self.solved or (self.max_learn_steps != None and self.learn_steps >= self.max_learn_steps)
+
+    # Copies every actor's new steps into its replay memory shard.  Returns the number of steps received
+    def collect(self):
+        received = 0
+        for ring, shard in zip(self.rings, self.replay_shards):
+            (states, actions, rewards, dones), dropped = ring.get(limit=shard.capacity)
+            if dropped > 0:
+                self.dropped += dropped
+                shard.end_stream()
+            shard.add_batch(states, actions, rewards, dones)
+            received += len(states)
+        self.transitions += received
+        return received
+
+    def num_transitions(self):
+        return sum(shard.num_transitions() for shard in self.replay_shards)
+
+    # Reports the scores of the actors' finished episodes, and whether any actor has finished the race
+    def check_results(self):
+        while True:
+            try:
+                actor_id, score, lap_count, solved = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self.episodes += 1
+            print("ACTOR", actor_id, "EPISODE SCORE:", int(score), "LAPS:", lap_count,
+                  "| transitions:", self.transitions, "dropped:", self.dropped, "training steps:", self.learn_steps)
+            self.write_episode_score(score)
+            if solved:
+                self.solved = True
+
+    # Trains the policy DQN on a random sample of replay memory.  Each batch comes from one shard, picked in
+    # proportion to its size, so every transition in replay memory is equally likely to be sampled
+    def learn(self):
+        sizes = np.array([shard.num_transitions() for shard in self.replay_shards], dtype=np.float64)
+        shard = self.replay_shards[np.random.choice(len(sizes), p=sizes / sizes.sum())]
+        states, actions, rewards, next_states, dones = shard.sample()
+        self.dqn_policy.learn_batch(self.dqn_target, states, actions, rewards, next_states, dones, self.gamma)
+        self.learn_steps += 1
+
+    # Stops the actors and saves the policy DQN and the replay memory
+    def shutdown(self):
+        self.stop.set()
+        for actor in self.actors:
+            actor.join(timeout=5)
+            if actor.is_alive():
+                actor.terminate()
+        self.save_agent_state()
+        self.save_model()
+        self.checkpoints.wait()
+
+    # Saves the policy DQN & the training checkpoint to file (in the background)
+    def save_model(self):
+        policy = Checkpoint.copy_tensors(self.dqn_policy.state_dict())
+        self.checkpoints.save_state_dict(policy, self.dqn_file)
+        self.checkpoints.save_numpy_policy(policy, self.policy_file)
+        state = {"time_step": self.learn_steps, "epsilon": self.actor_epsilon(self.num_actors - 1), "learn_steps": self.learn_steps}
+        checkpoint = Checkpoint.snapshot(policy, Checkpoint.copy_tensors(self.dqn_target.state_dict()), Checkpoint.copy_tensors(self.dqn_policy.optimizer.state_dict()),
+                                         self.hyperparameters(), self.replay, state)
+        self.checkpoints.save_checkpoint(checkpoint, self.checkpoint_file)
+
+    # The hyperparameters saved w/each training checkpoint
+    def hyperparameters(self):
+        return {"state_size": self.state_size, "fc1_dims": self.fc1_dims, "fc2_dims": self.fc2_dims, "action_size": self.action_size,
+                "replay_buffer_size": self.replay_buffer_size, "batch_size": self.batch_size, "gamma": self.gamma, "learning_rate": self.learning_rate,
+                "learning_frequency": self.learning_frequency, "target_net_update_freq": self.target_net_update_freq, "weight_sync_freq": self.weight_sync_freq,
+                "num_actors": self.num_actors, "epsilon": self.epsilon, "epsilon_alpha": self.epsilon_alpha}
+
+    # Appends the replay memory to the AiAgent's replay memory files (all shards, one after the other, oldest steps
+    # first).  The AiAgent will continue training from this memory (with the actors' final epsilon, as the policy
+    # is already partly trained)
+    def save_agent_state(self):
+        replay_memory = ReplayBuffer.ReplayBuffer(self.replay_buffer_size, self.state_size, self.batch_size, path=self.data_path)
+        for shard in self.replay_shards:
+            indexes = (shard.index - shard.size + np.arange(shard.size)) % shard.capacity
+            start = replay_memory.index
+            replay_memory.end_stream()      # The shards' steps don't follow each other
+            replay_memory.add_batch(shard.states[indexes], shard.actions[indexes], shard.rewards[indexes], shard.dones[indexes])
+            replay_memory.set_valid((start + np.arange(shard.size)) % replay_memory.capacity, shard.valid[indexes])
+        replay_memory.end_stream()
+        replay_memory.flush()
+        self.replay = {"path": replay_memory.path, "header": replay_memory.snapshot_header()}
+
+    # Append each episode's score to file
+    def write_episode_score(self, score):
+        self.checkpoints.append_text(self.data_path+"scores.txt", "\nSCORE: " + str(int(score)))
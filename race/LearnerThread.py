@@ -0,0 +1,137 @@
+import copy
+import time
+import queue
+import threading
+import numpy as np
+import torch as torch
+
+from race import Checkpoint
+
+# The LearnerThread class trains the AiAgent's DQN on its own threads, so the race loop only has to act (feed
+# forward) and write its steps to replay memory.  The learner trains its own copy of the policy DQN (along with
+# the target DQN) continuously on minibatches of replay memory, while a prefetch thread samples the next
+# minibatches ahead of time.  Training is paced by the 'replay_ratio': the number of training steps (gradient
+# updates) per time step of the race--the learner never trains more than that, and waits for the race when it's
+# ahead.  Every 'weight_sync_freq' training steps the learner hands its latest weights over, and the agent copies
+# them into the DQN it acts with (see take_weights).  Replay memory is shared with the race loop, so every read
+# and write of it is done while holding 'replay_lock'.  Training continues from a checkpoint's target DQN, optimizer
+# state, and training step count, if one is given (see Checkpoint).
+class LearnerThread:
+
+    def __init__(self, dqn_policy, replay_memory, replay_lock, gamma, replay_ratio, min_replay_size, target_update_steps,
+                 weight_sync_freq, prefetch_depth=2, checkpoint=None):
+        self.dqn_train = copy.deepcopy(dqn_policy)      # The DQN that's trained (w/its own optimizer)
+        self.dqn_target = copy.deepcopy(dqn_policy)
+        self.replay_memory = replay_memory
+        self.replay_lock = replay_lock
+        self.gamma = gamma
+        self.replay_ratio = replay_ratio
+        self.min_replay_size = min_replay_size
+        self.target_update_steps = target_update_steps  # Num of training steps between updating the target DQN
+        self.weight_sync_freq = weight_sync_freq
+        self.time_steps = 0         # Num of race time steps (written to by the race loop, see step)
+        self.learn_steps = 0        # Num of training steps
+        self.new_weights = None     # Latest weights not yet taken by the agent
+        self.weights_lock = threading.Lock()   # Held while the weights are handed over (see take_weights)
+        if checkpoint != None:
+            self.dqn_target.load_state_dict(checkpoint["target"])
+            Checkpoint.load_optimizer(self.dqn_train.optimizer, checkpoint["optimizer"])
+            self.learn_steps = checkpoint["state"]["learn_steps"]
+            self.time_steps = int(self.learn_steps / self.replay_ratio)     # (no catching up on training steps from earlier runs)
+        self.train_lock = threading.Lock()     # Held during each training step (see snapshot)
+        self.running = True
+        # Prefetched minibatches: empty batches are taken from 'free_batches', filled, and put on 'ready_batches'
+        self.free_batches = queue.Queue()
+        self.ready_batches = queue.Queue()
+        for i in range(0, prefetch_depth, 1):
+            self.free_batches.put(self.new_batch())
+        self.prefetch_thread = threading.Thread(target=self.prefetch, name="ReplayPrefetcher", daemon=True)
+        self.learn_thread = threading.Thread(target=self.learn, name="Learner", daemon=True)
+        self.prefetch_thread.start()
+        self.learn_thread.start()
+
+    # An empty minibatch: (states, actions, rewards, next_states, dones) tensors, the importance-sampling weights
+    # (prioritized replay only), the replay memory indexes the transitions were sampled from, and replay memory's
+    # write count when they were sampled
+    def new_batch(self):
+        tensors = [tensor.clone() for tensor in self.replay_memory.batch_tensors]
+        return {"tensors": tensors, "weights": None, "indexes": np.zeros(self.replay_memory.batch_size, dtype=np.int64), "writes": 0}
+
+    # Race loop: counts one time step of the race (lets the learner train 'replay_ratio' more steps)
+    def step(self):
+        self.time_steps += 1
+
+    # Race loop: returns the latest weights handed over by the learner (None if there's none since the last call)
+    def take_weights(self):
+        with self.weights_lock:
+            weights = self.new_weights
+            self.new_weights = None
+        return weights
+
+    # Copies of the trained & target DQNs' weights and the optimizer's state on the CPU, along with the number of
+    # training steps, all taken between two training steps (ie. to save to file)
+    def snapshot(self):
+        with self.train_lock:
+            return {"policy": Checkpoint.copy_tensors(self.dqn_train.state_dict()),
+                    "target": Checkpoint.copy_tensors(self.dqn_target.state_dict()),
+                    "optimizer": Checkpoint.copy_tensors(self.dqn_train.optimizer.state_dict()),
+                    "learn_steps": self.learn_steps}
+
+    # Prefetch thread: samples minibatches into the free batches, so one is always ready for the learner
+    def prefetch(self):
+        while self.running:
+            if self.replay_memory.num_transitions() < self.min_replay_size:
+                time.sleep(.01)
+                continue
+            try:
+                batch = self.free_batches.get(timeout=.1)
+            except queue.Empty:
+                continue
+            with self.replay_lock:
+                sample = self.replay_memory.sample()
+                weights = self.replay_memory.sample_weights()
+                batch["indexes"][:] = self.replay_memory.batch_indexes
+                batch["writes"] = self.replay_memory.writes
+                for tensor, sampled in zip(batch["tensors"], sample):
+                    tensor.copy_(sampled)
+                if weights != None:
+                    if batch["weights"] == None:
+                        batch["weights"] = weights.clone()
+                    batch["weights"].copy_(weights)
+            self.ready_batches.put(batch)
+
+    # Learner thread: trains on the prefetched minibatches, up to 'replay_ratio' training steps per time step
+    def learn(self):
+        while self.running:
+            if self.learn_steps >= self.replay_ratio * self.time_steps:
+                time.sleep(.001)
+                continue
+            try:
+                batch = self.ready_batches.get(timeout=.1)
+            except queue.Empty:
+                continue
+            states, actions, rewards, next_states, dones = batch["tensors"]
+            with self.train_lock:
+                loss, td_errors = self.dqn_train.learn_batch(self.dqn_target, states, actions, rewards, next_states, dones,
+                                                             self.gamma, batch["weights"])
+            if batch["weights"] != None:
+                # (prioritized replay only) Transitions the race has written over since the batch was sampled keep
+                # their new priority
+                td_errors = td_errors.cpu().numpy().reshape(-1)
+                with self.replay_lock:
+                    fresh = ~self.replay_memory.overwritten(batch["indexes"], batch["writes"])
+                    self.replay_memory.update_priorities(td_errors[fresh], batch["indexes"][fresh])
+            self.free_batches.put(batch)
+            self.learn_steps += 1
+            if self.learn_steps % self.target_update_steps == 0:
+                self.dqn_target.load_state_dict(self.dqn_train.state_dict())
+            if self.learn_steps % self.weight_sync_freq == 0:
+                weights = {name: tensor.detach().clone() for name, tensor in self.dqn_train.state_dict().items()}
+                with self.weights_lock:
+                    self.new_weights = weights
+
+    # Stops training (the threads finish their current step)
+    def close(self):
+        self.running = False
+        self.prefetch_thread.join()
+        self.learn_thread.join()
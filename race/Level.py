@@ -2,13 +2,22 @@ import pygame
 import os
 
 from race.GameObject import ImageObject
+from race import OccupancyGrid
+from race import LevelPack
+from race import BoundaryField
+from race import ProgressMap
  
  
+# The Level class holds the level (racetrack) image, its boundary (as a mask for collision detection & as an
+# occupancy grid, see OccupancyGrid), and its init data.  Levels are loaded from their compiled pack (see LevelPack),
+# which is compiled from the level image & its init data file the first time the level is loaded, and again
+# whenever either file changes.
 class Level(ImageObject):
     
     def __init__(self, image_file):
-        super().__init__((0,0), image_file)
-        
+        self.x = 0
+        self.y = 0
+        self.image_file = image_file
         self.path = os.path.split(image_file)
         self.parent_directory = self.path[0]                # parses parent folder name of image
         self.level_name = os.path.splitext(self.path[1])[0] # parses level from filename
@@ -20,56 +29,34 @@ class Level(ImageObject):
         self.npcs = None
         self.npc_start_coords = []
         self.npc_points = []
+        self.grid = None    # Bit-packed level boundary (see get_grid)
+        self.boundary_field = None  # Wall normals & distances near the level boundary (see get_boundary_field)
+        self.progress_map = None    # Fraction of the lap at each point of the track (see get_progress_map)
+        self.pack = None
         
-        # Read the data from the level's .txt data file
-        self.get_level_init_data()
-    
-    # Gets corresponding level data to the level image file passed as the objects argument
-    def get_level_init_data(self):
+        # Memory-map the level's pack: the level image, boundary grid & field, and init data are all read straight from it
         try:
-            with open(self.parent_directory + "/" + self.level_name + "_init_data.txt") as file:
-                text_data = file.readlines()
-        except:
-            print("Required level datafile doesn't exist")
-            return None
-        
-        # Parse the list and extract only the relevent data
-        text_data = [line for line in text_data if not line.startswith("#")] # remove all lines starting with # symbol
-        text_data = [el.strip() for el in text_data]                         # remove all newline chars
-        text_data = [el for el in text_data if el != ""]                     # remove all blank string entries (empty lines)                        
-        
-        # Use .eval() method to convert each element in list into the right datatype (integer, tuple, etc.)
-        data = []
-        for each in text_data:
-            each = eval(each)
-            data.append(each)
-        
-        # Get number of Laps for Race
-        self.laps = data[0]
-        # Get Level Boundary Color
-        self.level_boundary_color = data[1]
-        # Get Finish Line Coords
-        self.finish_line_coords = data[2]
-        # Get player start coordinate data (x,y,angle (deg))
-        self.player_start_coords = data[3]
-        # Get num of non-playable characters and their start coords (x,y,angle (deg))
-        self.npcs = int(data[4])
- 
-        i = 0
-        for i in range(5, self.npcs + 5, 1):    # Shift index of loop to start at waypoint data
-            self.npc_start_coords.append(data[i])
-        # Get npc waypoint coordinates for level (ie. points NPC's will control to)
-        n = i + 1
-        for i in range(n, len(data), 1):
-            self.npc_points.append(data[i])
-            
-        # Pygame functions to convert the level image and create a mask of image used for collision detect with the level--
-        # Set level background color & onvert alpha
+            self.pack = LevelPack.LevelPack(LevelPack.ensure(image_file))
+        except OSError as error:
+            print("Level pack could not be compiled or loaded, loading the level files instead:", error)
+        if self.pack != None:
+            self.image = self.pack.image
+            self.grid = self.pack.grid
+            self.boundary_field = self.pack.field
+            self.progress_map = self.pack.progress
+            self.set_level_init_data(self.pack.data)
+        else:
+            self.image = pygame.image.load(image_file)
+            self.get_level_init_data()
         self.image.set_colorkey("white")
-        self.image.convert()
-        # Set mask color used for level boundary (level collision color read from data file)
-        #Note: Second argument is a color sensitivity threshold--could need adjusment
-        self.mask = pygame.mask.from_threshold(self.image, pygame.Color(self.level_boundary_color), (1,1,1,1))
+        self.rect = self.image.get_rect()
+        self.reset_collisions()
+        # Mask used for collision detection with the level boundary (the pixels of the level boundary color)
+        if self.grid != None:
+            self.mask = self.grid.to_mask()
+        else:
+            #Note: Second argument is a color sensitivity threshold--could need adjusment
+            self.mask = pygame.mask.from_threshold(self.image, pygame.Color(self.level_boundary_color), (1,1,1,1))
         
         print("\nExtracted all level data from file.")
         print("No. Laps:", self.laps)
@@ -79,6 +66,46 @@ class Level(ImageObject):
         print("Number of NPCs:", self.npcs)
         print("NPC start coords:", self.npc_start_coords)
         print("")
+    
+    # Gets corresponding level data to the level image file passed as the objects argument
+    def get_level_init_data(self):
+        try:
+            data = LevelPack.read_init_data(LevelPack.data_file(self.image_file))
+        except OSError:
+            print("Required level datafile doesn't exist")
+            return None
+        self.set_level_init_data(data)
+    
+    # Sets the level init data (see LevelPack.read_init_data)
+    def set_level_init_data(self, data):
+        self.laps = data["laps"]                                    # Get number of Laps for Race
+        self.level_boundary_color = data["level_boundary_color"]    # Get Level Boundary Color
+        self.finish_line_coords = data["finish_line_coords"]        # Get Finish Line Coords
+        self.player_start_coords = data["player_start_coords"]      # Get player start coordinate data (x,y,angle (deg))
+        self.npcs = data["npcs"]                                    # Get num of non-playable characters and their start coords (x,y,angle (deg))
+        self.npc_start_coords = data["npc_start_coords"]
+        self.npc_points = data["npc_points"]                        # Get npc waypoint coordinates for level (ie. points NPC's will control to)
+        
+    # Returns the level's occupancy grid (a bit-packed NumPy copy of the level boundary).  It's read from the level
+    # pack, or else built from the level mask on first use
+    def get_grid(self):
+        if self.grid == None:
+            self.grid = OccupancyGrid.from_mask(self.mask)
+        return self.grid
+
+    # Returns the level's boundary field (used to resolve collisions w/the level boundary).  It's read from the level
+    # pack, or else built from the grid on first use
+    def get_boundary_field(self):
+        if self.boundary_field == None:
+            self.boundary_field = BoundaryField.from_grid(self.get_grid())
+        return self.boundary_field
+
+    # Returns the level's track progress map (used for lap counting, race positions & progress rewards).  It's read
+    # from the level pack, or else built from the grid on first use
+    def get_progress_map(self):
+        if self.progress_map == None:
+            self.progress_map = ProgressMap.from_grid(self.get_grid(), self.finish_line_coords, self.player_start_coords[2])
+        return self.progress_map
         
     def update(self):
         self.rect = self.image.get_rect()
@@ -0,0 +1,209 @@
+import os
+import sys
+import ast
+import json
+import time
+import numpy as np
+import pygame
+
+from race import OccupancyGrid
+from race import BoundaryField
+from race import ProgressMap
+
+# A level pack is a level (track image + init data file) compiled into one binary file that's loaded by memory-mapping
+# it, instead of decoding a huge PNG, building masks from it, & parsing the init data every time the level is loaded.
+# Since the file is memory-mapped, loading takes milliseconds, only the pages that are used are ever read from disk,
+# and every process racing on the same level shares the same pages (copy-on-write).  Layout:
+#   MAGIC (8 bytes), VERSION (uint32), header length (uint32), JSON header
+#   level boundary grid: bit-packed, one row of bytes per image row (see OccupancyGrid)
+#   level boundary field: the normals (x then y, int8) & distances (little-endian int16) of its cells, row by row (see BoundaryField)
+#   track progress map: the progress (little-endian uint16) of its cells, row by row (see ProgressMap)
+#   level image: raw pixels (RGB, or RGBA if the image has per-pixel alpha), ready for pygame.image.frombuffer
+# The JSON header holds the image size & pixel format, the level init data (laps, boundary color, finish line,
+# start coords, NPC waypoints), the offset & size of each section (page aligned), and the size & modification time
+# of the source files the pack was compiled from--a pack is recompiled as soon as either source file changes.
+MAGIC = b"RACEPACK"
+VERSION = 3
+ALIGN = 4096    # Sections start on page boundaries
+
+class LevelPack:
+
+    def __init__(self, file):
+        self.file = file
+        self.header = read_header(file)
+        self.data = level_data(self.header["level"])    # The level init data
+        self.width = self.header["width"]
+        self.height = self.header["height"]
+        # Copy-on-write: pages are shared until something writes to them (ie. drawing onto the level image)
+        self.memmap = np.memmap(file, dtype=np.uint8, mode='c')
+        grid = self.header["sections"]["grid"]
+        packed = self.memmap[grid["offset"]:grid["offset"] + grid["size"]].reshape(self.height, -1)
+        self.grid = OccupancyGrid.OccupancyGrid(packed, self.width, self.height)
+        field = self.header["sections"]["field"]
+        shape = (field["rows"], field["columns"])
+        cells = shape[0] * shape[1]
+        field_data = np.asarray(self.memmap[field["offset"]:field["offset"] + field["size"]])    # (plain array indexing, for lookups)
+        self.field = BoundaryField.BoundaryField(field_data[:cells].view(np.int8).reshape(shape),
+                                                 field_data[cells:2 * cells].view(np.int8).reshape(shape),
+                                                 field_data[2 * cells:].view("<i2").reshape(shape),
+                                                 field["cell_size"], field["reach"])
+        progress = self.header["sections"]["progress"]
+        self.progress = ProgressMap.ProgressMap(np.asarray(self.memmap[progress["offset"]:progress["offset"] + progress["size"]]).view("<u2")
+                                                .reshape(progress["rows"], progress["columns"]), progress["cell_size"], progress["lap_length"])
+        image = self.header["sections"]["image"]
+        self.image = pygame.image.frombuffer(self.memmap[image["offset"]:image["offset"] + image["size"]],
+                                             (self.width, self.height), self.header["format"])
+
+# The pack file of a level image (ie. track_1.png -> track_1.pack)
+def pack_file(image_file):
+    return os.path.splitext(image_file)[0] + ".pack"
+
+# The init data file of a level image (ie. track_1.png -> track_1_init_data.txt)
+def data_file(image_file):
+    return os.path.splitext(image_file)[0] + "_init_data.txt"
+
+# Reads a level's init data file (see the file's own comments for its format) into a dict
+def read_init_data(file):
+    with open(file) as f:
+        text_data = f.readlines()
+    # Parse the list and extract only the relevent data
+    text_data = [line for line in text_data if not line.startswith("#")] # remove all lines starting with # symbol
+    text_data = [el.strip() for el in text_data]                         # remove all newline chars
+    text_data = [el for el in text_data if el != ""]                     # remove all blank string entries (empty lines)
+    # Convert each element in the list into the right datatype (integer, tuple, etc.)--literals only, nothing is executed
+    data = [ast.literal_eval(each) for each in text_data]
+    npcs = int(data[4])
+    return {"laps": data[0],
+            "level_boundary_color": data[1],
+            "finish_line_coords": data[2],
+            "player_start_coords": data[3],
+            "npcs": npcs,
+            "npc_start_coords": data[5:npcs + 5],
+            "npc_points": data[npcs + 5:]}
+
+# Restores the level init data's types after a JSON round trip (JSON has no tuples)
+def level_data(data):
+    data = {key: to_tuples(value) for key, value in data.items()}
+    data["npc_start_coords"] = list(data["npc_start_coords"])
+    data["npc_points"] = [list(points) for points in data["npc_points"]]
+    return data
+
+def to_tuples(value):
+    if isinstance(value, list):
+        return tuple(to_tuples(each) for each in value)
+    return value
+
+# Size & modification time of each of a level's source files (to tell if a pack is out of date)
+def source_stamps(image_file):
+    stamps = {}
+    for name, file in [("image", image_file), ("data", data_file(image_file))]:
+        stat = os.stat(file)
+        stamps[name] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+# Reads a pack's JSON header.  Raises ValueError if the file isn't a level pack of this version
+def read_header(file):
+    with open(file, 'rb') as f:
+        start = f.read(16)
+        if len(start) < 16 or start[:8] != MAGIC:
+            raise ValueError("Not a level pack: " + file)
+        version = int.from_bytes(start[8:12], "little")
+        if version != VERSION:
+            raise ValueError("Level pack version " + str(version) + " is not supported (expected " + str(VERSION) + "): " + file)
+        length = int.from_bytes(start[12:16], "little")
+        return json.loads(f.read(length).decode("utf-8"))
+
+# Whether the pack exists & was compiled (by this version, w/the current boundary field & progress map settings) from
+# the level's current source files
+def is_current(file, image_file):
+    try:
+        header = read_header(file)
+        field = header["sections"]["field"]
+        progress = header["sections"]["progress"]
+        return (header["sources"] == source_stamps(image_file) and
+                field["cell_size"] == BoundaryField.CELL_SIZE and field["reach"] == BoundaryField.REACH and
+                progress["cell_size"] == ProgressMap.CELL_SIZE)
+    except (OSError, ValueError):
+        return False
+
+# Compiles a level image & its init data file into a pack.  The image is converted in horizontal strips, so only one
+# strip of pixels is ever copied out of the (very large) image.  Written to a temporary file first, which then
+# replaces the old pack (atomic, several processes may compile the same level at once)
+def compile_level(image_file, file=None, strip_height=256):
+    if file == None:
+        file = pack_file(image_file)
+    sources = source_stamps(image_file)
+    level = read_init_data(data_file(image_file))
+    surface = pygame.image.load(image_file)
+    width, height = surface.get_size()
+    pixel_format = "RGBA" if surface.get_flags() & pygame.SRCALPHA else "RGB"
+    grid = OccupancyGrid.from_surface(surface, level["level_boundary_color"], strip_height)
+    field = BoundaryField.from_grid(grid)
+    progress = ProgressMap.from_grid(grid, level["finish_line_coords"], level["player_start_coords"][2])
+    grid_size = grid.packed.nbytes
+    field_size = field.normal_x.nbytes + field.normal_y.nbytes + field.distance.nbytes
+    progress_size = progress.progress.nbytes
+    image_size = width * height * len(pixel_format)
+
+    header = {"width": width, "height": height, "format": pixel_format, "level": level, "sources": sources, "sections": {}}
+    # The header's length depends on the section offsets written in it--make room for offsets of up to 20 digits
+    header["sections"] = {"grid": {"offset": 10 ** 19, "size": grid_size},
+                          "field": {"offset": 10 ** 19, "size": field_size, "rows": field.rows, "columns": field.columns,
+                                    "cell_size": field.cell_size, "reach": field.reach},
+                          "progress": {"offset": 10 ** 19, "size": progress_size, "rows": progress.rows, "columns": progress.columns,
+                                       "cell_size": progress.cell_size, "lap_length": progress.lap_length},
+                          "image": {"offset": 10 ** 19, "size": image_size}}
+    offset = align(16 + len(json.dumps(header).encode("utf-8")))
+    header["sections"]["grid"]["offset"] = offset
+    header["sections"]["field"]["offset"] = align(offset + grid_size)
+    header["sections"]["progress"]["offset"] = align(header["sections"]["field"]["offset"] + field_size)
+    header["sections"]["image"]["offset"] = align(header["sections"]["progress"]["offset"] + progress_size)
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    temp_file = file + "." + str(os.getpid()) + ".tmp"
+    with open(temp_file, 'wb') as f:
+        f.write(MAGIC + VERSION.to_bytes(4, "little") + len(header_bytes).to_bytes(4, "little") + header_bytes)
+        f.seek(header["sections"]["grid"]["offset"])
+        f.write(grid.packed.tobytes())
+        f.seek(header["sections"]["field"]["offset"])
+        for array in [field.normal_x, field.normal_y, field.distance.astype("<i2")]:
+            f.write(array.tobytes())
+        f.seek(header["sections"]["progress"]["offset"])
+        f.write(progress.progress.astype("<u2").tobytes())
+        f.seek(header["sections"]["image"]["offset"])
+        for y in range(0, height, strip_height):
+            h = min(strip_height, height - y)
+            f.write(pygame.image.tobytes(surface.subsurface((0, y, width, h)), pixel_format))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, file)
+    return file
+
+# Compiles the level's pack if it's missing or out of date.  Returns the pack file
+def ensure(image_file):
+    file = pack_file(image_file)
+    if not is_current(file, image_file):
+        print("Compiling level pack:", file)
+        compile_level(image_file, file)
+    return file
+
+def align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+# Compiles the given level images (or every level in the levels directory), then times loading each pack
+# (run from the game's root directory: python -m race.LevelPack [race/levels/track_1.png ...])
+if __name__ == '__main__':
+    image_files = sys.argv[1:]
+    if len(image_files) == 0:
+        directory = "./race/levels/"
+        image_files = [directory + file for file in sorted(os.listdir(directory)) if file.endswith(".png")]
+    for image_file in image_files:
+        start = time.perf_counter()
+        file = compile_level(image_file)
+        compile_time = time.perf_counter() - start
+        start = time.perf_counter()
+        pack = LevelPack(file)
+        mask = pack.grid.to_mask()
+        load_time = time.perf_counter() - start
+        print(file, str(pack.width) + "x" + str(pack.height), "| compiled in", round(compile_time, 2), "s | loaded (w/level mask) in",
+              round(load_time * 1000, 1), "ms |", round(os.path.getsize(file) / 2 ** 20, 1), "MB")
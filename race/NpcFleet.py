@@ -0,0 +1,300 @@
+import os
+import sys
+import time
+import math
+import numpy as np
+
+from race import CollisionManager
+from race import SpriteCache
+
+# The NpcFleet class drives all of a race's NPC cars at once.  Every NPC's driving state (position, angle, speed,
+# throttle timer, attributes, waypoints & waypoint cursor, and collision response) is kept in NumPy arrays
+# (struct-of-arrays, like the BatchRaceEnv), and each frame the waypoint advance, steering, throttle, speed, and
+# movement calcs run for every NPC at once, as batch operations over the arrays.  The NpcCar objects are kept for
+# everything that works on car objects (the collision grid, the finish line, & the viewport): the fleet loads their
+# randomized attributes & their waypoints from them (see NpcCar), and writes back their new position & sprite once
+# per frame.  Only the NPCs within reach of the level boundary (per the level's boundary field) are tested against
+# the level mask, w/the same collision manager calcs as the player's car.
+class NpcFleet:
+
+    def __init__(self, cars, level, game_objects):
+        self.cars = cars
+        self.level = level
+        self.clock = game_objects["clock"]  # Simulated time clock used by the throttle timers
+        self.boundary_field = level.get_boundary_field()
+        # One collision manager tests each NPC that's near the level boundary against the level (see get_collisions)
+        self.collision_manager = CollisionManager.CollisionManager(None, game_objects)
+        # Randomized attributes, fixed for the race (see NpcCar).  The turn, acceleration & deceleration per frame are
+        # scaled to the frames per physics step (see SimClock)--the max speed stays a distance per frame
+        self.step_frames = self.clock.step_frames
+        self.max_speed = np.array([car.max_speed for car in cars], dtype=np.float64)
+        self.handling = np.array([car.handling for car in cars], dtype=np.float64) * self.step_frames
+        self.accel = np.array([car.accel for car in cars], dtype=np.float64) * self.step_frames
+        self.deceleration = np.array([car.deceleration for car in cars], dtype=np.float64) * self.step_frames
+        # Half of every car's sprite size at every angle (its rect's center), and how close the level boundary has to
+        # be to the rect's center for the car to be tested against it: as far as the mask the collision manager tests
+        # (at the rect's top left) can reach from the center, plus the field's error (its distances are within a
+        # cell of the true distance, and the rect's position is within a px of the car's)
+        sizes = np.array([[SpriteCache.get_sprite(car.image_basename, angle)[0].get_size() for angle in range(0, 360, 1)] for car in cars], dtype=np.float64).reshape(len(cars), 360, 2)
+        mask_sizes = np.array([car.mask.get_size() for car in cars], dtype=np.float64).reshape(len(cars), 1, 2)
+        half_sizes = sizes / 2
+        near_distance = np.hypot(*np.maximum(half_sizes, mask_sizes - half_sizes).transpose(2, 0, 1)) + 2 * self.boundary_field.cell_size
+        # (flat tables, indexed by car index * 360 + whole angle)
+        self.half_width = half_sizes[:, :, 0].ravel()
+        self.half_height = half_sizes[:, :, 1].ravel()
+        self.near_distance = near_distance.ravel()
+        self.sprite_base = np.arange(len(cars)) * 360
+        self.load()
+
+    # Loads every NPC's driving state from its NpcCar object (at the start of the race, and after the cars are reset)
+    def load(self):
+        cars = self.cars
+        count = len(cars)
+        self.x = np.array([car.x for car in cars], dtype=np.float64)
+        self.y = np.array([car.y for car in cars], dtype=np.float64)
+        self.angle = np.array([car.angle for car in cars], dtype=np.float64)
+        self.distance = np.array([car.distance for car in cars], dtype=np.float64)
+        self.previous_distance = np.array([car.previous_distance for car in cars], dtype=np.float64)
+        self.throttle = np.array([car.throttle for car in cars], dtype=bool)
+        self.throttle_start_time = np.array([car.throttle_start_time for car in cars], dtype=np.float64)
+        self.throttle_time = np.array([car.throttle_time for car in cars], dtype=np.float64)
+        # Waypoints (one point selected from each series of level waypoints, see NpcCar.generate_waypoints)
+        self.waypoints = np.array([car.waypoints for car in cars], dtype=np.float64).reshape(count, -1, 2)
+        self.waypoint_counter = np.array([car.waypoint_counter for car in cars], dtype=np.int64)
+        current_waypoint = np.array([car.current_waypoint for car in cars], dtype=np.float64).reshape(count, 2)
+        self.waypoint_x = current_waypoint[:, 0].copy()
+        self.waypoint_y = current_waypoint[:, 1].copy()
+        # Collision state (see GameObject.reset_collisions)
+        self.collision_level = np.array([car.collision_level for car in cars], dtype=bool)
+        self.collision_player = np.array([car.collision_player for car in cars], dtype=bool)
+        self.collision_right = np.array([car.collision_right for car in cars], dtype=bool)
+        self.collision_left = np.array([car.collision_left for car in cars], dtype=bool)
+        self.collision_up = np.array([car.collision_up for car in cars], dtype=bool)
+        self.collision_down = np.array([car.collision_down for car in cars], dtype=bool)
+        self.collision_depth = np.array([car.collision_depth for car in cars], dtype=np.float64)
+        self.collision_counter = np.array([car.collision_counter for car in cars], dtype=np.int64)
+        self.collision_divisor = np.array([car.collision_count[1] if car.collision_count != None else 1 for car in cars], dtype=np.float64)
+
+    # Resets every NPC (new start state & waypoints, see NpcCar.reset), ie. for a new training episode
+    def reset(self):
+        for car in self.cars:
+            car.reset()
+        self.load()
+
+    # Every NPC's dynamic state (see RaceState): a copy of each of the fleet's state arrays, and the state that's kept
+    # on the car objects (laps, set by the finish line, & the collision sides, set by the collision manager & grid)
+    def get_state(self):
+        cars = np.array([(car.lap_count, car.collision_right, car.collision_left, car.collision_up, car.collision_down) for car in self.cars], dtype=np.int64)
+        return [getattr(self, name).copy() for name in STATE_ARRAYS] + [cars]
+
+    # Puts every NPC back in a state from get_state
+    def set_state(self, state):
+        for name, array in zip(STATE_ARRAYS, state):
+            setattr(self, name, array.copy())
+        for car, (lap_count, right, left, up, down), x, y, angle, collision_level, collision_player in zip(
+                self.cars, state[-1].tolist(), self.x.tolist(), self.y.tolist(), self.angle.tolist(), self.collision_level.tolist(), self.collision_player.tolist()):
+            car.lap_count = lap_count
+            car.collision_right = right == 1
+            car.collision_left = left == 1
+            car.collision_up = up == 1
+            car.collision_down = down == 1
+            car.collision_level = collision_level
+            car.collision_player = collision_player
+            car.x = x
+            car.y = y
+            car.angle = angle
+            car.rotate_image()
+            car.rect.x = x
+            car.rect.y = y
+
+    # Updates every NPC for one frame: level collisions, then the same steps as a single NPC's update--waypoint,
+    # move signals (steering & throttle), then either the collision response or the move
+    def update(self):
+        if len(self.cars) == 0:
+            return
+        self.get_collisions()
+        self.determine_waypoints()
+        self.generate_move_signals()
+        self.start_collision_counters()
+        colliding = self.collision_counter > 0
+        if colliding.any():
+            # One push per frame of the physics step, while the counters last
+            self.move_collision(colliding)
+            for frame in range(1, self.step_frames, 1):
+                self.move_collision(colliding & (self.collision_counter > 0))
+        self.move(~colliding)
+        self.update_cars()
+
+    # Tests the NPCs near the level boundary for level collisions, and reads the collision state of every NPC that
+    # collided this frame (set on the car objects by the collision manager & the collision grid)
+    def get_collisions(self):
+        cars = self.cars
+        sprites = self.sprite_base + self.angle.astype(np.intp) % 360
+        rows, columns = self.boundary_field.cells(self.x + self.half_width[sprites], self.y + self.half_height[sprites])
+        # How far each NPC is from the level boundary, less as far as its mask reaches (see CollisionManager.clearance)
+        self.clearance = self.boundary_field.distance[rows, columns] - self.near_distance[sprites]
+        self.collision_level[:] = False
+        for i in np.flatnonzero(self.clearance < 0):
+            self.collision_manager.determine_level_collisions(cars[i], self.level)
+            self.collision_level[i] = cars[i].collision_level
+        self.collision_player = np.array([car.collision_player for car in cars], dtype=bool)
+        for i in np.flatnonzero(self.collision_level | self.collision_player):
+            car = cars[i]
+            self.collision_right[i] = car.collision_right
+            self.collision_left[i] = car.collision_left
+            self.collision_up[i] = car.collision_up
+            self.collision_down[i] = car.collision_down
+            self.collision_depth[i] = car.collision_depth
+
+    # Selects the next waypoint for every NPC within 500 px (in x and y) of its current waypoint
+    def determine_waypoints(self):
+        reached = np.flatnonzero((np.abs(self.waypoint_x - self.x) < 500) & (np.abs(self.waypoint_y - self.y) < 500))
+        if len(reached) == 0:
+            return
+        waypoints = self.waypoints[reached, self.waypoint_counter[reached]]
+        self.waypoint_x[reached] = waypoints[:, 0]
+        self.waypoint_y[reached] = waypoints[:, 1]
+        self.waypoint_counter[reached] += 1
+        # Check to see if we need to restart at first waypoint
+        self.waypoint_counter[self.waypoint_counter >= self.waypoints.shape[1]] = 0
+
+    # Generates every NPC's move signals: no throttle (and, after a level collision, no speed) while colliding,
+    # otherwise full throttle & steering towards the current waypoint
+    def generate_move_signals(self):
+        level = self.collision_level
+        self.throttle = ~level & ~self.collision_player
+        if level.any():
+            self.previous_distance[level] = 0
+            self.throttle_start_time[level] = 0
+            self.throttle_time[level] = 0
+        # Only allow turning if the vehicle is currently in motion
+        steering = self.throttle & (self.previous_distance > 0)
+        # The angle the NPC would be at if it was on-track to its waypoint (0 to 360 deg), and the shortest turn to
+        # it: negative if the waypoint is to the left of the NPC's heading (turn right), positive if it's to the right
+        deg = np.degrees(np.arctan2(self.waypoint_y - self.y, self.waypoint_x - self.x)) % 360
+        diff = ((self.angle - deg + 180) % 360) - 180
+        # "deadband" of 1.5 degree, so the NPC doesn't jitter from right to left
+        turning = steering & (np.abs(diff) > 1.5)
+        self.angle = self.angle - np.copysign(self.handling, diff) * turning
+        self.angle = np.where(self.throttle, self.angle % 360, self.angle)
+        # Time the throttle has been held down--used for acceleration
+        ticks = self.clock.get_ticks()
+        starting = self.throttle & (self.throttle_start_time == 0)
+        self.throttle_start_time = np.where(starting, ticks, self.throttle_start_time)
+        self.throttle_time = np.where(self.throttle & ~starting, (ticks - self.throttle_start_time) / 1000, self.throttle_time)
+
+    # Starts the collision counter of every NPC that collided this frame.  A level collision's counter is high
+    # enough that the first push (counter / divisor) clears the wall
+    def start_collision_counters(self):
+        level_steps, level_divisor = self.cars[0].collision_constant_level
+        player_steps, player_divisor = self.cars[0].collision_constant_player
+        level = self.collision_level
+        player = self.collision_player & ~level
+        if not (level.any() or player.any()):
+            return
+        self.collision_divisor[level] = level_divisor
+        self.collision_counter[level] = np.maximum(level_steps, np.ceil(self.collision_depth[level] * level_divisor))
+        self.collision_divisor[player] = player_divisor
+        self.collision_counter[player] = player_steps
+
+    # Pushes the colliding NPCs away from the sides they collided on, the same as a single NPC's collision move: a
+    # push for its corner (a horizontal & a vertical side), then for each of its sides, each w/the counter decreasing
+    # after every push.  So a corner pushes x by counter, then counter - 1, and y by counter, then counter - 2 (in
+    # the same order, for the same results), and a single side pushes once
+    def move_collision(self, cars):
+        sign_x = (cars & self.collision_left).astype(np.float64) - (cars & self.collision_right)
+        sign_y = (cars & self.collision_up).astype(np.float64) - (cars & self.collision_down)
+        corner = (sign_x != 0) & (sign_y != 0)
+        counter = self.collision_counter
+        divisor = self.collision_divisor
+        self.x = self.x + sign_x * (counter / divisor)
+        self.y = self.y + sign_y * (counter / divisor)
+        self.x = np.where(corner, self.x + sign_x * ((counter - 1) / divisor), self.x)
+        self.y = np.where(corner, self.y + sign_y * ((counter - 2) / divisor), self.y)
+        self.collision_counter = counter - np.where(corner, 3, (sign_x != 0) | (sign_y != 0))
+
+    # Moves the NPCs: their speed (distance per frame) from their throttle time, then their x & y along their angle
+    def move(self, cars):
+        # No throttle--gently coast until speed is 0
+        distance = np.where(self.throttle_time == 0, np.maximum(0, self.previous_distance - self.deceleration),
+                            self.previous_distance + self.accel * self.throttle_time)
+        distance = np.minimum(distance, self.max_speed)
+        rad = self.angle * math.pi / 180
+        x = self.x + distance * self.step_frames * np.cos(rad)
+        y = self.y + distance * self.step_frames * np.sin(rad)
+        if self.step_frames > 1:
+            self.sweep_level(cars, distance * self.step_frames, x, y)
+        if cars.all():
+            self.distance = distance
+            self.previous_distance = distance
+            self.x = x
+            self.y = y
+        else:       # (some NPCs are colliding, & are pushed instead)
+            self.distance = np.where(cars, distance, self.distance)
+            self.previous_distance = np.where(cars, distance, self.previous_distance)
+            self.x = np.where(cars, x, self.x)
+            self.y = np.where(cars, y, self.y)
+
+    # A coarse physics step moves several frames at once: stops each moving NPC that can reach the level boundary in
+    # its move (farther than its clearance) at the first frame of its move that hits the boundary (see
+    # CollisionManager.sweep_level).  Changes the new positions x & y in place
+    def sweep_level(self, cars, lengths, x, y):
+        for i in np.flatnonzero(cars & (lengths > self.clearance)):
+            hit = self.collision_manager.sweep_level(self.cars[i], self.x[i], self.y[i], x[i], y[i], self.step_frames, self.clearance[i])
+            if hit != None:
+                x[i], y[i] = hit
+
+    # Writes every NPC's new position, angle, and level collision state back to its car object.  The car's sprite is
+    # only changed when its angle turns to another whole degree (see SpriteCache)
+    def update_cars(self):
+        for car, x, y, angle, collision_level in zip(self.cars, self.x.tolist(), self.y.tolist(), self.angle.tolist(), self.collision_level.tolist()):
+            car.x = x
+            car.y = y
+            turned = int(angle) != int(car.angle)
+            car.angle = angle
+            car.collision_level = collision_level
+            if turned:
+                car.rotate_image()
+            car.rect.x = x
+            car.rect.y = y
+
+# The fleet's arrays that change during a race (restored by set_state)
+STATE_ARRAYS = ["x", "y", "angle", "distance", "previous_distance", "throttle", "throttle_start_time", "throttle_time",
+                "waypoints", "waypoint_counter", "waypoint_x", "waypoint_y", "collision_level", "collision_player",
+                "collision_right", "collision_left", "collision_up", "collision_down", "collision_depth", "collision_counter",
+                "collision_divisor"]
+
+# Benchmark: time per frame to update more & more NPCs on a level (the NPCs start spread out over the level's
+# waypoints, each w/its own random attributes & waypoints).  Run from the game's root directory:
+# python -m race.NpcFleet [num NPCs ...]
+if __name__ == '__main__':
+    from race import Game
+    from race import Level
+    from race import NpcCar
+    from race import CollisionGrid
+    game = Game.Game(headless=True)
+    level = Level.Level(game.level_image_directory + "track_1.png")
+    images = [game.car_image_directory + image for image in game.car_images]
+    images = [image for image in images if os.path.exists(image)]
+    counts = [int(count) for count in sys.argv[1:]] or [6, 50, 200, 500]
+    for count in counts:
+        points = [point for series in level.npc_points for point in series]
+        start_coords = [points[i * len(points) // count] + (0,) for i in range(0, count, 1)]
+        attributes = game.init_npc_attributes(images, count, start_coords, level.npc_points)
+        game_objects = {"clock": game.clock, "level": level}
+        cars = [NpcCar.NpcCar(attributes, game_objects) for i in range(0, count, 1)]
+        fleet = NpcFleet(cars, level, game_objects)
+        grid = CollisionGrid.CollisionGrid(cars)
+        frames = 200
+        grid_time = 0
+        fleet_time = 0
+        for frame in range(0, frames, 1):
+            start = time.perf_counter()
+            grid.update()
+            grid_time += time.perf_counter() - start
+            start = time.perf_counter()
+            fleet.update()
+            fleet_time += time.perf_counter() - start
+            game.clock.tick(game.FPS)
+        print(str(count).rjust(5), "NPCs | fleet:", round(fleet_time / frames * 1000, 2), "ms per frame,",
+              round(fleet_time / frames / count * 1e6, 1), "us per NPC | collision grid:", round(grid_time / frames * 1000, 2), "ms per frame")
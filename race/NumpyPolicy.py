@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import numpy as np
+
+# The NumpyPolicy class runs a trained policy DQN's forward pass with NumPy alone, so driving with a trained
+# network (play mode) never has to import PyTorch.  The DQN is a small fully-connected network (ReLU between
+# layers), so its weights are exported once from the PyTorch model file to a plain .npz file (see save & export):
+# 'weight_0', 'bias_0', 'weight_1', ... in layer order, each weight stored as (outputs, inputs) like PyTorch's.
+# The weights are kept transposed (inputs, outputs) & every layer's output array is allocated once, so a forward
+# pass is one np.dot, add, & max per layer w/no new arrays.
+class NumpyPolicy:
+
+    def __init__(self, layers):
+        self.layers = [(np.ascontiguousarray(weight.T, dtype=np.float32), np.asarray(bias, dtype=np.float32)) for weight, bias in layers]
+        self.inputs = np.zeros(self.layers[0][0].shape[0], dtype=np.float32)
+        self.outputs = [np.zeros(bias.shape[0], dtype=np.float32) for weight, bias in self.layers]
+
+    # Feeds the inputs forward through every layer, returns the output node values (the action values)
+    def forward(self, inputs):
+        x = inputs
+        last = len(self.layers) - 1
+        for i, (weight, bias) in enumerate(self.layers):
+            np.dot(x, weight, out=self.outputs[i])
+            self.outputs[i] += bias
+            if i < last:
+                np.maximum(self.outputs[i], 0, out=self.outputs[i])     # relu
+            x = self.outputs[i]
+        return x
+
+    # Returns the best action (the output node w/the max value) for the DQN inputs (radar beam distances & speed)
+    def act(self, nn_inputs):
+        self.inputs[:] = nn_inputs
+        return int(self.forward(self.inputs).argmax())
+
+# Loads a NumpyPolicy from an exported .npz file
+def load(file):
+    with np.load(file) as data:
+        layers = []
+        while "weight_" + str(len(layers)) in data:
+            i = str(len(layers))
+            layers.append((data["weight_" + i], data["bias_" + i]))
+    return NumpyPolicy(layers)
+
+# A new, untrained NumpyPolicy w/the given layer sizes (ie. [6, 16, 16, 4]), initialized like PyTorch's nn.Linear
+def random_policy(dims):
+    layers = []
+    for inputs, outputs in zip(dims[:-1], dims[1:]):
+        bound = 1 / np.sqrt(inputs)
+        layers.append((np.random.uniform(-bound, bound, (outputs, inputs)), np.random.uniform(-bound, bound, outputs)))
+    return NumpyPolicy(layers)
+
+# Writes a DQN's state dict (its layers' weight & bias tensors, in order) to an .npz file.  Written to a temporary
+# file first, which then replaces the old file (atomic)
+def save(state_dict, file):
+    arrays = {}
+    tensors = list(state_dict.values())
+    for i in range(0, len(tensors) // 2, 1):
+        arrays["weight_" + str(i)] = np.asarray(tensors[2 * i].detach().cpu(), dtype=np.float32)
+        arrays["bias_" + str(i)] = np.asarray(tensors[2 * i + 1].detach().cpu(), dtype=np.float32)
+    temp_file = file + ".tmp"
+    with open(temp_file, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, file)
+
+# Exports a PyTorch DQN model file (ie. dqn_policy.pt) to an .npz file--the only function here that needs PyTorch
+def export(dqn_file, file):
+    import torch as torch
+    save(torch.load(dqn_file, map_location="cpu"), file)
+
+# Exports the trained policy DQN & times the NumPy forward pass
+# (run from the game's root directory: python -m race.NumpyPolicy [dqn_policy.pt] [dqn_policy.npz])
+if __name__ == '__main__':
+    dqn_file = sys.argv[1] if len(sys.argv) > 1 else "./race/dqn_model_data/dqn_policy.pt"
+    file = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(dqn_file)[0] + ".npz"
+    export(dqn_file, file)
+    print("Exported", dqn_file, "to", file)
+    policy = load(file)
+    nn_inputs = [120.5, 80.0, 300.2, 45.9, 600.1, 7.5]
+    steps = 20000
+    start = time.perf_counter()
+    for i in range(0, steps, 1):
+        policy.act(nn_inputs)
+    print("NumPy forward pass:", round((time.perf_counter() - start) / steps * 1e6, 1), "us per step")
@@ -0,0 +1,102 @@
+import sys
+import pygame
+import numpy as np
+
+# The OccupancyGrid class holds a level's boundary (the pixels of the level boundary color) as a bit-packed
+# NumPy array--one bit per pixel, 8 pixels per byte, one row of bytes per image row.  It's built once per
+# level and lets the radar (and anything else that needs to know where the walls are) test any number
+# of pixels at once with a few vectorized array operations, instead of drawing and overlapping masks.
+class OccupancyGrid:
+
+    def __init__(self, packed, width, height):
+        self.packed = packed    # uint8 array (height, ceil(width / 8)), bit set = boundary pixel
+        self.width = width
+        self.height = height
+
+    # Returns a boolean array, True where the pixel (xs, ys) is a boundary pixel.
+    # Pixels outside of the level are never boundary pixels.
+    def occupied(self, xs, ys):
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        xs = np.where(inside, xs, 0)
+        ys = np.where(inside, ys, 0)
+        bits = (self.packed[ys, xs >> 3] >> (7 - (xs & 7))) & 1
+        return (bits == 1) & inside
+
+    # Casts rays from the origin(s) (x, y) at the given angles (deg) by marching along each ray one pixel at a
+    # time, all rays at once.  Like the original radar beams, a ray ends where it leaves a box of 'extent' pixels
+    # in the x or y direction.  'angles' has shape (..., beams) with any leading dims matching x and y.
+    # Returns the distance to the first boundary pixel hit along each ray (or the max radar length,
+    # sqrt(2) * extent, if nothing is hit), the hit coords, and a boolean of whether each ray hit anything.
+    def cast_rays(self, x, y, angles, extent):
+        x = np.asarray(x, dtype=np.float32)[..., None, None]
+        y = np.asarray(y, dtype=np.float32)[..., None, None]
+        rad = np.radians(np.asarray(angles, dtype=np.float32))
+        c = np.cos(rad)[..., None]
+        s = np.sin(rad)[..., None]
+        # Ray length before it leaves the box, and the step distances (1 px) along the longest possible ray
+        limit = extent / np.maximum(np.abs(c), np.abs(s))
+        steps = np.arange(1, int(np.ceil(np.sqrt(2) * extent)) + 1, dtype=np.float32)
+        xs = np.floor(x + c * steps).astype(np.int32)
+        ys = np.floor(y + s * steps).astype(np.int32)
+        # Mark the boundary pixels along every ray (within its length), then find the first one
+        hits = self.occupied(xs, ys) & (steps <= limit)
+        first = np.argmax(hits, axis=-1)[..., None]
+        hit = np.take_along_axis(hits, first, axis=-1)[..., 0]
+        hit_x = np.take_along_axis(xs, first, axis=-1)[..., 0]
+        hit_y = np.take_along_axis(ys, first, axis=-1)[..., 0]
+        distances = np.hypot(hit_x - x[..., 0], hit_y - y[..., 0])
+        distances = np.where(hit, distances, int(np.hypot(extent, extent)))
+        return distances, hit_x, hit_y, hit
+
+    # Approx. bytes of working memory cast_rays uses to cast 'beams' rays in a box of 'extent' pixels (its arrays
+    # hold one value per ray per step, ~28 bytes per step in all at their peak)
+    def cast_memory(self, beams, extent):
+        steps = int(np.ceil(np.sqrt(2) * extent))
+        return beams * steps * 28 + steps * 8
+
+    # Returns a pygame Mask of the grid (ie. for mask overlap tests), written straight into the mask's memory instead
+    # of thresholding the level image again.  A mask stores its bits LSB first in machine words, one column of words
+    # (each covering the same 'word_bits' wide range of x) after another, while the grid's rows are MSB first bytes.
+    def to_mask(self):
+        mask = pygame.mask.Mask((self.width, self.height))
+        words = np.asarray(memoryview(mask))                                    # (word columns, height)
+        word_bytes = words.itemsize
+        rows = np.zeros((self.height, words.shape[0] * word_bytes), dtype=np.uint8)
+        rows[:, :self.packed.shape[1]] = REVERSED_BITS[self.packed]
+        rows = rows.reshape(self.height, words.shape[0], word_bytes)
+        if sys.byteorder == "big":
+            rows = rows[:, :, ::-1]
+        words.view(np.uint8).reshape(words.shape[0], self.height, word_bytes)[:] = rows.transpose(1, 0, 2)
+        return mask
+
+# Each byte value w/its bits in reverse order
+REVERSED_BITS = np.packbits(np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)[:, ::-1], axis=1)[:, 0]
+
+# Builds an occupancy grid from a pygame Mask (ie. the level's collision mask) by reading the mask's memory (see
+# to_mask), a strip of rows at a time
+def from_mask(mask, strip_height=256):
+    width, height = mask.get_size()
+    words = np.asarray(memoryview(mask))                                        # (word columns, height)
+    word_bytes = words.itemsize
+    columns = words.view(np.uint8).reshape(words.shape[0], height, word_bytes)
+    packed = np.zeros((height, (width + 7) // 8), dtype=np.uint8)
+    for y in range(0, height, strip_height):
+        rows = columns[:, y:y + strip_height].transpose(1, 0, 2)
+        if sys.byteorder == "big":
+            rows = rows[:, :, ::-1]
+        rows = rows.reshape(rows.shape[0], -1)[:, :packed.shape[1]]
+        packed[y:y + strip_height] = REVERSED_BITS[rows]
+    return OccupancyGrid(packed, width, height)
+
+# Builds a level's occupancy grid from its image by matching the level boundary color.  The image is
+# read in horizontal strips, so only one strip of pixels is ever copied out of the (very large) image.
+def from_surface(surface, boundary_color, strip_height=256):
+    width, height = surface.get_size()
+    packed = np.zeros((height, (width + 7) // 8), dtype=np.uint8)
+    color = np.array(pygame.Color(boundary_color)[:3], dtype=np.uint8)
+    for y in range(0, height, strip_height):
+        h = min(strip_height, height - y)
+        strip = pygame.surfarray.array3d(surface.subsurface((0, y, width, h)))  # (width, h, 3)
+        boundary = np.all(strip == color, axis=2)
+        packed[y:y + h] = np.packbits(boundary.T, axis=1)
+    return OccupancyGrid(packed, width, height)
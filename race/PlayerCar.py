@@ -5,6 +5,7 @@ import math
 
 from race.GameObject import ImageObject
 from race import CollisionManager
+from race import SpriteCache
 
 # Inits and controls player's car object.
 # Inherets some additional attributes from ImageObject parent class  
@@ -26,7 +27,14 @@ class PlayerCar(ImageObject):
         self.boost_count = player_attributes["BOOST"]
         self.keys = key_states
         self.game_objects = game_objects
-        
+        self.clock = game_objects["clock"]  # Simulated time clock used by the throttle (and boost) timers
+        # Start state, restored by reset() at the start of every training episode
+        self.start_coords = player_attributes["START_COORDS"]
+        self.start_stats = (self.max_speed, self.accel, self.boost_count)
+        self.init_controls()
+    
+    # Inits (or clears) the player's lap count and car control state
+    def init_controls(self):
         self.lap_count = 0
         # Player's car control state variables. Times are used for acceleration calcs
         self.e_brake = False
@@ -38,6 +46,33 @@ class PlayerCar(ImageObject):
         self.boost_time = 0
         self.distance = 0
         self.previous_distance = 0
+    
+    # Puts the car back at its start coords, stopped, with its original stats (ie. for a new training episode)
+    def reset(self):
+        self.x, self.y, self.angle = self.start_coords
+        self.max_speed, self.accel, self.boost_count = self.start_stats
+        self.init_controls()
+        self.reset_collisions()
+        self.rotate_image()
+        self.rect.x = self.x
+        self.rect.y = self.y
+
+    # The car's dynamic state (see RaceState): position, speed, controls & timers, boosted stats, laps, and collision state
+    def get_state(self):
+        return (self.x, self.y, self.angle, self.distance, self.previous_distance, self.throttle, self.e_brake, self.boost,
+                self.throttle_start_time, self.throttle_time, self.boost_start_time, self.boost_time, self.max_speed, self.accel,
+                self.boost_count, self.lap_count, self.collision_level, self.collision_player, self.collision_right, self.collision_left,
+                self.collision_up, self.collision_down, self.collision_depth, self.collision_counter, self.collision_count)
+
+    # Puts the car back in a state from get_state
+    def set_state(self, state):
+        (self.x, self.y, self.angle, self.distance, self.previous_distance, self.throttle, self.e_brake, self.boost,
+         self.throttle_start_time, self.throttle_time, self.boost_start_time, self.boost_time, self.max_speed, self.accel,
+         self.boost_count, self.lap_count, self.collision_level, self.collision_player, self.collision_right, self.collision_left,
+         self.collision_up, self.collision_down, self.collision_depth, self.collision_counter, self.collision_count) = state
+        self.rotate_image()
+        self.rect.x = self.x
+        self.rect.y = self.y
 
     def init_collision_manager(self):
         self.collision_manager = CollisionManager.CollisionManager(self, self.game_objects)
@@ -51,12 +86,16 @@ class PlayerCar(ImageObject):
         # Checks whether to move the car based on either a collision or key inputs
         if self.collision_level == True:
             self.collision_count = self.collision_constant_level
-            self.collision_counter = self.collision_count[0]    # Start the collision counter
+            # Start the collision counter for level coll--high enough that the first push (counter / count[1]) clears the wall
+            self.collision_counter = max(self.collision_count[0], math.ceil(self.collision_depth * self.collision_count[1]))
         elif self.collision_player == True:
             self.collision_count = self.collision_constant_player
             self.collision_counter = self.collision_count[0]
         if self.collision_counter > 0:
-            self.move_collision()
+            # One push per frame of the physics step (see SimClock), while the counter lasts
+            for frame in range(0, self.clock.step_frames, 1):
+                if self.collision_counter > 0:
+                    self.move_collision()
         else:
             self.move()
            
@@ -100,15 +139,23 @@ class PlayerCar(ImageObject):
         
         
     # Moves the car to the new calculated distance based on 
-    # speed and turning calculations
+    # speed and turning calculations (the distance per frame, for each frame of the physics step)
     def move(self):
+        start_x = self.x
+        start_y = self.y
+        step = self.clock.step_frames
         # Performs distance to move calc (updates self.distance)
         self.calc_distance() 
         # convert the turn angle into radians
         rad = (self.angle * math.pi) / 180
         # Accounts for turning and calculates new x and y coordinates
-        self.x = self.x + self.distance * math.cos(rad)
-        self.y = self.y + self.distance * math.sin(rad)
+        self.x = self.x + self.distance * step * math.cos(rad)
+        self.y = self.y + self.distance * step * math.sin(rad)
+        # A coarse physics step moves several frames at once--stop at the first frame that hits the level boundary
+        if step > 1:
+            hit = self.collision_manager.sweep_level(self, start_x, start_y, self.x, self.y, step)
+            if hit != None:
+                self.x, self.y = hit
         
     # Gets user key inputs and sets car's control signals
     def set_signals(self):
@@ -139,10 +186,10 @@ class PlayerCar(ImageObject):
         # Calculate how long throttle has been held down--used for acceleration of vehicle
         # When throttle is first pressed, get the current time
         if self.throttle and self.throttle_start_time == 0: 
-            self.throttle_start_time = pygame.time.get_ticks()
+            self.throttle_start_time = self.clock.get_ticks()
         # Throttle is still down since last iteration
         elif self.throttle:
-            self.throttle_time = pygame.time.get_ticks() - self.throttle_start_time # current time - initial
+            self.throttle_time = self.clock.get_ticks() - self.throttle_start_time # current time - initial
             self.throttle_time = self.throttle_time / 1000 # convert from ms to seconds
         # Throttle not pressed, reset timers
         else:
@@ -151,13 +198,13 @@ class PlayerCar(ImageObject):
                 
         # If boost, 40% max speed and 400% accel increase
         if self.boost == True and self.boost_count > 0 and self.boost_start_time == 0:
-            self.boost_start_time = pygame.time.get_ticks()
+            self.boost_start_time = self.clock.get_ticks()
             self.max_speed = self.max_speed * 1.4
             self.accel = self.accel * 4
             self.boost_count -= 1
         # Boost timer already initiated, get elapsed boost time
         elif self.boost_start_time > 0:
-            self.boost_time = (pygame.time.get_ticks() - self.boost_start_time) // 1000
+            self.boost_time = (self.clock.get_ticks() - self.boost_start_time) // 1000
         # After 4 seconds boost ends - reduce max_speed value to original, reset timers
         if self.boost_time >= 4:
             self.max_speed = self.max_speed / 1.4
@@ -175,37 +222,33 @@ class PlayerCar(ImageObject):
             # Generate handling boost if e_braking WITHOUT accelerator (4 considered ideal)
             if self.e_brake == True and self.throttle == False:
                 handling = handling + (self.e_brake_handling - handling)
-            # Adjust angle based on the handling calc
+            # Adjust angle based on the handling calc (for each frame of the physics step)
             if direction == "L": # Turn left
-                self.angle -= 1 * handling
+                self.angle -= self.clock.step_frames * handling
             else:                # Turn right
-                self.angle += 1 * handling
+                self.angle += self.clock.step_frames * handling
         # normalize angle between 0 and 360 degrees
         self.angle = self.angle % 360
         
-    # Updates player's car image file (orientation) according to new turn angle
+    # Updates player's car image (orientation) according to new turn angle, 
+    # via the pre-loaded sprite cache (image and mask at the truncated angle)
     def rotate_image(self):
-        image_angle = self.angle
-        image_angle = str(int(image_angle)) # truncate the angle and convert to string to call the right filename
-        
-        # UPDATE CAR MASK
-        self.image = pygame.image.load(self.image_basename + "_" + image_angle + ".png")
+        self.image, self.car_mask = SpriteCache.get_sprite(self.image_basename, self.angle)
         self.rect = self.image.get_rect()
-        self.image.set_colorkey("white")
-        self.image.convert_alpha()
-        self.car_mask = pygame.mask.from_surface(self.image)
     
     # Calculates cars new distance (speed) on the map based on acceleration and time
+    # (speeding up or slowing down for each frame of the physics step)
     def calc_distance(self):
+        step = self.clock.step_frames
         # if no throttle, decelerate player
         if self.throttle_time == 0 and self.e_brake == False: # No brake--gently coast until speed is 0
-                self.distance = max(0, self.previous_distance - self.deceleration)
+                self.distance = max(0, self.previous_distance - self.deceleration * step)
         elif self.e_brake == True: # if e_breaking, use E_BRAKE_DECELERATION instead
-                self.distance = max(0, self.previous_distance - self.e_brake_deceleration)        
+                self.distance = max(0, self.previous_distance - self.e_brake_deceleration * step)        
         # Else, player is accelerating (self.throttle == True)
         # calc distance based on acceleration constant and time throttle has been held
         else:
-            self.distance = self.previous_distance + self.accel * self.throttle_time
+            self.distance = self.previous_distance + self.accel * self.throttle_time * step
         # Prevents acceleration past player's maximum speed constant
         if self.distance > self.max_speed:
             self.distance = self.max_speed
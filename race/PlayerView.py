@@ -1,6 +1,7 @@
 import pygame
 
 from race import GameObject
+from race import TileRenderer
 
 # Player class creates a 'viewport' (camera) for the player.  Recieves map and game object data
 # and draws everything to the viewport surface, before the final output is drawn to screen. 
@@ -23,8 +24,11 @@ class PlayerView:
         
         self.level_image = self.level.image # racetrack image
         self.player_image = self.player.image
-        # Create the viewport    
-        self.viewport = pygame.Surface((self.screen_width, self.screen_height))
+        # The viewport is drawn straight to the screen (it's the size of the screen, so there's nothing to crop)
+        self.viewport = self.screen
+        # The racetrack is drawn in tiles, w/the finish line drawn onto them once (see TileRenderer)
+        self.level_tiles = TileRenderer.TileRenderer(self.level_image, (self.screen_width, self.screen_height),
+                                                     overlays=[(self.finish_line.finish_line, self.finish_line.coords)])
  
     # Updates any needed in-game object info and viewport coords
     def update_viewport(self):
@@ -36,8 +40,6 @@ class PlayerView:
         # The center point of the player_car rect for the x & y
         self.radar_offset_x = self.player_offset_x + .5 * self.player.rect.width
         self.radar_offset_y = self.player_offset_y + .5 * self.player.rect.height
-        
-        self.viewport.fill((255,255,255)) # Fill background of viewport white
         # Updates viewport coords 
         #(-1 moves viewport in equal and opposite movement of player)
         self.x = -1 * self.player.rect.x
@@ -49,8 +51,7 @@ class PlayerView:
     # Constructs the player's viewport by appending map and all game objects to correct surfaces
     # (updates image buffer)
     def display_viewport(self):
-        self.viewport.blit(self.level_image, (self.x, self.y))                              # draw the level image to viewport
-        self.level_image.blit(self.finish_line.finish_line, self.finish_line.coords)        # draw the finsih line to the level image
+        self.level_tiles.draw(self.viewport, self.x, self.y)                                # draw the level image (& finish line) to viewport
         self.viewport.blit(self.player.image, (self.player_offset_x, self.player_offset_y)) # draw car to center of viewport
         if self.ai != None:
             for beam in self.ai.radar.radar_beams:
@@ -70,6 +71,4 @@ class PlayerView:
             for text in self.finish_line.race_end_prompt:
                 self.viewport.blit(text[0], text[1])
         
-        self.screen.blit(self.viewport, (0, 0)) # draw the viewport to screen
-        
 
@@ -0,0 +1,80 @@
+import numpy as np
+import torch as torch
+
+from race.ReplayBuffer import ReplayBuffer
+from race import SumTree
+
+# The PrioritizedReplayBuffer class is a ReplayBuffer that samples transitions in proportion to their priority (how
+# much the network still has to learn from them) instead of uniformly.  A transition's priority is its last TD error
+# (the difference between its Q value and its Bellman target) raised to the power 'alpha', so the rare transitions
+# the network predicts badly--ie. the ones just before a crash--are replayed far more often than ordinary driving.
+# New transitions get the highest priority seen so far, so each one is sampled at least once soon after it's added.
+# Priorities are kept in a SumTree, so sampling and priority updates are O(log N) and O(batch size * log N).
+# Because prioritized sampling changes the distribution the network is trained on, each sampled transition also
+# gets an importance-sampling weight (N * P(i)) ^ -beta, normalized by the largest weight, that scales its loss.
+# Beta is annealed from 'beta' to 1 (full correction) over 'beta_steps' samples.
+class PrioritizedReplayBuffer(ReplayBuffer):
+
+    def __init__(self, capacity, state_size, batch_size, device="cpu", path=None, alpha=.6, beta=.4, beta_steps=100000):
+        self.tree = SumTree.SumTree(capacity)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = (1 - beta) / beta_steps
+        self.priority_epsilon = 1e-5    # Added to every TD error, so no complete transition has a priority of 0
+        self.max_priority = 1.0
+        super().__init__(capacity, state_size, batch_size, device, path)
+        if self.path != None:
+            # Priorities aren't saved with the replay memory files, every transition starts over at the max priority
+            self.tree.update_batch(np.arange(capacity), np.where(self.valid, self.max_priority, 0))
+        self.batch_priorities = np.zeros(self.batch_size, dtype=np.float64)
+        self.weights_array = np.zeros((self.batch_size, 1), dtype=np.float32)
+        self.weights_tensor = torch.from_numpy(self.weights_array)
+        if self.device.type != "cpu":
+            self.weights_tensor = torch.empty((self.batch_size, 1), dtype=torch.float32, device=self.device)
+
+    # Complete transitions start at the max priority, incomplete ones are never sampled (priority 0)
+    def set_valid(self, indexes, valid):
+        super().set_valid(indexes, valid)
+        if np.ndim(indexes) == 0:
+            self.tree.update(indexes, self.max_priority if valid else 0)
+        else:
+            self.tree.update_batch(indexes, np.where(valid, self.max_priority, 0))
+
+    # Picks the slots of a sample batch in proportion to their priority: the total priority is split into
+    # 'batch size' equal segments and one value is drawn from each (stratified), then found in the tree
+    def sample_indexes(self):
+        if self.valid_count == 0:
+            raise ValueError("Replay memory has no complete transitions to sample")
+        total = self.tree.total()
+        values = (np.arange(self.batch_size) + np.random.random(self.batch_size)) * (total / self.batch_size)
+        indexes = self.batch_indexes
+        indexes[:] = self.tree.find(values)
+        # Float rounding in the tree's sums can land a value just past the last priority--redraw those
+        redraw = ~self.valid[indexes]
+        while redraw.any():
+            indexes[redraw] = self.tree.find(np.random.random(np.count_nonzero(redraw)) * total)
+            redraw = ~self.valid[indexes]
+        self.batch_priorities[:] = self.tree.get(indexes)
+
+    # Importance-sampling weights of the last sample batch (and anneals beta)
+    def sample_weights(self):
+        total = self.tree.total()
+        count = self.num_transitions()
+        max_weight = (count * self.tree.min() / total) ** -self.beta
+        self.weights_array[:, 0] = (count * self.batch_priorities / total) ** -self.beta / max_weight
+        self.beta = min(1.0, self.beta + self.beta_increment)
+        if self.device.type != "cpu":
+            self.weights_tensor.copy_(torch.from_numpy(self.weights_array), non_blocking=True)
+        return self.weights_tensor
+
+    # Sets the last sample batch's priorities (or the priorities of the transitions at 'indexes') from their
+    # TD errors (tensor or array, any shape)
+    def update_priorities(self, td_errors, indexes=None):
+        if indexes is None:
+            indexes = self.batch_indexes
+        if torch.is_tensor(td_errors):
+            td_errors = td_errors.detach().cpu().numpy()
+        priorities = (np.abs(td_errors.reshape(-1)).astype(np.float64) + self.priority_epsilon) ** self.alpha
+        self.max_priority = max(self.max_priority, float(priorities.max(initial=0)))  # (none left, if all were written over)
+        # (a slot sampled more than once in the batch simply keeps its last priority)
+        self.tree.update_batch(indexes, np.where(self.valid[indexes], priorities, 0))
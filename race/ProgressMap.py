@@ -0,0 +1,157 @@
+import sys
+import math
+import time
+import numpy as np
+
+from race import BoundaryField
+
+# The ProgressMap class tells, for any point on a level's racetrack, how far around the lap it is: 0 at the finish
+# line, rising to 1 just before the finish line again.  It's built once per level from its occupancy grid (when the
+# level pack is compiled, see from_grid & LevelPack) and memory-mapped from the pack, so lap counting, wrong-way
+# detection, race positions and progress rewards are each one lookup per car (see FinishLine).
+# The level is split into square cells (a cell w/any boundary pixel is a wall).  Two breadth first searches through
+# the free cells (w/the finish line itself closed off, so each goes the whole way around) find each cell's distance
+# along the track from the edge of the finish line cars leave it by--the way the player's car faces at the start--and
+# its distance back to the line's other edge, going the other way around.  A cell's progress is the first distance over the sum of both, so it rises
+# steadily along the track at any point across it (the distance from the line alone would barely change along the
+# outside of a wide corner, its rings all centered on the corner's inside).  The finish line's own cells are at 0.
+# Cells the searches can't reach (walls, the infield, outside the track) are off the track.  Progress is kept as
+# uint16 (fraction * SCALE), and the lap length is the shortest way around.
+class ProgressMap:
+
+    def __init__(self, progress, cell_size, lap_length):
+        self.progress = progress        # uint16 array (rows, columns): fraction of the lap * SCALE, OFF_TRACK off the track
+        self.cell_size = cell_size      # Cell size (px), a multiple of 8 (one byte of the bit-packed grid)
+        self.lap_length = lap_length    # Length (px) of the lap, along the track
+        self.rows, self.columns = progress.shape
+
+    # Returns the fraction of the lap at the points (x, y) (arrays, ie. for many cars at once), -1 where off the track
+    def lookup(self, x, y):
+        columns = np.clip(np.asarray(x) // self.cell_size, 0, self.columns - 1).astype(np.intp)
+        rows = np.clip(np.asarray(y) // self.cell_size, 0, self.rows - 1).astype(np.intp)
+        progress = self.progress[rows, columns]
+        return np.where(progress == OFF_TRACK, -1., progress / SCALE)
+
+    # Returns the fraction of the lap at the point (x, y), or -1 if it's off the track (a single point w/plain
+    # indexing, much faster than lookup's array ops)
+    def at(self, x, y):
+        column = int(x // self.cell_size)
+        row = int(y // self.cell_size)
+        if column < 0 or column >= self.columns or row < 0 or row >= self.rows:
+            return -1.
+        progress = self.progress.item(row, column)
+        if progress == OFF_TRACK:
+            return -1.
+        return progress / SCALE
+
+    # Bytes held by the map
+    def memory_usage(self):
+        return self.progress.nbytes
+
+CELL_SIZE = 8
+SCALE = 65534
+OFF_TRACK = 65535
+
+# 8 neighbours (row, column) of a cell: the 4 straight neighbours first
+NEIGHBOURS = np.array([(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)])
+
+# Which way cars cross the finish line, from the player's start angle (degrees, 0 is right & 90 is down, see
+# PlayerCar): whether they cross it going up or down (rather than left or right), and whether going up (or left)
+def crossing(start_angle):
+    direction_x = math.cos(math.radians(start_angle))
+    direction_y = math.sin(math.radians(start_angle))
+    if abs(direction_y) >= abs(direction_x):
+        return True, direction_y < 0
+    return False, direction_x < 0
+
+# Builds a level's progress map from its occupancy grid, its finish line (x, y, width, height, ...) and the player's
+# start angle (degrees, the way cars cross the finish line, see crossing)
+def from_grid(grid, finish_line_coords, start_angle=270, cell_size=CELL_SIZE):
+    walls = BoundaryField.cell_coverage(grid, cell_size) > 0
+    x, y, w, h = finish_line_coords[:4]
+    vertical, up = crossing(start_angle)
+    if not vertical:
+        # Cars cross the line going left or right: the map is built on the transposed grid (where they cross it going
+        # up or down), then transposed back
+        walls = walls.T
+        x, y, w, h = y, x, h, w
+    rows, columns = walls.shape
+    # The finish line's cells: along each of its rows, from its center out to the walls on either side of the track
+    # (its rect may reach past the track's edge, or not quite to it)
+    top = y // cell_size
+    bottom = min(rows - 1, (y + h - 1) // cell_size)
+    center = min(columns - 1, (x + w // 2) // cell_size)
+    line = np.zeros((rows, columns), dtype=bool)
+    for row in range(top, bottom + 1, 1):
+        if walls[row, center]:
+            continue
+        left = center
+        right = center
+        while left > 0 and not walls[row, left - 1]:
+            left -= 1
+        while right < columns - 1 and not walls[row, right + 1]:
+            right += 1
+        line[row, left:right + 1] = True
+    closed = walls | line
+    # Search forwards from the free cells just past the finish line (above it, for cars going up), & backwards from
+    # those just before it
+    above = max(0, top - 1)
+    below = min(rows - 1, bottom + 1)
+    start_above = np.flatnonzero(line[top] & ~walls[above]) + above * columns
+    start_below = np.flatnonzero(line[bottom] & ~walls[below]) + below * columns
+    forwards = search(closed, start_above if up else start_below)
+    backwards = search(closed, start_below if up else start_above)
+    reached = (forwards >= 0) & (backwards >= 0)
+    total = forwards + backwards + 1
+    progress = np.full((rows, columns), OFF_TRACK, dtype=np.uint16)
+    progress[reached] = np.round(forwards[reached] / total[reached] * SCALE).astype(np.uint16)
+    progress[line] = 0
+    lap = total[reached].min() + bottom - top + 1
+    if not vertical:
+        progress = np.ascontiguousarray(progress.T)
+    return ProgressMap(progress, cell_size, int(lap * cell_size))
+
+# Distance (cells) from the start cells (flat indexes) to every cell that isn't closed, -1 where it can't be reached.
+# The search alternates between steps to all 8 neighbours & to the 4 straight neighbours only (an octagonal distance,
+# much closer to the true distance than either), one whole frontier of cells at a time
+def search(closed, start):
+    rows, columns = closed.shape
+    distance = np.full((rows, columns), -1, dtype=np.int32)
+    frontier = start[~closed.ravel()[start]]
+    distance.ravel()[frontier] = 0
+    level = 0
+    while len(frontier) > 0:
+        level += 1
+        neighbours = NEIGHBOURS if level % 2 == 1 else NEIGHBOURS[:4]
+        frontier_rows, frontier_columns = np.divmod(frontier, columns)
+        next_rows = (frontier_rows[:, None] + neighbours[:, 0]).ravel()
+        next_columns = (frontier_columns[:, None] + neighbours[:, 1]).ravel()
+        inside = (next_rows >= 0) & (next_rows < rows) & (next_columns >= 0) & (next_columns < columns)
+        cells = np.unique(next_rows[inside] * columns + next_columns[inside])
+        cells = cells[~closed.ravel()[cells] & (distance.ravel()[cells] < 0)]
+        distance.ravel()[cells] = level
+        frontier = cells
+    return distance
+
+# Builds the progress map for a level, and times it & lookups for many points at once and one at a time
+# (run from the game's root directory: python -m race.ProgressMap [race/levels/track_1.png])
+if __name__ == '__main__':
+    from race import Level
+    level = Level.Level(sys.argv[1] if len(sys.argv) > 1 else "./race/levels/track_1.png")
+    start = time.perf_counter()
+    progress_map = from_grid(level.get_grid(), level.finish_line_coords, level.player_start_coords[2])
+    print("Progress map built in", round(time.perf_counter() - start, 2), "s |", progress_map.columns, "x", progress_map.rows, "cells |",
+          round(progress_map.memory_usage() / 2 ** 20, 1), "MB | lap length:", progress_map.lap_length, "px |",
+          round(np.mean(progress_map.progress != OFF_TRACK) * 100, 1), "% of the cells on the track")
+    rng = np.random.default_rng(0)
+    xs = rng.uniform(0, level.rect.width, 100000)
+    ys = rng.uniform(0, level.rect.height, 100000)
+    start = time.perf_counter()
+    progress_map.lookup(xs, ys)
+    array_time = (time.perf_counter() - start) / len(xs)
+    points = list(zip(xs[:10000].tolist(), ys[:10000].tolist()))
+    start = time.perf_counter()
+    for x, y in points:
+        progress_map.at(x, y)
+    point_time = (time.perf_counter() - start) / len(points)
+    print("Lookup:", round(array_time * 1e9), "ns per point (arrays) |", round(point_time * 1e9), "ns per point (one at a time)")
@@ -11,7 +11,10 @@ from race import Level
 from race import FinishLine
 from race import PlayerCar
 from race import NpcCar
-from race import AiAgent
+from race import NpcFleet
+from race import CollisionGrid
+from race import AiPilot
+from race import RaceState
         
 class Race:
 
@@ -29,21 +32,26 @@ class Race:
         self.npc_car_images = [self.game.car_image_directory + image for image in self.npc_car_images] # append the image directory to each of the image filenames
         self.npc_car_images = [image for image in self.npc_car_images if image != self.player_selection] # Don't let npc's be same color as player's color choice
         self.ai_selection = game.ai_selection
+        self.headless = game.headless   # No window: skip events, drawing, and the frame limiter
                
-        # Init a dictionary to store all in-game (race) objects
-        self.game_objects = {}
+        # Init a dictionary to store all in-game (race) objects (the clock is shared for all in-game timers)
+        self.game_objects = {"clock": self.clock}
         # Init level and get critical level data from level's init .txt file to init all additional objects
         self.level = Level.Level(self.level_selection)     
         # Init race finish line
         self.finish_line = FinishLine.FinishLine(self.level, self.game_objects, self.game)    
-        # Load and init the attributes for player and NPCs (as defined in Main class)
+        # Load and init the attributes for player and NPCs (as defined in the Game class)
         self.player_attributes = self.game.init_player_attributes(self.player_selection, self.level.player_start_coords)
         self.npc_attributes = self.game.init_npc_attributes(self.npc_car_images, self.level.npcs, self.level.npc_start_coords, self.level.npc_points)
         # Init the player's car object
         self.player_car = PlayerCar.PlayerCar(self.player_attributes, self.game.key_state, self.game_objects)
-        # If player selected, init the player AiAgent
+        # If player selected, init the player AiAgent to train the DQN, or the AiPilot to only drive with it
         if self.game.ai_selection == True:
-            self.ai_agent = AiAgent.AiAgent(self.game, self.player_car, self.level, self.game_objects)   
+            if self.game.ai_train == True:
+                from race import AiAgent    # (imports PyTorch--only loaded when training)
+                self.ai_agent = AiAgent.AiAgent(self.game, self.player_car, self.level, self.game_objects)
+            else:
+                self.ai_agent = AiPilot.AiPilot(self.game, self.player_car, self.level, self.game_objects)
         # Init all npc car(s)
         self.npc_cars = []
         for i in range(0, self.npc_attributes["NPCS"], 1):
@@ -54,38 +62,93 @@ class Race:
             self.game_objects.update({"ai": self.ai_agent})
         # Init player collision manager for collision detection
         self.player_car.init_collision_manager()
-        # Init NPC collision manager for collision detection
-        for car in self.npc_cars:
-            car.init_collision_manager()
+        # Init the NPC fleet, which drives all of the NPCs at once
+        self.npc_fleet = NpcFleet.NpcFleet(self.npc_cars, self.level, self.game_objects)
+        # Init the collision grid for collision detection between all cars (once per frame)
+        self.collision_grid = CollisionGrid.CollisionGrid([self.player_car] + self.npc_cars)
+        # Snapshots of the race for training episodes to start from (see StartPool), if any
+        self.start_pool = None
+        self.pool_start = False     # Whether the current episode started from one of the pool's snapshots
         # Init the player's viewport (i.e. the "view" blitted to the screen)
-        self.player = PlayerView.PlayerView(self.screen, self.game_objects)
-            
-        # Start the game's race loop
-        self.race_loop()
+        if not self.headless:
+            self.player = PlayerView.PlayerView(self.screen, self.game_objects)
+    
+    # Starts a new (training) episode in place.  Restores the cars, finish line, and AI agent to their
+    # start state, while keeping every loaded asset (level, radar grid, car sprites, DQN, & replay memory).
+    # W/a start pool, the episode may start from one of the pool's snapshots instead of the start line
+    def reset(self):
+        state = None
+        if self.start_pool != None:
+            state = self.start_pool.pick()
+        self.pool_start = state != None
+        if state != None:
+            self.restore(state)
+        else:
+            for key in self.game.key_state:
+                self.game.key_state[key] = False
+            self.player_car.reset()
+            self.npc_fleet.reset()
+            self.finish_line.reset()
+        if self.ai_selection == True:
+            self.ai_agent.reset()
+
+    # Takes a snapshot of the race's dynamic state (see RaceState)
+    def snapshot(self):
+        episode = None
+        if self.ai_selection == True:
+            episode = self.ai_agent.get_state()
+        return RaceState.RaceState(self.clock.ticks, tuple(self.game.key_state.values()), self.player_car.get_state(),
+                                   self.npc_fleet.get_state(), self.finish_line.get_state(), episode)
+
+    # Puts the race back in a snapshot's state (ie. to rewind it, or to start an episode partway around the track)
+    def restore(self, state):
+        self.clock.ticks = state.ticks
+        for key, value in zip(self.game.key_state, state.keys):
+            self.game.key_state[key] = value
+        self.player_car.set_state(state.player)
+        self.npc_fleet.set_state(state.npcs)
+        self.finish_line.set_state(state.finish_line)
+        if self.ai_selection == True and state.episode != None:
+            self.ai_agent.set_state(state.episode)
     
     # Update objects - Makes obj method calls to detect each of
     # their collision status', calculate their next movements, etc.
     def update(self):    
+        # Offer the start pool a snapshot (of the race as the frame starts) every so often, while the player is
+        # driving clear of any collision (& not already touching the level boundary)
+        if self.start_pool != None and self.start_pool.due(self.clock.get_ticks()):
+            player = self.player_car
+            if player.distance > 0 and player.collision_counter == 0 and not player.collision_level:
+                player.collision_manager.level_calc_offset(player)
+                if not player.collision_manager.overlap:
+                    self.start_pool.add(self.snapshot(), self.clock.get_ticks())
         self.level.update()
+        self.collision_grid.update()
         self.player_car.update()
         if self.ai_selection == True:
             self.ai_agent.update()
-        for car in self.npc_cars:
-            car.update()
+        self.npc_fleet.update()
         self.finish_line.update()
-        self.player.update_viewport()
+        if not self.headless:
+            self.player.update_viewport()
     
     # Makes call to player's viewport to finalize the drawing of everything to the screen
     def draw(self):
         self.player.display_viewport() # Draws map and all game objects to image buffer
-        pygame.display.update()        # After all draws to image buffer, update the display
+        pygame.display.flip()          # After all draws to image buffer, update the (whole) display
     
-    # Race loop
+    # Race loop--runs until the race is over or the game is quit. AI training episodes restart within the loop
     def race_loop(self):
 
-        while self.game.running:         
-            self.game.get_events()      # Update keyboard inputs detected by game (Main class)      
+        while self.game.running and not self.finish_line.race_over:         
+            if not self.headless:
+                self.game.get_events()  # Update keyboard inputs detected by game (Main class)      
             self.update()               # Update all in-race objects
-            self.draw()                 # Draw to screen
-            self.clock.tick(self.FPS)   # Ensures framerate constant is maintained
+            if self.ai_selection == True and self.ai_agent.episode_done:
+                self.reset()            # The agent's training episode ended, start the next one
+            if not self.headless:
+                self.draw()             # Draw to screen
+            self.clock.tick(self.FPS)   # Advance simulated time (and maintain the framerate, unless headless)
+        if self.ai_selection == True:
+            self.ai_agent.close()       # Stop the agent's training
             
\ No newline at end of file
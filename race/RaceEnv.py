@@ -0,0 +1,130 @@
+import pygame
+import random
+import time
+import numpy as np
+
+from race import Game
+from race import Race
+from race import AiRadar
+from race import Reward
+from race import Controls
+
+# The RaceEnv class wraps a Race in a Gym-style environment, so the simulator can be driven from any training
+# script (no title screen, no AiAgent, no keyboard).  reset() starts a new episode and returns the first
+# observation, and step(action) performs an action and returns the (observation, reward, done, info) tuple.
+# The observation is the same as the AiAgent's DQN inputs: the 5 radar beam distances plus the player's speed.
+# The reward is the AiAgent's radar reward, or (reward="progress") the distance driven along the track (see Reward).
+# Unless 'render' is True the environment is headless--no window, no pygame event loop, and no frame limiter.
+class RaceEnv:
+
+    def __init__(self, level="track_1.png", player_car="red_car.png", render=False, frame_skip=1, episode_length=120000, physics_step=1,
+                 start_pool=None, reward="radar"):
+        # Init the game (headless, unless rendering) with the race selections normally made at the title screen.
+        # 'physics_step' frames are simulated per race update (coarse steps for throughput, see SimClock)
+        self.game = Game.Game(headless=not render, physics_step=physics_step)
+        self.game.player_selection = self.game.car_image_directory + player_car
+        self.game.level_selection = self.game.level_image_directory + level
+        self.game.ai_selection = False      # The environment controls the player, not an AiAgent
+        self.game.ai_train = False
+        self.render_mode = render
+        self.frame_skip = frame_skip            # Number of race updates (physics steps) each action is repeated for
+        self.reward_type = reward               # "radar" or "progress"
+        self.episode_length = episode_length    # Simulated time (ms) before an episode is truncated
+        # Same action space as the AiAgent (the keypress combinations for each action)
+        self.action_space = [[],["forward"], ["forward", "left"], ["forward", "right"]]
+        self.action_size = len(self.action_space)
+        self.observation_size = 6
+
+        self.race = Race.Race(self.game)
+        self.race.start_pool = start_pool       # Episodes may start from snapshots taken partway around the track (see StartPool)
+        self.clock = self.race.clock
+        self.player_car = self.race.player_car
+        self.finish_line = self.race.finish_line
+        self.radar = AiRadar.AiRadar(self.player_car, self.race.level)
+        self.controls = Controls.Controls(self.action_space, self.game.key_state)
+        if self.render_mode:
+            self.race.player.ai = self      # Let the player's viewport draw the environment's radar beams
+        self.episode_timer = 0
+        self.score = 0
+
+    # Starts a new episode (in place) and returns its first observation
+    def reset(self, seed=None):
+        if seed != None:
+            random.seed(seed)
+            np.random.seed(seed)
+        self.race.reset()
+        self.episode_timer = 0
+        self.score = 0
+        return self.observe()
+
+    # Takes a snapshot of the environment (see RaceState): the race, w/the episode's timer & score
+    def snapshot(self):
+        state = self.race.snapshot()
+        state.episode = (self.episode_timer, self.score)
+        return state
+
+    # Puts the environment back in a snapshot's state (ie. to rewind it) and returns its observation
+    def restore(self, state):
+        self.race.restore(state)
+        if state.episode != None:
+            self.episode_timer, self.score = state.episode
+        return self.observe()
+
+    # Performs the action (an index into the action space) for 'frame_skip' frames.  Returns the next
+    # observation, the reward, whether the episode is done (collision, race finished, or out of time), and info
+    def step(self, action):
+        race_progress = self.finish_line.race_progress(0)
+        self.controls.apply(action)
+        for frame in range(0, self.frame_skip, 1):
+            self.race.update()
+            self.clock.tick(self.race.FPS)
+            self.episode_timer += self.clock.get_time()
+            done = self.is_done()
+            if done:
+                break
+        if self.render_mode:
+            self.render()
+        observation = self.observe()
+        if self.reward_type == "progress":
+            reward = Reward.progress_reward(race_progress, self.finish_line.race_progress(0), self.finish_line.progress_map.lap_length)
+        else:
+            reward = Reward.radar_reward(observation[:5], observation[5])
+        self.score += reward
+        info = {"lap_count": self.player_car.lap_count, "collision": self.player_car.collision_level,
+                "episode_time": self.episode_timer, "score": self.score, "progress": self.finish_line.race_progress(0),
+                "wrong_way": self.finish_line.wrong_way[0], "position": self.finish_line.get_position(0)}
+        return observation, reward, done, info
+
+    # Gets the DQN inputs: the player car's radar beam distances and its speed
+    def observe(self):
+        observation = np.zeros(self.observation_size, dtype=np.float32)
+        observation[:5] = self.radar.calc_radar_beams()
+        observation[5] = self.player_car.distance
+        return observation
+
+    # Episode is over when the player hits the level boundary, finishes the race, or runs out of time
+    def is_done(self):
+        return (self.player_car.collision_level or self.player_car.lap_count > self.race.level.laps
+                or self.episode_timer > self.episode_length)
+
+    # Draws the race to the window (only available when the environment was created with render=True)
+    def render(self):
+        pygame.event.pump()     # Keep the window responsive
+        self.race.draw()
+
+    def close(self):
+        pygame.quit()
+
+# Measures the environment's raw simulation speed by driving the player with random actions
+# (run from the game's root directory: python -m race.RaceEnv)
+if __name__ == '__main__':
+    env = RaceEnv()
+    env.reset(seed=0)
+    steps = 5000
+    start = time.perf_counter()
+    for i in range(0, steps, 1):
+        observation, reward, done, info = env.step(random.randrange(env.action_size))
+        if done:
+            env.reset()
+    print("Steps per second:", int(steps / (time.perf_counter() - start)))
+    env.close()
@@ -0,0 +1,60 @@
+# A RaceState is a snapshot of everything in a race that changes as it runs: the simulated time, the control keys,
+# the player's car, the NPCs, the finish line's lap tracking, and the counters of the current episode (the AiAgent's,
+# or the RaceEnv's).  Each part is a small record taken by its own object (a tuple of values, or copies of the NPC
+# fleet's arrays)--never the objects themselves, so a snapshot is a few KB, and restoring it only writes the values
+# back (see Race.snapshot & Race.restore).  The level, sprites, DQNs & replay memory never change during a race, and
+# aren't part of it.  A state can be restored any number of times (ie. rewinding to it).
+class RaceState:
+
+    __slots__ = ("ticks", "keys", "player", "npcs", "finish_line", "episode")
+
+    def __init__(self, ticks, keys, player, npcs, finish_line, episode=None):
+        self.ticks = ticks                  # Simulated time (ms), see SimClock (the cars' timers count from it)
+        self.keys = keys                    # Control key states
+        self.player = player                # See PlayerCar.get_state
+        self.npcs = npcs                    # See NpcFleet.get_state
+        self.finish_line = finish_line      # See FinishLine.get_state
+        self.episode = episode              # Episode counters (see AiAgent.get_state & RaceEnv.snapshot), if any
+
+# Benchmark: time to snapshot & restore a race (w/the level's NPCs) vs. resetting it to the start line, the size of
+# a snapshot, and a check that a rewound race replays the same actions exactly as it did the first time
+# (run from the game's root directory: python -m race.RaceState [track_1.png])
+if __name__ == '__main__':
+    import sys
+    import time
+    import random
+    import pickle
+    from race import RaceEnv
+    env = RaceEnv.RaceEnv(level=sys.argv[1] if len(sys.argv) > 1 else "track_1.png")
+    env.reset(seed=0)
+    actions = [random.choice([1, 1, 1, 2, 3]) for i in range(0, 500, 1)]
+
+    def drive(actions):
+        trace = []
+        for action in actions:
+            observation, reward, done, info = env.step(action)
+            trace.append((observation.tolist(), reward, env.player_car.get_state(), [car.rect.topleft for car in env.race.npc_cars]))
+            if done:
+                break
+        return trace
+
+    drive(actions[:100])
+    state = env.snapshot()
+    first = drive(actions[100:])
+    env.restore(state)
+    print("Rewound race replays", len(first), "steps exactly:", drive(actions[100:]) == first)
+    runs = 2000
+    start = time.perf_counter()
+    for i in range(0, runs, 1):
+        state = env.race.snapshot()
+    snapshot_time = (time.perf_counter() - start) / runs
+    start = time.perf_counter()
+    for i in range(0, runs, 1):
+        env.race.restore(state)
+    restore_time = (time.perf_counter() - start) / runs
+    start = time.perf_counter()
+    for i in range(0, runs // 10, 1):
+        env.race.reset()
+    reset_time = (time.perf_counter() - start) / (runs // 10)
+    print("snapshot:", round(snapshot_time * 1e6, 1), "us | restore:", round(restore_time * 1e6, 1), "us | reset to the start line:",
+          round(reset_time * 1e6, 1), "us | snapshot size (pickled):", len(pickle.dumps(state)), "bytes")
@@ -0,0 +1,295 @@
+import os
+import json
+import pickle
+import numpy as np
+import torch as torch
+
+# The ReplayBuffer class is the DQN's replay memory: a circular buffer of steps, where each slot holds a state, the
+# action taken in it, the reward for that action, and whether the action ended the episode (terminal state).  A
+# transition's next state is never stored twice--it's simply the state in the following slot.  A slot can only be
+# sampled once its transition is complete: either it's terminal (its next state isn't used) or the next state has
+# been written after it, in the same episode.  Sampling picks random slots and re-draws the few incomplete ones,
+# so it costs O(batch size) no matter how large the buffer is, and the batch is gathered straight into tensors
+# that are allocated once and filled in place on every sample.
+# Given a 'path' (directory), the buffer's arrays are memory-mapped .npy files in that directory, so the replay
+# memory lives on disk: steps are written straight to the files, flush() only has the OS write out the pages
+# that changed, and a small JSON header records the write index (and anything else the owner wants to resume
+# with, ie. the time step and epsilon).  Resuming is just opening the files again--nothing is loaded.
+class ReplayBuffer:
+
+    def __init__(self, capacity, state_size, batch_size, device="cpu", path=None):
+        self.capacity = capacity
+        self.state_size = state_size
+        self.batch_size = batch_size
+        self.device = torch.device(device)
+        self.path = path
+        self.header = {}        # Header of the replay memory files (see flush)
+        self.index = 0          # Next slot to write to
+        self.size = 0           # Num of slots written to (up to the capacity)
+        self.open = None        # Last written slot, if it's still waiting for its next state (and its reward, see add)
+        self.linked = False     # Whether the open slot follows a step of the same episode (see add)
+        self.valid_count = 0    # Num of slots whose transition is complete (see set_valid)
+        self.writes = 0         # Num of slots written to so far (see overwritten)
+        if self.path == None:
+            self.states = np.zeros((capacity, state_size), dtype=np.float32)
+            self.actions = np.zeros(capacity, dtype=np.int64)
+            self.rewards = np.zeros(capacity, dtype=np.float32)
+            self.dones = np.zeros(capacity, dtype=np.float32)
+            self.valid = np.zeros(capacity, dtype=bool)     # Slots whose transition is complete (can be sampled)
+        else:
+            self.open_files()
+        self.init_batch()
+
+    # Preallocates the sample batch: NumPy arrays the samples are gathered into, and the tensors handed to the
+    # network.  On the CPU the tensors share the arrays' memory, otherwise they're copied to the device in place.
+    def init_batch(self):
+        self.batch_indexes = np.zeros(self.batch_size, dtype=np.int64)
+        self.batch_next_indexes = np.zeros(self.batch_size, dtype=np.int64)
+        self.batch_arrays = [np.zeros((self.batch_size, self.state_size), dtype=np.float32),  # States
+                             np.zeros((self.batch_size, 1), dtype=np.int64),                 # Actions
+                             np.zeros((self.batch_size, 1), dtype=np.float32),               # Rewards
+                             np.zeros((self.batch_size, self.state_size), dtype=np.float32),  # Next states
+                             np.zeros((self.batch_size, 1), dtype=np.float32)]               # Dones
+        self.batch_tensors = []
+        for array in self.batch_arrays:
+            tensor = torch.from_numpy(array)
+            if self.device.type != "cpu":
+                tensor = torch.empty(array.shape, dtype=tensor.dtype, device=self.device)
+            self.batch_tensors.append(tensor)
+
+    def __len__(self):
+        return self.size
+
+    # Writes one step in the order it's played: the current state, the action taken, and the reward for the
+    # *previous* action (which is only known once its next state--this state--is observed).  This completes
+    # the previous step's transition.  The reward is ignored for the first step of an episode.
+    def add(self, state, action, reward):
+        self.linked = self.open != None
+        if self.linked:
+            self.rewards[self.open] = reward
+            self.dones[self.open] = 0
+            self.set_valid(self.open, True)
+        self.open = self.write(state, action)
+
+    # Ends the episode at the last state written with add: the transition into it becomes terminal.  The terminal
+    # state itself is removed (no action is taken from it) and its slot is written over by the next step.
+    def mark_terminal(self):
+        if self.open == None:
+            return
+        self.index = self.open
+        if self.size < self.capacity:
+            self.size -= 1
+        if self.linked:
+            self.dones[(self.open - 1) % self.capacity] = 1
+        self.open = None
+        self.linked = False
+
+    # Writes a stream of complete steps at once (ie. from an actor): states, actions, and each action's reward
+    # and terminal flag.  The last step stays open until the stream's next state is written.
+    def add_batch(self, states, actions, rewards, dones):
+        count = len(states)
+        if count == 0:
+            return
+        if self.open != None:
+            self.set_valid(self.open, True)     # Its next state is the first state of this batch
+        indexes = (self.index + np.arange(count)) % self.capacity
+        self.states[indexes] = states
+        self.actions[indexes] = actions
+        self.rewards[indexes] = rewards
+        self.dones[indexes] = dones
+        valid = np.ones(count, dtype=bool)
+        last = int(indexes[-1])
+        self.open = None
+        self.linked = False
+        if self.dones[last] == 0:
+            valid[-1] = False
+            self.open = last
+        self.set_valid(indexes, valid)
+        self.index = (last + 1) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        self.writes += count
+
+    # The next steps written don't follow the last step written (ie. steps were lost in between), so the open
+    # step can't be completed--it's left as is and never sampled
+    def end_stream(self):
+        self.open = None
+        self.linked = False
+
+    # Marks slot(s) as complete (can be sampled) or not, and keeps count of the complete ones
+    def set_valid(self, indexes, valid):
+        if np.ndim(indexes) == 0:
+            self.valid_count += int(bool(valid)) - int(self.valid[indexes])
+            self.valid[indexes] = valid
+            return
+        slots = np.unique(indexes)     # (a batch longer than the buffer writes some slots twice, the last write stands)
+        before = np.count_nonzero(self.valid[slots])
+        self.valid[indexes] = valid
+        self.valid_count += np.count_nonzero(self.valid[slots]) - before
+
+    # Writes a state & action to the next slot (incomplete until add, mark_terminal, or add_batch completes it)
+    def write(self, state, action):
+        i = self.index
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = 0
+        self.dones[i] = 0
+        self.set_valid(i, False)
+        self.index = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.writes += 1
+        return i
+
+    # Which of the slots at 'indexes' have been written to since the buffer's write count was 'writes' (ie. slots
+    # sampled a while ago that may hold new transitions by now).  Slots are written in order, so a slot was written
+    # since then if it's among the last slots written
+    def overwritten(self, indexes, writes):
+        return (self.index - 1 - indexes) % self.capacity < self.writes - writes
+
+    # Num of complete transitions that can be sampled
+    def num_transitions(self):
+        return self.valid_count
+
+    # Samples a batch of random transitions: (states, actions, rewards, next_states, dones) tensors,
+    # shaped (batch size, state size) for the states and (batch size, 1) for the rest.
+    # The same tensors are returned (refilled) on every call.
+    def sample(self):
+        self.sample_indexes()
+        return self.gather_batch()
+
+    # Picks the slots of a sample batch (uniformly, among the complete transitions)
+    def sample_indexes(self):
+        if self.valid_count == 0:
+            raise ValueError("Replay memory has no complete transitions to sample")
+        indexes = self.batch_indexes
+        indexes[:] = np.random.randint(0, self.size, size=self.batch_size)
+        redraw = ~self.valid[indexes]
+        while redraw.any():
+            indexes[redraw] = np.random.randint(0, self.size, size=np.count_nonzero(redraw))
+            redraw = ~self.valid[indexes]
+
+    # Gathers the sampled slots' transitions into the batch tensors
+    def gather_batch(self):
+        indexes = self.batch_indexes
+        np.add(indexes, 1, out=self.batch_next_indexes)
+        self.batch_next_indexes %= self.capacity
+        states, actions, rewards, next_states, dones = self.batch_arrays
+        np.take(self.states, indexes, axis=0, out=states)
+        np.take(self.actions, indexes, out=actions.reshape(-1))
+        np.take(self.rewards, indexes, out=rewards.reshape(-1))
+        np.take(self.states, self.batch_next_indexes, axis=0, out=next_states)
+        np.take(self.dones, indexes, out=dones.reshape(-1))
+        if self.device.type != "cpu":
+            for array, tensor in zip(self.batch_arrays, self.batch_tensors):
+                tensor.copy_(torch.from_numpy(array), non_blocking=True)
+        return self.batch_tensors
+
+    # Importance-sampling weights of the last sample batch, to correct the loss for non-uniform sampling.
+    # None, as every transition is equally likely to be sampled (see PrioritizedReplayBuffer)
+    def sample_weights(self):
+        return None
+
+    # Sets new priorities for the last sample batch (or the transitions at 'indexes') from their TD errors
+    # (only used by the PrioritizedReplayBuffer)
+    def update_priorities(self, td_errors, indexes=None):
+        pass
+
+    # Memory-mapped replay memory files: (file, dtype, shape) of each array
+    def file_layout(self):
+        return {"states": ("replay_states.npy", np.float32, (self.capacity, self.state_size)),
+                "actions": ("replay_actions.npy", np.int64, (self.capacity,)),
+                "rewards": ("replay_rewards.npy", np.float32, (self.capacity,)),
+                "dones": ("replay_dones.npy", np.float32, (self.capacity,)),
+                "valid": ("replay_valid.npy", np.bool_, (self.capacity,))}
+
+    # Maps the replay memory files in 'path' (creating them if they don't exist yet, or don't match the buffer's size).
+    # New files are filled with any replay memory saved in an older format (see load).
+    def open_files(self):
+        layout = self.file_layout()
+        header_file = self.path + "replay_header.json"
+        exists = os.path.isfile(header_file) and all(os.path.isfile(self.path + file) for file, dtype, shape in layout.values())
+        if exists:
+            arrays = {name: np.lib.format.open_memmap(self.path + file, mode="r+") for name, (file, dtype, shape) in layout.items()}
+            exists = all(arrays[name].shape == shape and arrays[name].dtype == dtype for name, (file, dtype, shape) in layout.items())
+        if exists:
+            for name, array in arrays.items():
+                setattr(self, name, array)
+            with open(header_file, "r") as f:
+                self.header = json.load(f)
+            self.index = self.header["index"]
+            self.size = self.header["size"]
+            # Steps written after the last flush are dropped, and the last step flushed has no next state
+            self.valid[self.size:] = False
+            last = (self.index - 1) % self.capacity
+            if self.size > 0 and self.dones[last] == 0:
+                self.valid[last] = False
+            self.valid_count = int(np.count_nonzero(self.valid))
+        else:
+            for name, (file, dtype, shape) in layout.items():
+                setattr(self, name, np.lib.format.open_memmap(self.path + file, mode="w+", dtype=dtype, shape=shape))
+            self.load(self.path)
+            self.flush()
+
+    # Writes the changed parts of the replay memory files to disk and updates the header (atomically--a new header
+    # replaces the old one), along with any 'extra' values to keep in it.  Only used with files (see 'path').
+    def flush(self, extra=None):
+        self.write_files(self.snapshot_header(extra))
+
+    # The header as of now: the write position, plus any 'extra' values to keep in it
+    def snapshot_header(self, extra=None):
+        if extra != None:
+            self.header.update(extra)
+        self.header.update({"index": self.index, "size": self.size, "capacity": self.capacity, "state_size": self.state_size})
+        return dict(self.header)
+
+    # Writes the replay memory files and the given header.  Can be called from another thread (see CheckpointWriter)
+    # while steps are still being written: any step written after the header's snapshot is ignored on resume.
+    def write_files(self, header):
+        for array in [self.states, self.actions, self.rewards, self.dones, self.valid]:
+            array.flush()
+        header_file = self.path + "replay_header.json"
+        with open(header_file + ".tmp", "w") as f:
+            json.dump(header, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(header_file + ".tmp", header_file)
+
+    # Loads replay memory saved to the 'path' directory in an older format (separate .npy files), if there is any:
+    # either the whole buffer saved with np.save, or the original format (with a next_states.npy file holding
+    # every transition's next state).
+    def load(self, path):
+        files = ["states.npy", "actions.npy", "rewards.npy", "dones.npy", "valid.npy", "replay_index.pickle"]
+        old_files = ["states.npy", "actions.npy", "rewards.npy", "next_states.npy", "dones.npy"]
+        if all(os.path.isfile(path + file) for file in files):
+            states = np.load(path+"states.npy")
+            actions = np.load(path+"actions.npy")
+            rewards = np.load(path+"rewards.npy")
+            dones = np.load(path+"dones.npy")
+            valid = np.load(path+"valid.npy")
+            with open(path+"replay_index.pickle", 'rb') as f:
+                index, size = pickle.load(f)
+        elif all(os.path.isfile(path + file) for file in old_files):
+            states = np.load(path+"states.npy")
+            actions = np.load(path+"actions.npy").reshape(-1)
+            rewards = np.load(path+"rewards.npy").reshape(-1)
+            next_states = np.load(path+"next_states.npy")
+            dones = np.load(path+"dones.npy").reshape(-1)
+            # Keep the transitions that were written, and whose next state is the following slot's state (or is terminal)
+            written = np.any(states != 0, axis=1)
+            valid = written & ((dones != 0) | np.all(next_states == np.roll(states, -1, axis=0), axis=1))
+            size = len(states) if written.all() else int(np.flatnonzero(written).max(initial=-1)) + 1
+            index = size
+        else:
+            return
+        count = min(len(states), self.capacity)
+        self.states[:count] = states[:count]
+        self.actions[:count] = actions[:count]
+        self.rewards[:count] = rewards[:count]
+        self.dones[:count] = dones[:count]
+        valid = valid[:count].copy()
+        if len(states) > count:
+            valid[count - 1] &= self.dones[count - 1] != 0     # Its next state wasn't kept
+        self.set_valid(np.arange(count), valid)
+        self.index = index % self.capacity
+        self.size = min(size, self.capacity)
+        self.open = None
+        self.linked = False
@@ -0,0 +1,12 @@
+# Reward functions used to train the DQN, shared by the AiAgent and the training environments.
+
+# A custom-designed reward equation--dependant on the player's current speed & the radar beam sensor distances.
+# Works on single values or on NumPy arrays of many cars' beams & speeds (beams indexed by beam along the first axis)
+def radar_reward(beams, speed):
+    return (speed * ((beams[0] - 500) + .25 * (beams[1] - 250) + .25 * (beams[2] - 250) + .125 * (beams[3] - 75) + .125 * (beams[4] - 75))) / 100
+
+# A progress-based reward--the distance (px) the player drove along the track since the last reward (negative when
+# going the wrong way), from its race progress (laps + fraction of the lap, see FinishLine & ProgressMap) before &
+# after.  Scaled to about the radar reward's range at full speed.  Works on single values or on NumPy arrays of many cars
+def progress_reward(before, after, lap_length):
+    return 2 * (after - before) * lap_length
@@ -0,0 +1,30 @@
+import numpy as np
+import torch as torch
+
+# The SharedWeights class holds one copy of the policy DQN's weights (all parameters flattened into a single float
+# array) in shared memory, along with a version number.  The learner publishes its weights every so often, and each
+# actor copies them into its own local network whenever the version has changed since its last copy.
+class SharedWeights:
+
+    def __init__(self, context, num_weights):
+        self.num_weights = num_weights
+        self.shared_weights = context.RawArray("f", num_weights)
+        self.version = context.Value("q", 0)    # Also locks the weights while they're being written or read
+
+    # Learner side: copies the network's weights into shared memory
+    def publish(self, model):
+        weights = torch.nn.utils.parameters_to_vector(model.parameters()).detach().cpu().numpy()
+        with self.version.get_lock():
+            np.frombuffer(self.shared_weights, dtype=np.float32)[:] = weights
+            self.version.value += 1
+
+    # Actor side: copies the shared weights into the network, if they're newer than 'version' (the version
+    # the network already has).  Returns the version the network now has.
+    def load(self, model, version):
+        with self.version.get_lock():
+            if self.version.value == version:
+                return version
+            weights = np.frombuffer(self.shared_weights, dtype=np.float32).copy()
+            version = self.version.value
+        torch.nn.utils.vector_to_parameters(torch.from_numpy(weights).to(model.device), model.parameters())
+        return version
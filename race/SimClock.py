@@ -0,0 +1,37 @@
+import pygame
+
+# The SimClock class keeps the game's simulated time.  Every call to tick() advances the simulation by exactly one
+# fixed frame (1000 / FPS ms), so all in-game timers (throttle, boost, episode length, race end text, etc.) depend only
+# on the number of frames simulated and not on how fast the loop actually runs.  In a windowed game the clock also
+# holds the framerate constant via a pygame Clock.  In headless mode there's no frame limiter, so the race loop
+# runs as fast as the CPU allows while the cars still behave exactly the same.
+# A headless simulation can also take coarse physics steps for throughput: w/'step_frames' > 1 every tick advances
+# the simulation by that many frames at once, and the cars move (turn, accelerate, etc.) that many frames' worth in
+# one update (see the cars' move, and CollisionManager.sweep_level for how no wall is skipped over).
+class SimClock:
+
+    def __init__(self, fps, limit_framerate=True, step_frames=1):
+        self.fps = fps
+        self.step_frames = step_frames  # Frames simulated per tick (physics step)
+        self.frame_time = 1000 / fps * step_frames     # Fixed amount of simulated time (ms) per tick
+        # Simulated time (ms). Starts at one frame so a timer started on the very first frame
+        # is never 0 (the cars use a start time of 0 to mean "timer not started")
+        self.ticks = self.frame_time
+        self.limiter = None
+        if limit_framerate:
+            self.limiter = pygame.time.Clock()
+
+    # Advances simulated time by one physics step, and waits to maintain the framerate if the clock is limited
+    def tick(self, fps=None):
+        if self.limiter != None:
+            self.limiter.tick(self.fps if fps == None else fps)
+        self.ticks += self.frame_time
+        return self.frame_time
+
+    # Simulated time (ms) of the last physics step -- same use as pygame.time.Clock.get_time()
+    def get_time(self):
+        return self.frame_time
+
+    # Total simulated time (ms) -- used in place of pygame.time.get_ticks() by all in-game timers
+    def get_ticks(self):
+        return self.ticks
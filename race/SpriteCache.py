@@ -0,0 +1,38 @@
+import pygame
+import os
+
+# Angle (deg) the car's base sprite image (ie. "red_car.png") is facing. Used to build any
+# orientation that doesn't have its own pre-rotated image file (ie. "red_car_45.png")
+BASE_IMAGE_ANGLE = 270
+
+# The sprite cache holds all 360 orientations of every car color as (image, mask) pairs.  Each car color
+# is loaded from file (or rotated from its base image) once, the first time a car of that color is created,
+# and is then shared by every car for the rest of the game, across all races and training episodes.
+# Rotating a car is then a simple list lookup, with no disk reads or image decoding during the race loop.
+sprites = {}
+
+# Returns the (image, mask) pair of a car image basename (ie. "race/car_sprite_images/red_car") at the given angle
+def get_sprite(image_basename, angle):
+    if image_basename not in sprites:
+        load_sprites(image_basename)
+    return sprites[image_basename][int(angle) % 360]
+
+# Loads (or builds) every orientation of a car image, from 0 to 359 degrees, and stores it in the cache
+def load_sprites(image_basename):
+    base_image = None
+    orientations = []
+    for angle in range(0, 360, 1):
+        image_file = image_basename + "_" + str(angle) + ".png"
+        if os.path.isfile(image_file):
+            image = pygame.image.load(image_file)
+            image.set_colorkey("white")
+        else:
+            # No pre-rotated image file for this angle, rotate the base image instead
+            if base_image == None:
+                base_image = pygame.image.load(image_basename + ".png")
+                base_image.set_colorkey("white")
+            image = pygame.transform.rotate(base_image, BASE_IMAGE_ANGLE - angle) # (pygame rotates counter-clockwise)
+        image = image.convert_alpha()   # Convert once to the display's pixel format (colorkey becomes transparency)
+        mask = pygame.mask.from_surface(image)
+        orientations.append((image, mask))
+    sprites[image_basename] = orientations
@@ -0,0 +1,39 @@
+import random
+
+# The StartPool class keeps a pool of race snapshots (see RaceState) taken partway around the track while training,
+# for new episodes to start from instead of the start line--so fewer frames are spent driving the opening straight
+# the agent has long since learned, and more on the corners further on.  While the race runs, a snapshot is offered
+# every 'interval' ms of simulated time, as long as the player's car is moving & clear of any collision (see
+# Race.update).  Once the pool is full, each new snapshot replaces a random one (so the pool stays a uniform sample
+# of all the snapshots offered, & follows the agent further around the track as it learns).  Each new episode
+# starts from a random snapshot w/probability 'start_probability', otherwise from the start line (see Race.reset).
+class StartPool:
+
+    def __init__(self, size=64, interval=2000, start_probability=.5):
+        self.size = size
+        self.interval = interval                    # Simulated time (ms) between snapshots
+        self.start_probability = start_probability
+        self.states = []
+        self.offered = 0                            # Num of snapshots offered to the pool
+        self.last_ticks = None                      # Simulated time of the last snapshot offered
+
+    # Whether it's time for the next snapshot (simulated time runs backwards when a state is restored)
+    def due(self, ticks):
+        return self.last_ticks == None or ticks - self.last_ticks >= self.interval or ticks < self.last_ticks
+
+    # Adds a snapshot to the pool (reservoir sampling once the pool is full)
+    def add(self, state, ticks):
+        self.last_ticks = ticks
+        self.offered += 1
+        if len(self.states) < self.size:
+            self.states.append(state)
+            return
+        i = random.randrange(self.offered)
+        if i < self.size:
+            self.states[i] = state
+
+    # Picks the state to start a new episode from: a random snapshot from the pool, or None for the start line
+    def pick(self):
+        if len(self.states) == 0 or random.random() >= self.start_probability:
+            return None
+        return random.choice(self.states)
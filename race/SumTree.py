@@ -0,0 +1,65 @@
+import numpy as np
+
+# The SumTree class stores a priority for each replay memory slot in the leaves of a binary tree, where every
+# parent node holds the sum of its children (and, in a second tree, their minimum).  The root then holds the
+# total of all priorities, a priority can be changed by updating only the nodes on its path to the root, and a
+# slot can be picked with probability proportional to its priority by walking down from the root--all O(log N).
+# The trees are flat arrays: the root is node 1, node i's children are nodes 2i and 2i + 1, and the leaves
+# (one per slot, padded to a power of 2) are nodes 'leaf_count' to 2 * 'leaf_count' - 1.
+class SumTree:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.leaf_count = 1
+        while self.leaf_count < capacity:
+            self.leaf_count *= 2
+        self.depth = self.leaf_count.bit_length() - 1
+        self.sums = np.zeros(2 * self.leaf_count, dtype=np.float64)
+        self.mins = np.full(2 * self.leaf_count, np.inf, dtype=np.float64)   # Zero priorities don't count as the min
+
+    # Total of all priorities
+    def total(self):
+        return self.sums[1]
+
+    # Smallest non-zero priority (inf if there's none)
+    def min(self):
+        return self.mins[1]
+
+    def get(self, indexes):
+        return self.sums[self.leaf_count + indexes]
+
+    # Sets one slot's priority
+    def update(self, index, priority):
+        sums = self.sums
+        mins = self.mins
+        node = self.leaf_count + int(index)
+        sums[node] = priority
+        mins[node] = priority if priority > 0 else np.inf
+        while node > 1:
+            node //= 2
+            left = 2 * node
+            sums[node] = sums[left] + sums[left + 1]
+            mins[node] = min(mins[left], mins[left + 1])
+
+    # Sets the priorities of many slots at once, one tree level at a time
+    def update_batch(self, indexes, priorities):
+        nodes = self.leaf_count + np.asarray(indexes)
+        priorities = np.asarray(priorities, dtype=np.float64)
+        self.sums[nodes] = priorities
+        self.mins[nodes] = np.where(priorities > 0, priorities, np.inf)
+        for level in range(0, self.depth, 1):
+            nodes = nodes // 2      # (a parent shared by several nodes is just recomputed more than once)
+            self.sums[nodes] = self.sums[2 * nodes] + self.sums[2 * nodes + 1]
+            self.mins[nodes] = np.minimum(self.mins[2 * nodes], self.mins[2 * nodes + 1])
+
+    # Finds the slot each value (0 to total) falls in, when the priorities are laid end to end (prefix sums).
+    # A slot is found with probability proportional to its priority, for uniformly random values.
+    def find(self, values):
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for level in range(0, self.depth, 1):
+            left = self.sums[2 * nodes]
+            right = values > left
+            values -= np.where(right, left, 0)
+            nodes = 2 * nodes + right
+        return nodes - self.leaf_count
@@ -0,0 +1,97 @@
+import sys
+import time
+import collections
+import pygame
+
+# The TileRenderer class draws a (very large) level image to the viewport by splitting it into square tiles and
+# blitting only the tiles that cross the viewport, so the cost of a frame depends on the screen size, not the level
+# size.  Tiles are cut from the level image the first time they're seen, w/the overlays (ie. the finish line) baked
+# in once, and converted to the display's pixel format (fastest to blit).  Only the most recently drawn tiles are
+# kept (least recently used are dropped first)--enough to cover the viewport a few times over, so driving back &
+# forth never re-cuts a tile, while a 100 megapixel level never has to be held in display format as a whole.
+class TileRenderer:
+
+    def __init__(self, image, view_size, tile_size=512, overlays=None, background=(255,255,255), cache_views=2):
+        self.image = image
+        self.image_rect = image.get_rect()
+        self.tile_size = tile_size
+        self.columns = (self.image_rect.width + tile_size - 1) // tile_size
+        self.rows = (self.image_rect.height + tile_size - 1) // tile_size
+        self.overlays = []                  # (surface, (x, y)) drawn on top of the level image
+        if overlays != None:
+            self.overlays = list(overlays)
+        self.background = background        # Color under the level image's transparent (colorkey) pixels
+        # Max tiles kept: the most tiles the viewport can cross at once, 'cache_views' times over
+        self.max_tiles = (view_size[0] // tile_size + 2) * (view_size[1] // tile_size + 2) * cache_views
+        self.tiles = collections.OrderedDict()  # (column, row): tile surface, least recently drawn first
+
+    # Returns the tile at (column, row), cutting it from the level image if it isn't kept
+    def get_tile(self, column, row):
+        key = (column, row)
+        tile = self.tiles.get(key)
+        if tile != None:
+            self.tiles.move_to_end(key)
+            return tile
+        rect = pygame.Rect(column * self.tile_size, row * self.tile_size, self.tile_size, self.tile_size).clip(self.image_rect)
+        tile = pygame.Surface(rect.size)
+        tile.fill(self.background)
+        tile.blit(self.image, (0, 0), rect)
+        for surface, coords in self.overlays:
+            tile.blit(surface, (coords[0] - rect.x, coords[1] - rect.y))
+        if pygame.display.get_surface() != None:
+            tile = tile.convert()
+        self.tiles[key] = tile
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return tile
+
+    # Draws the level image to the target surface w/its top left corner at (x, y), like target.blit(image, (x, y)).
+    # The background is only filled in when the target reaches past the edge of the level (the tiles cover the rest)
+    def draw(self, target, x, y):
+        x = int(x)      # (the same whole pixel as a blit to a float position, so the tiles line up w/no seams)
+        y = int(y)
+        target_rect = target.get_rect()
+        if not self.image_rect.move(x, y).contains(target_rect):
+            target.fill(self.background)
+        first_column = max(0, -x // self.tile_size)
+        last_column = min(self.columns - 1, (target_rect.width - 1 - x) // self.tile_size)
+        first_row = max(0, -y // self.tile_size)
+        last_row = min(self.rows - 1, (target_rect.height - 1 - y) // self.tile_size)
+        for row in range(first_row, last_row + 1, 1):
+            for column in range(first_column, last_column + 1, 1):
+                target.blit(self.get_tile(column, row), (x + column * self.tile_size, y + row * self.tile_size))
+
+# Benchmark: time to draw the level to a 1500x1100 screen the original way (fill a viewport, blit the whole level
+# image to it & the finish line onto the level, then blit the viewport to the screen) vs. drawing only the tiles in
+# view straight to the screen, while the camera drives across the level
+# (run from the game's root directory: python -m race.TileRenderer [race/levels/track_2.png])
+if __name__ == '__main__':
+    from race import Level
+    pygame.init()
+    screen = pygame.display.set_mode((1500, 1100))
+    level = Level.Level(sys.argv[1] if len(sys.argv) > 1 else "./race/levels/track_2.png")
+    finish_line = pygame.Surface(level.finish_line_coords[2:4])
+    finish_line.fill(level.finish_line_coords[5])
+    finish_coords = level.finish_line_coords[:2]
+    renderer = TileRenderer(level.image, screen.get_size(), overlays=[(finish_line, finish_coords)])
+    frames = 300
+    # Camera path: a diagonal across the level, a few pixels per frame like a car
+    path = [(-(200 + 9 * i), -(200 + 5 * i)) for i in range(0, frames, 1)]
+
+    viewport = pygame.Surface(screen.get_size())
+
+    def benchmark(name, draw):
+        start = time.perf_counter()
+        for x, y in path:
+            draw(x, y)
+        print(name.ljust(34), round((time.perf_counter() - start) / frames * 1000, 2), "ms per frame")
+
+    def whole_image(x, y):
+        viewport.fill((255,255,255))
+        viewport.blit(level.image, (x, y))
+        level.image.blit(finish_line, finish_coords)
+        screen.blit(viewport, (0, 0))
+
+    benchmark("whole level image", whole_image)
+    benchmark("tiles (cutting new tiles)", lambda x, y: renderer.draw(screen, x, y))
+    benchmark("tiles (second pass)", lambda x, y: renderer.draw(screen, x, y))
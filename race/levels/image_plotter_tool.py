@@ -8,6 +8,7 @@ import time
 # by clicking on a game level map (track) for the NPC players to travel along
 # Requires use of Tkinter as the GUI interface and PIL at the image handling tool.
 # Accepts the image as the scripts paremeter. Outputs a text file.
+# (python -m race.Centreline writes the same file from the track's centreline, w/out any clicking)
 Image.MAX_IMAGE_PIXELS = 280000000
 
 class ImagePlotterTool: